@@ -1,70 +1,305 @@
 #include "hdf5.h"
+#include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 
-/* Write an integer dataset.
- * If ndims == 0, create a scalar dataspace; otherwise, use dims.
+/* HDF5 backend of H5InterfaceMod.
+ *
+ * A file is opened once with c_open_file, which returns a session handle
+ * used by every c_write_* / c_read_* call until c_close_file. Datasets
+ * named "inst/field" are created in the group of their derived-type
+ * instance (created on first use). Arrays are passed in Fortran order:
+ * dims are reversed for HDF5, as the Fortran HDF5 library does, and the
+ * lower bounds of each array are kept in its "lbounds" attribute.
  */
-int c_write_int(const char *filename, const char *dset_name,
-                const int *data, int ndims, const hsize_t *dims)
+
+#define MAX_SESSIONS 8
+#define MAX_DIMS 7
+
+enum { MODE_CREATE = 0, MODE_READ = 1, MODE_APPEND = 2 };
+
+typedef struct {
+    hid_t file;
+    hid_t lcpl;      /* creates the missing instance groups */
+    int deflate;     /* zlib level of the arrays, 0 for none */
+    int shuffle;     /* byte shuffle filter */
+} h5_session;
+
+static h5_session sessions[MAX_SESSIONS];
+static int sessions_init = 0;
+
+static h5_session *get_session(int handle)
 {
-    hid_t file, space, dset;
-    herr_t status;
+    if(handle < 0 || handle >= MAX_SESSIONS || sessions[handle].file < 0) {
+        fprintf(stderr, "hdf5_wrapper: invalid session handle %d\n", handle);
+        return NULL;
+    }
+    return &sessions[handle];
+}
+
+/* Open (mode 1 read only, 2 read-write) or create (mode 0) filename.
+ * Returns the session handle, or -1 on error.
+ */
+int c_open_file(const char *filename, int mode)
+{
+    int handle;
+    hid_t file;
+
+    if(!sessions_init) {
+        for(handle = 0; handle < MAX_SESSIONS; handle++) sessions[handle].file = -1;
+        sessions_init = 1;
+    }
+    for(handle = 0; handle < MAX_SESSIONS; handle++) {
+        if(sessions[handle].file < 0) break;
+    }
+    if(handle == MAX_SESSIONS) {
+        fprintf(stderr, "hdf5_wrapper: more than %d open files\n", MAX_SESSIONS);
+        return -1;
+    }
 
-    file = H5Fopen(filename, H5F_ACC_RDWR, H5P_DEFAULT);
+    switch(mode) {
+    case MODE_CREATE:
+        file = H5Fcreate(filename, H5F_ACC_TRUNC, H5P_DEFAULT, H5P_DEFAULT);
+        break;
+    case MODE_READ:
+        file = H5Fopen(filename, H5F_ACC_RDONLY, H5P_DEFAULT);
+        break;
+    case MODE_APPEND:
+        file = H5Fopen(filename, H5F_ACC_RDWR, H5P_DEFAULT);
+        break;
+    default:
+        fprintf(stderr, "hdf5_wrapper: unknown mode %d for %s\n", mode, filename);
+        return -1;
+    }
     if(file < 0) return -1;
 
-    if(ndims == 0) {
-        space = H5Screate(H5S_SCALAR);
-    } else {
-        space = H5Screate_simple(ndims, dims, NULL);
+    sessions[handle].file = file;
+    sessions[handle].lcpl = H5Pcreate(H5P_LINK_CREATE);
+    H5Pset_create_intermediate_group(sessions[handle].lcpl, 1);
+    sessions[handle].deflate = 0;
+    sessions[handle].shuffle = 0;
+    return handle;
+}
+
+int c_close_file(int handle)
+{
+    h5_session *s = get_session(handle);
+    herr_t status;
+
+    if(!s) return -1;
+    H5Pclose(s->lcpl);
+    status = H5Fclose(s->file);
+    s->file = -1;
+    return (int)status;
+}
+
+/* Filters applied to the arrays created afterwards in the session */
+int c_set_storage(int handle, int deflate, int shuffle)
+{
+    h5_session *s = get_session(handle);
+
+    if(!s) return -1;
+    if(deflate < 0 || deflate > 9) {
+        fprintf(stderr, "hdf5_wrapper: bad deflate level %d\n", deflate);
+        return -1;
     }
+    s->deflate = deflate;
+    s->shuffle = shuffle;
+    return 0;
+}
 
-    dset = H5Dcreate2(file, dset_name, H5T_NATIVE_INT, space,
-                      H5P_DEFAULT, H5P_DEFAULT, H5P_DEFAULT);
-    if(dset < 0) return -1;
+/* Dataset creation properties of an array with HDF5 dims h5dims.
+ * chunk is the chunk length of the first Fortran dimension (the subgrid
+ * level), the others are kept whole. Filters need chunks: without a chunk
+ * length, filtered arrays are stored in a single chunk.
+ */
+static hid_t create_dcpl(const h5_session *s, int ndims, const hsize_t *h5dims, int chunk)
+{
+    hsize_t chunk_dims[MAX_DIMS];
+    hid_t dcpl = H5Pcreate(H5P_DATASET_CREATE);
+    int i;
 
-    status = H5Dwrite(dset, H5T_NATIVE_INT, H5S_ALL, H5S_ALL, H5P_DEFAULT, data);
+    if(ndims == 0 || (chunk <= 0 && s->deflate == 0 && !s->shuffle)) return dcpl;
+    for(i = 0; i < ndims; i++) {
+        chunk_dims[i] = h5dims[i] > 0 ? h5dims[i] : 1;
+    }
+    if(chunk > 0 && (hsize_t)chunk < chunk_dims[ndims-1]) chunk_dims[ndims-1] = (hsize_t)chunk;
+    H5Pset_chunk(dcpl, ndims, chunk_dims);
+    if(s->shuffle) H5Pset_shuffle(dcpl);
+    if(s->deflate > 0) H5Pset_deflate(dcpl, (unsigned)s->deflate);
+    return dcpl;
+}
 
-    H5Dclose(dset);
+static int write_dataset(int handle, const char *dset_name, hid_t mem_type, const void *data,
+                         int ndims, const int *dims, const int *lbounds, int chunk)
+{
+    h5_session *s = get_session(handle);
+    hsize_t h5dims[MAX_DIMS];
+    hid_t space, dcpl, dset;
+    herr_t status;
+    int i;
+
+    if(!s) return -1;
+    if(ndims < 0 || ndims > MAX_DIMS) return -1;
+    for(i = 0; i < ndims; i++) h5dims[i] = (hsize_t)dims[ndims-1-i];
+
+    space = ndims == 0 ? H5Screate(H5S_SCALAR) : H5Screate_simple(ndims, h5dims, NULL);
+    dcpl = create_dcpl(s, ndims, h5dims, chunk);
+    dset = H5Dcreate2(s->file, dset_name, mem_type, space, s->lcpl, dcpl, H5P_DEFAULT);
+    H5Pclose(dcpl);
     H5Sclose(space);
-    H5Fclose(file);
+    if(dset < 0) return -1;
 
+    status = H5Dwrite(dset, mem_type, H5S_ALL, H5S_ALL, H5P_DEFAULT, data);
+    if(status >= 0 && ndims > 0 && lbounds) {
+        hsize_t attr_dims = (hsize_t)ndims;
+        hid_t attr_space = H5Screate_simple(1, &attr_dims, NULL);
+        hid_t attr = H5Acreate2(dset, "lbounds", H5T_NATIVE_INT, attr_space, H5P_DEFAULT, H5P_DEFAULT);
+        status = attr < 0 ? -1 : H5Awrite(attr, H5T_NATIVE_INT, lbounds);
+        if(attr >= 0) H5Aclose(attr);
+        H5Sclose(attr_space);
+    }
+    H5Dclose(dset);
     return (int)status;
 }
 
+/* Write an integer dataset.
+ * If ndims == 0, create a scalar dataspace; otherwise, use dims.
+ * lbounds (ndims values, may be NULL) are stored as an attribute.
+ */
+int c_write_int(int handle, const char *dset_name, const int *data,
+                int ndims, const int *dims, const int *lbounds, int chunk)
+{
+    return write_dataset(handle, dset_name, H5T_NATIVE_INT, data, ndims, dims, lbounds, chunk);
+}
+
 /* Write a double dataset.
  * For scalars, ndims should be 0.
  */
-int c_write_double(const char *filename, const char *dset_name,
-                   const double *data, int ndims, const hsize_t *dims)
+int c_write_double(int handle, const char *dset_name, const double *data,
+                   int ndims, const int *dims, const int *lbounds, int chunk)
 {
-    hid_t file, space, dset;
+    return write_dataset(handle, dset_name, H5T_NATIVE_DOUBLE, data, ndims, dims, lbounds, chunk);
+}
+
+/* Write a fixed length string (scalar) */
+int c_write_string(int handle, const char *dset_name, const char *data, int len)
+{
+    h5_session *s = get_session(handle);
+    hid_t space, str_type, dset;
     herr_t status;
 
-    file = H5Fopen(filename, H5F_ACC_RDWR, H5P_DEFAULT);
-    if(file < 0) return -1;
+    if(!s) return -1;
+    str_type = H5Tcopy(H5T_C_S1);
+    H5Tset_size(str_type, len > 0 ? (size_t)len : 1);
+    H5Tset_strpad(str_type, H5T_STR_SPACEPAD);
+    space = H5Screate(H5S_SCALAR);
+    dset = H5Dcreate2(s->file, dset_name, str_type, space, s->lcpl, H5P_DEFAULT, H5P_DEFAULT);
+    status = dset < 0 ? -1 : H5Dwrite(dset, str_type, H5S_ALL, H5S_ALL, H5P_DEFAULT, len > 0 ? data : " ");
+    if(dset >= 0) H5Dclose(dset);
+    H5Sclose(space);
+    H5Tclose(str_type);
+    return (int)status;
+}
 
-    if(ndims == 0) {
-        space = H5Screate(H5S_SCALAR);
-    } else {
-        space = H5Screate_simple(ndims, dims, NULL);
-    }
+/* Rank of dset_name and its bounds in Fortran order (lbounds default to 1).
+ * Returns the rank, or -1 if the dataset can't be read.
+ */
+int c_read_bounds(int handle, const char *dset_name, int *lbounds, int *ubounds)
+{
+    h5_session *s = get_session(handle);
+    hsize_t h5dims[MAX_DIMS];
+    hid_t dset, space;
+    int ndims, i;
 
-    dset = H5Dcreate2(file, dset_name, H5T_NATIVE_DOUBLE, space,
-                      H5P_DEFAULT, H5P_DEFAULT, H5P_DEFAULT);
+    if(!s) return -1;
+    dset = H5Dopen2(s->file, dset_name, H5P_DEFAULT);
     if(dset < 0) return -1;
+    space = H5Dget_space(dset);
+    ndims = H5Sget_simple_extent_ndims(space);
+    if(ndims > MAX_DIMS) ndims = -1;
+    if(ndims > 0) {
+        H5Sget_simple_extent_dims(space, h5dims, NULL);
+        for(i = 0; i < ndims; i++) lbounds[i] = 1;
+        if(H5Aexists(dset, "lbounds") > 0) {
+            hid_t attr = H5Aopen(dset, "lbounds", H5P_DEFAULT);
+            H5Aread(attr, H5T_NATIVE_INT, lbounds);
+            H5Aclose(attr);
+        }
+        for(i = 0; i < ndims; i++) ubounds[i] = lbounds[i] + (int)h5dims[ndims-1-i] - 1;
+    }
+    H5Sclose(space);
+    H5Dclose(dset);
+    return ndims;
+}
 
-    status = H5Dwrite(dset, H5T_NATIVE_DOUBLE, H5S_ALL, H5S_ALL, H5P_DEFAULT, data);
+static int read_dataset(int handle, const char *dset_name, hid_t mem_type, void *data,
+                        int ndims, const int *dims)
+{
+    h5_session *s = get_session(handle);
+    hsize_t h5dims[MAX_DIMS];
+    hid_t dset, space;
+    herr_t status;
+    int i, file_ndims;
 
-    H5Dclose(dset);
-    H5Sclose(space);
-    H5Fclose(file);
+    if(!s) return -1;
+    dset = H5Dopen2(s->file, dset_name, H5P_DEFAULT);
+    if(dset < 0) return -1;
 
+    /* The whole dataset is read: its shape has to match the buffer */
+    space = H5Dget_space(dset);
+    file_ndims = H5Sget_simple_extent_ndims(space);
+    status = file_ndims == ndims ? 0 : -1;
+    if(status == 0 && ndims > 0 && ndims <= MAX_DIMS) {
+        H5Sget_simple_extent_dims(space, h5dims, NULL);
+        for(i = 0; i < ndims; i++) {
+            if(h5dims[ndims-1-i] != (hsize_t)dims[i]) status = -1;
+        }
+    }
+    H5Sclose(space);
+    if(status < 0) {
+        fprintf(stderr, "hdf5_wrapper: shape of %s doesn't match the array read\n", dset_name);
+    } else {
+        status = H5Dread(dset, mem_type, H5S_ALL, H5S_ALL, H5P_DEFAULT, data);
+    }
+    H5Dclose(dset);
     return (int)status;
 }
 
-/* Similar functions can be created for reading, e.g., c_read_int and c_read_double,
-   which call H5Dread instead. */
+int c_read_int(int handle, const char *dset_name, int *data, int ndims, const int *dims)
+{
+    return read_dataset(handle, dset_name, H5T_NATIVE_INT, data, ndims, dims);
+}
 
-/* For a scalar, pass ndims = 0. For 1D, 2D, or 3D arrays, pass ndims = 1,2,3 and dims accordingly. */
+int c_read_dbl(int handle, const char *dset_name, double *data, int ndims, const int *dims)
+{
+    return read_dataset(handle, dset_name, H5T_NATIVE_DOUBLE, data, ndims, dims);
+}
+
+/* Read a string dataset into data (len characters, blank padded) */
+int c_read_string(int handle, const char *dset_name, char *data, int len)
+{
+    h5_session *s = get_session(handle);
+    hid_t dset, str_type;
+    herr_t status;
+    char *buf;
+    size_t size;
 
+    if(!s) return -1;
+    dset = H5Dopen2(s->file, dset_name, H5P_DEFAULT);
+    if(dset < 0) return -1;
+    str_type = H5Dget_type(dset);
+    size = H5Tget_size(str_type);
+    buf = malloc(size);
+    status = H5Dread(dset, str_type, H5S_ALL, H5S_ALL, H5P_DEFAULT, buf);
+    if(status >= 0) {
+        size_t n = size < (size_t)len ? size : (size_t)len;
+        memset(data, ' ', (size_t)len);
+        memcpy(data, buf, n);
+        for(size_t i = 0; i < n; i++) if(data[i] == '\0') data[i] = ' ';
+    }
+    free(buf);
+    H5Tclose(str_type);
+    H5Dclose(dset);
+    return (int)status;
+}
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import re
-import subprocess as sp
 import sys
 from typing import TYPE_CHECKING, Dict, Optional
 
@@ -13,6 +12,7 @@ if TYPE_CHECKING:
 
 from scripts.fortran_modules import get_module_name_from_file
 from scripts.mod_config import ELM_SRC, _bc, _no_colors
+from scripts.source_index import get_source_index
 from scripts.utilityFunctions import (Variable, line_unwrapper,
                                       parse_line_for_variables)
 
@@ -98,20 +98,11 @@ class DerivedType(object):
             self.filepath: str = fpath
         else:
             self.filepath: str = ""
-            cmd = rf'find {ELM_SRC}  \( -path "*external_models*" \) -prune -o  -name "{vmod}.F90"'
-            output = sp.getoutput(cmd)
-            if not output:
+            candidates = get_source_index().files_named(f"{vmod}.F90")
+            elm_files = [f for f in candidates if f.startswith(ELM_SRC)]
+            if not elm_files:
                 sys.exit(f"Couldn't locate file {vmod}")
-            else:
-                output = output.split("\n")
-                for el in output:
-                    if "external_models" not in el:
-                        self.filepath = el
-
-        if not self.filepath:
-            sys.exit(
-                f"Couldn't find file for {type_name}\ncmd:{cmd}\n" f"output: {output}\n"
-            )
+            self.filepath = elm_files[-1]
 
         self.declaration = vmod
         self.components: dict[str, Variable] = {}
@@ -128,27 +119,22 @@ class DerivedType(object):
 
     def find_instances(self, mod_dict: dict[str,FortranModule]):
         # Find all instances of the derived type:
-        grep = "grep -rin --exclude-dir=external_models/"
-        cmd = (
-            rf'{grep} "type\s*(\s*{self.type_name}\s*)" {ELM_SRC}* | grep "::" | grep -v "intent"'
-        )
-        output = sp.getoutput(cmd)
+        decls = get_source_index().type_instance_decls(self.type_name)
 
         regex_paren = re.compile(r"\((.+)\)")
         #
-        # Each element in output should have the format:
-        # <filepath> : <ln> : type(<type_name>) :: <instance_name>
+        # Each declaration line should have the format:
+        # type(<type_name>) :: <instance_name>
         instance_list = {}
-        if not output:
+        if not decls:
             return
 
-        output = output.split("\n")
-        for el in output:
-            inst_name = el.split("::")[-1]
+        for decl in decls:
+            inst_name = decl.line.split("::")[-1]
             inst_name = inst_name.split("!")[0].strip().lower()
 
-            filepath = el.split(":")[0].strip()
-            ln = int(el.split(":")[1].strip())
+            filepath = decl.fpath
+            ln = decl.ln
             _, module_name = get_module_name_from_file(filepath)
             if module_name not in mod_dict:
                 end_of_head_ln = find_module_head_end(module_name, filepath)
@@ -446,26 +432,9 @@ def find_module_head_end(mod: str,file_path: str)->int:
     
     if mod in dg.map_module_head:
         return dg.map_module_head[mod]
-    in_type = False 
-    type_start = re.compile(r"^(type\s+)(?!\()", re.IGNORECASE) 
-    type_end   = re.compile(r'\bend\s+type\b', re.IGNORECASE)
-    contains   = re.compile(r'\bcontains\b', re.IGNORECASE)
-    end_head_ln = -1
-    with open(file_path, 'r') as f:
-        for lineno, line in enumerate(f, start=1):
-            line = line.strip().lower()
-            end_head_ln = lineno
-            # If entering a derived type declaration, set the flag.
-            # If we're inside a type and see the end of it, clear the flag.
-            if type_start.search(line):
-                in_type = True
-            if in_type and type_end.search(line):
-                in_type = False
-            if not in_type and contains.search(line):
-                break
-
+    end_head_ln = get_source_index().module_head_end(file_path)
     if end_head_ln == -1:
         print("Error -- couldn't iterate through file", file_path)
         sys.exit(1)
+    dg.map_module_head[mod] = end_head_ln
     return end_head_ln
-
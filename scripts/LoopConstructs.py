@@ -3,10 +3,15 @@ Module that holds the Loop Class
 that is used to parse subroutines
 """
 
+from __future__ import annotations
+
 import re
 import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from scripts.analyze_subroutines import Subroutine
 
-from scripts.analyze_subroutines import Subroutine
 from scripts.mod_config import _bc
 from scripts.utilityFunctions import lineContinuationAdjustment
 
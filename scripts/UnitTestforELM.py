@@ -1,12 +1,18 @@
 import logging
+import os
+import sys
+import time
 from pprint import pprint
+from typing import Optional
 
 import scripts.dynamic_globals as dg
-from scripts.aggregate import aggregate_dtype_vars
+from scripts.aggregate import aggregate_dtype_vars, state_field_sets
 from scripts.analyze_subroutines import Subroutine
+from scripts.dataflow import analyze_call_graph
 from scripts.DerivedType import DerivedType
 from scripts.fortran_modules import FortranModule, get_filename_from_module
 from scripts.helper_functions import construct_call_tree
+from scripts.io.netcdf_io import NcStorage
 from scripts.logging_configs import get_logger
 from scripts.mod_config import (
     _bc,
@@ -16,6 +22,7 @@ from scripts.mod_config import (
     spel_output_dir,
     unittests_dir,
 )
+from scripts.types import CallTuple
 from scripts.utilityFunctions import Variable
 from scripts.variable_analysis import determine_global_variable_status
 
@@ -24,14 +31,27 @@ SubDict = dict[str, Subroutine]
 TypeDict = dict[str, DerivedType]
 
 
-def create_unit_test(sub_names: list[str], casename: str, keep: bool) -> None:
+def create_unit_test(
+    sub_names: list[str],
+    casename: str,
+    keep: bool,
+    jobs: int = 1,
+    nc_storage: Optional[NcStorage] = None,
+    parallel_io: bool = False,
+    split_io: bool = False,
+    summary_cache: bool = True,
+) -> None:
     """
     Edit case_dir and sub_name_list to create a Functional Unit Test
     in a directory called {case_dir} for the subroutines in sub_name_list.
+    `jobs` processes are used to parse the module files.
+    `nc_storage` sets the chunking/compression of the elmtypes netcdf files.
+    `parallel_io` reads them in parallel, each MPI rank reading its own slab
+    and writing its results to its own file (fut-results-<rank>.nc).
+    `split_io` only reads the fields read by the unit test and only writes
+    the fields it writes for verification (see state_field_sets).
+    `summary_cache` reuses the cached read/write summaries (see dataflow).
     """
-    import os
-    import sys
-
     import scripts.write_routines as wr
     from scripts.edit_files import process_for_unit_test
     from scripts.export_objects import pickle_unit_test
@@ -97,6 +117,7 @@ def create_unit_test(sub_names: list[str], casename: str, keep: bool) -> None:
         sub_name_list=sub_name_list,
         overwrite=True,
         verbose=False,
+        jobs=jobs,
     )
 
     for s in sub_name_list:
@@ -107,32 +128,14 @@ def create_unit_test(sub_names: list[str], casename: str, keep: bool) -> None:
         logger.error(f"{func_name}Error didn't find any modules related to subroutines")
         sys.exit(1)
 
-    type_dict: TypeDict = {}
-    for mod in mod_dict.values():
-        for utype, dtype in mod.defined_types.items():
-            type_dict[utype] = dtype
-
-    for dtype in type_dict.values():
-        dtype.find_instances(mod_dict)
-
-    bounds_inst = Variable(type="bounds_type", name="bounds", dim=0, subgrid="?", ln=-1)
-    type_dict["bounds_type"].instances["bounds"] = bounds_inst.copy()
-
-    instance_to_user_type: dict[str, str] = {}
-    for type_name, dtype in type_dict.items():
-        if "bounds" in type_name:
-            continue
-        # All instances should have been found so throw an error
-        if not dtype.instances:
-            logger.warning(f"Warning: no instances found for {type_name}")
-        for instance in dtype.instances.values():
-            instance_to_user_type[instance.name] = type_name
+    type_dict, instance_to_user_type = collect_types(mod_dict)
 
     main_sub_dict["setfilters"].unit_test_function = True
     process_subroutines_for_unit_test(
         mod_dict=mod_dict,
         sub_dict=main_sub_dict,
         type_dict=type_dict,
+        summary_cache=summary_cache,
     )
 
     aggregate_dtype_vars(
@@ -163,7 +166,7 @@ def create_unit_test(sub_names: list[str], casename: str, keep: bool) -> None:
 
     # Create a makefile for the unit test
     file_list = [get_filename_from_module(m) for m in ordered_mods]
-    wr.generate_cmake(files=file_list, case_dir=case_dir)
+    wr.generate_cmake(files=file_list, case_dir=case_dir, parallel_io=parallel_io)
 
     logger.info(f"Call Tree for {case_dir}")
     for sub in subroutines.values():
@@ -192,6 +195,9 @@ def create_unit_test(sub_names: list[str], casename: str, keep: bool) -> None:
         global_vars=unittest_global_vars,
         subroutines=subroutines,
         instance_to_type=instance_to_user_type,
+        nc_storage=nc_storage,
+        parallel_io=parallel_io,
+        state_fields=state_field_sets(main_sub_dict) if split_io else None,
     )
     # elm_instMod.F90
     wr.write_elminstMod(type_dict, case_dir)
@@ -223,17 +229,142 @@ def create_unit_test(sub_names: list[str], casename: str, keep: bool) -> None:
     return None
 
 
+def collect_types(mod_dict: ModDict) -> tuple[TypeDict, dict[str, str]]:
+    """
+    Gather the user types defined in mod_dict and find their instances.
+    Returns the type_dict and the map of instance name to type name.
+    """
+    logger = get_logger("SPEL")
+    type_dict: TypeDict = {}
+    for mod in mod_dict.values():
+        for utype, dtype in mod.defined_types.items():
+            type_dict[utype] = dtype
+
+    for dtype in type_dict.values():
+        dtype.find_instances(mod_dict)
+
+    bounds_inst = Variable(type="bounds_type", name="bounds", dim=0, subgrid="?", ln=-1)
+    type_dict["bounds_type"].instances["bounds"] = bounds_inst.copy()
+
+    instance_to_user_type: dict[str, str] = {}
+    for type_name, dtype in type_dict.items():
+        if "bounds" in type_name:
+            continue
+        # All instances should have been found so throw an error
+        if not dtype.instances:
+            logger.warning(f"Warning: no instances found for {type_name}")
+        for instance in dtype.instances.values():
+            instance_to_user_type[instance.name] = type_name
+
+    return type_dict, instance_to_user_type
+
+
+def elm_subroutines() -> list[str]:
+    """
+    Names of the subroutines defined in ELM modules, in source order.
+    """
+    from scripts.mod_config import ELM_SRC
+    from scripts.source_index import get_source_index
+
+    index = get_source_index()
+    sub_names: list[str] = []
+    for fpath, findex in index.files.items():
+        if not fpath.startswith(ELM_SRC) or not findex.modules:
+            continue
+        for proc in findex.subroutines:
+            # Names defined more than once resolve to the first definition
+            if index.subroutines[proc.name].fpath == fpath:
+                sub_names.append(proc.name)
+    return sub_names
+
+
+def analyze_all(
+    casename: str = "analyze_all", jobs: int = 1, summary_cache: bool = True
+) -> None:
+    """
+    Analyze every ELM subroutine in one run. The whole ELM tree is parsed
+    once into shared mod/sub/type dicts, every subroutine is processed as a
+    unit test function (child call trees and variable analysis are shared)
+    and the results are written to a single artifact for the E3SM commit.
+    The modified files are written to {unittests_dir}/{casename}.
+    """
+    from scripts.edit_files import process_for_unit_test
+    from scripts.export_objects import pickle_unit_test
+
+    logger = get_logger("SPEL", level=logging.INFO)
+    case_dir = unittests_dir + casename
+    os.makedirs(f"{scripts_dir}/script-output", exist_ok=True)
+    os.makedirs(case_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    dg.populate_interface_list()
+    sub_name_list = elm_subroutines()
+    if not sub_name_list:
+        sys.exit("Error- No ELM subroutines found")
+    logger.info(f"Analyzing {len(sub_name_list)} ELM subroutines")
+
+    mod_dict: ModDict = {}
+    sub_dict: SubDict = {}
+    process_for_unit_test(
+        case_dir=case_dir,
+        mod_dict=mod_dict,
+        mods=[],
+        required_mods=default_mods,
+        sub_dict=sub_dict,
+        sub_name_list=sub_name_list,
+        overwrite=True,
+        verbose=False,
+        jobs=jobs,
+    )
+    parse_time = time.perf_counter() - start
+    logger.info(f"Parsed {len(mod_dict)} modules in {parse_time:.1f} s")
+
+    fut_subs = [name for name in sub_name_list if name in sub_dict]
+    if len(fut_subs) < len(sub_name_list):
+        missing = sorted(set(sub_name_list) - set(fut_subs))
+        logger.warning(f"Warning: {len(missing)} subroutines weren't parsed: {' '.join(missing)}")
+    for name in fut_subs:
+        sub_dict[name].unit_test_function = True
+    sub_dict["setfilters"].unit_test_function = True
+
+    type_dict, instance_to_user_type = collect_types(mod_dict)
+    process_subroutines_for_unit_test(
+        mod_dict=mod_dict,
+        sub_dict=sub_dict,
+        type_dict=type_dict,
+        summary_cache=summary_cache,
+    )
+    aggregate_dtype_vars(
+        sub_dict=sub_dict,
+        type_dict=type_dict,
+        inst_to_dtype_map=instance_to_user_type,
+    )
+    analysis_time = time.perf_counter() - start - parse_time
+
+    pickle_unit_test(mod_dict, sub_dict, type_dict)
+
+    total = time.perf_counter() - start
+    logger.info(
+        f"Analyzed {len(fut_subs)} subroutines in {total:.1f} s"
+        f" (parse {parse_time:.1f} s, analysis {analysis_time:.1f} s):"
+        f" {len(fut_subs) / total:.1f} subroutines/s"
+    )
+    return None
+
+
 def process_subroutines_for_unit_test(
     mod_dict: ModDict,
     sub_dict: SubDict,
     type_dict: TypeDict,
+    summary_cache: bool = True,
 ):
     """
     Function that processes the subroutines found in each FortranModule
         1) identify any non derived-type global vars used by Subroutine
         2) collect derived-type var and subroutine call info
         3) construct subroutine call trees (abstract=child subs represented only once)
-        4) analyze status of variables used by subroutines.
+        4) analyze status of variables used by subroutines (see dataflow),
+           reusing cached summaries if summary_cache is set.
     """
     fut_subs: set[str] = {
         sub.name for sub in sub_dict.values() if sub.unit_test_function
@@ -246,30 +377,35 @@ def process_subroutines_for_unit_test(
         if dtype.init_sub_name:
             dtype.init_sub_ptr = sub_dict[dtype.init_sub_name]
 
+    # Call lists of the subroutines whose trees are built, shared by all
+    # unit test functions so common subtrees are only walked once.
+    call_lists: dict[str, list[CallTuple]] = {}
     for sub_name in fut_subs:
         sub = sub_dict[sub_name]
-        sub.collect_var_and_call_info(
-            dtype_dict=type_dict,
-            sub_dict=sub_dict,
-            verbose=False,
-        )
+        # Already collected if it's called by a previous unit test function
+        if not sub.preprocessed:
+            sub.collect_var_and_call_info(
+                dtype_dict=type_dict,
+                sub_dict=sub_dict,
+                verbose=False,
+            )
         flat_list = construct_call_tree(
             sub=sub,
             sub_dict=sub_dict,
             dtype_dict=type_dict,
             nested=0,
+            memo=call_lists,
         )
 
-        if sub.abstract_call_tree:
-            for tree in sub.abstract_call_tree.traverse_postorder():
-                subname = tree.node.subname
-                childsub = sub_dict[subname]
-                if childsub.library:
-                    continue
-                if not childsub.args_analyzed:
-                    childsub.parse_arguments(sub_dict, type_dict)
-                if not childsub.global_analyzed:
-                    childsub.analyze_variables(sub_dict, type_dict)
+    # Read/write summaries of every subroutine in the call trees, callees first
+    num_analyzed, num_cached = analyze_call_graph(
+        roots=[sub_dict[name] for name in sorted(fut_subs)],
+        sub_dict=sub_dict,
+        type_dict=type_dict,
+        use_cache=summary_cache,
+    )
+    logger = get_logger("SPEL")
+    logger.info(f"Read/write summaries: {num_analyzed} analyzed, {num_cached} cached")
 
     for sub in sub_dict.values():
         sub.match_arg_to_inst(type_dict)
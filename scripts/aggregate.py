@@ -4,6 +4,7 @@ from typing import NamedTuple
 
 from scripts.analyze_subroutines import Subroutine
 from scripts.DerivedType import DerivedType
+from scripts.io.netcdf_io import StateFields
 from scripts.utilityFunctions import Variable
 
 
@@ -44,6 +45,33 @@ def aggregate_dtype_vars(
     return
 
 
+def state_field_sets(sub_dict: dict[str, Subroutine]) -> StateFields:
+    """
+    Splits the elmtype fields accessed in the call trees of the unit-test
+    subroutines into the fields read (inputs of the unit test) and written
+    (compared against the reference). The order of the accesses between
+    subroutines isn't known, so a field read anywhere is an input.
+    """
+    regex_paren = re.compile(r"\((.+)\)")
+    inputs: set[str] = set()
+    outputs: set[str] = set()
+    for sub in sub_dict.values():
+        if not sub.unit_test_function or not sub.abstract_call_tree:
+            continue
+        for node in sub.abstract_call_tree.traverse_postorder():
+            node_sub = sub_dict[node.node.subname]
+            for var, status in node_sub.elmtype_access_sum.items():
+                if "%" not in var:
+                    continue
+                inst, component = var.split("%", 1)
+                name = f"{regex_paren.sub('', inst)}%{component.split('%')[-1]}"
+                if "r" in status:
+                    inputs.add(name)
+                if "w" in status:
+                    outputs.add(name)
+    return StateFields(inputs=inputs, outputs=outputs)
+
+
 def set_active_variables(
     type_dict: dict[str, DerivedType],
     type_lookup: dict[str, str],
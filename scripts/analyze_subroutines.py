@@ -1384,28 +1384,32 @@ class Subroutine(object):
             full_name = self.associate_vars[key]
             ptr_status = args_accessed.pop(key, None)
             if ptr_status:
-                args_accessed.setdefault(full_name,[]).extend(ptr_status)
+                merge_status_list(full_name, args_accessed, ptr_status)
 
         self.arg_access_by_ln = args_accessed.copy()
         # All args should have been processed. Store information into Subroutine
+        # (swapped in at the end so recursive calls see the previous pass)
+        arguments_read_write: dict[str, ReadWrite] = {}
         arg_status_summary = summarize_read_write_status(args_accessed)
         for arg, status in arg_status_summary.items():
-            self.arguments_read_write[arg] = ReadWrite(status, -999)
+            arguments_read_write[arg] = ReadWrite(status, -999)
             if '%' in arg:
                 inst,_ = arg.split('%')
-                if inst not in self.arguments_read_write:
-                    self.arguments_read_write[inst] = ReadWrite(status, -999)
+                if inst not in arguments_read_write:
+                    arguments_read_write[inst] = ReadWrite(status, -999)
                 else:
-                    val = self.arguments_read_write[inst].status
+                    val = arguments_read_write[inst].status
                     cstat = combine_status(status, val)
-                    self.arguments_read_write[inst].status = cstat
+                    arguments_read_write[inst].status = cstat
 
-        if not self.arguments_read_write and not self.Arguments:
+        if not arguments_read_write and not self.Arguments:
             print(f"{func_name}::ERROR: Failed to analyze arguments for {self.name}")
             sys.exit(1)
 
         for arg in self.Arguments:
-            if arg not in self.arguments_read_write:
-                self.arguments_read_write[arg] = ReadWrite('-',-999)
+            if arg not in arguments_read_write:
+                arguments_read_write[arg] = ReadWrite('-',-999)
+        self.arguments_read_write = arguments_read_write
+        self.args_analyzed = True
         return None
 
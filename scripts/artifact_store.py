@@ -0,0 +1,277 @@
+"""
+Versioned store for SPEL's parsed objects (modules, subroutines, derived types).
+
+Each E3SM commit gets a SQLite database with one record per object, indexed by
+(kind, name). Objects are pickled individually: references to other stored
+objects (e.g., Subroutine.child_subroutines) are saved as (kind, name) keys and
+re-linked on load, so a single subroutine or type can be loaded on demand and
+several unit-test runs for the same commit are merged without duplication.
+Stored objects that are only reachable through references get a record too.
+
+File paths are stored relative to E3SM_SRCROOT.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import pickle
+import sqlite3
+import sys
+from typing import Any, Iterator, Optional
+
+from scripts.mod_config import E3SM_SRCROOT, scripts_dir
+
+ARTIFACT_VERSION = 1
+
+MOD = "mod"
+SUB = "sub"
+TYPE = "type"
+
+
+def stored_classes() -> dict[str, type]:
+    from scripts.analyze_subroutines import Subroutine
+    from scripts.DerivedType import DerivedType
+    from scripts.fortran_modules import FortranModule
+
+    return {MOD: FortranModule, SUB: Subroutine, TYPE: DerivedType}
+
+
+def name_of(kind: str, obj: Any) -> str:
+    """Key used in mod_dict/sub_dict/type_dict"""
+    if kind == TYPE:
+        return obj.type_name
+    return obj.name
+
+
+def module_of(kind: str, obj: Any) -> str:
+    """Module column of the index"""
+    if kind == MOD:
+        return obj.name
+    if kind == SUB:
+        return obj.module
+    return obj.declaration
+
+
+class MissingArtifactError(KeyError):
+    """A stored object references a record that isn't in the store"""
+
+
+class _RecordPickler(pickle.Pickler):
+    """
+    Pickles the state of one object. Any stored object reached from it
+    (including itself) is replaced by its (kind, name) key. Objects that
+    aren't in keys are added to reached, so they get their own record.
+    """
+
+    def __init__(
+        self,
+        file,
+        keys: dict[int, tuple[str, str]],
+        classes: dict[str, type],
+        reached: dict[tuple[str, str], Any],
+    ):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.keys = keys
+        self.kinds = {cls: kind for kind, cls in classes.items()}
+        self.reached = reached
+
+    def persistent_id(self, obj):
+        key = self.keys.get(id(obj))
+        if key is None and type(obj) in self.kinds:
+            kind = self.kinds[type(obj)]
+            key = (kind, name_of(kind, obj))
+            self.reached.setdefault(key, obj)
+        return key
+
+
+class _RecordUnpickler(pickle.Unpickler):
+    def __init__(self, file, store: ArtifactStore):
+        super().__init__(file)
+        self.store = store
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        return self.store._shell(kind, name)
+
+
+class ArtifactStore:
+    """
+    Usage:
+        store = ArtifactStore(commit)
+        store.put_objects(mod_dict, sub_dict, type_dict)
+        sub = store.get(SUB, "soilwater")
+    """
+
+    def __init__(self, commit: str, store_dir: str = scripts_dir):
+        self.commit: str = commit
+        self.path: str = os.path.join(store_dir, f"artifacts-{commit}.sqlite")
+        self.conn = sqlite3.connect(self.path)
+        self.classes = stored_classes()
+        # (kind, name) -> loaded object. Shared by every load so references are re-linked
+        self._memo: dict[tuple[str, str], Any] = {}
+        self._pending: list[tuple[str, str]] = []
+        self._init_schema()
+
+    @staticmethod
+    def exists(commit: str, store_dir: str = scripts_dir) -> bool:
+        return os.path.exists(os.path.join(store_dir, f"artifacts-{commit}.sqlite"))
+
+    def __repr__(self):
+        return f"ArtifactStore({self.path})"
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS objects (
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    module TEXT,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (kind, name)
+                )"""
+            )
+            row = self.conn.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('version', ?)",
+                    (str(ARTIFACT_VERSION),),
+                )
+            elif int(row[0]) != ARTIFACT_VERSION:
+                print(
+                    f"Error: {self.path} has version {row[0]}, expected {ARTIFACT_VERSION}.\n"
+                    "Remove it and re-run spel create."
+                )
+                sys.exit(1)
+
+    def close(self):
+        self.conn.close()
+
+    def put_objects(
+        self,
+        mod_dict: dict[str, Any],
+        sub_dict: dict[str, Any],
+        type_dict: dict[str, Any],
+    ):
+        """
+        Add or replace the records for every object. Objects already stored
+        from another run that aren't in these dicts are kept.
+        Objects only referenced from the dicts are stored unless a record
+        for them already exists.
+        """
+        kinds = {MOD: mod_dict, SUB: sub_dict, TYPE: type_dict}
+        keys = {id(obj): (kind, name) for kind, objs in kinds.items() for name, obj in objs.items()}
+        reached: dict[tuple[str, str], Any] = {}
+        rows = []
+        for kind, objs in kinds.items():
+            for name, obj in objs.items():
+                rows.append(self._record(kind, name, obj, keys, reached))
+
+        # Records of the referenced objects, which may reference more objects
+        stored = set(keys.values())
+        extra_rows = []
+        while True:
+            new = [key for key in reached if key not in stored]
+            if not new:
+                break
+            for key in new:
+                stored.add(key)
+                keys[id(reached[key])] = key
+            for key in new:
+                extra_rows.append(self._record(*key, reached[key], keys, reached))
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO objects (kind, name, module, data) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO objects (kind, name, module, data) VALUES (?, ?, ?, ?)",
+                extra_rows,
+            )
+        self._memo.clear()
+
+    def _record(
+        self,
+        kind: str,
+        name: str,
+        obj: Any,
+        keys: dict[int, tuple[str, str]],
+        reached: dict[tuple[str, str], Any],
+    ) -> tuple[str, str, str, bytes]:
+        state = dict(obj.__dict__)
+        if state.get("filepath"):
+            state["filepath"] = state["filepath"].replace(E3SM_SRCROOT, "")
+        buf = io.BytesIO()
+        _RecordPickler(buf, keys, self.classes, reached).dump(state)
+        return (kind, name, module_of(kind, obj), buf.getvalue())
+
+    def names(self, kind: str) -> list[str]:
+        rows = self.conn.execute("SELECT name FROM objects WHERE kind=? ORDER BY rowid", (kind,))
+        return [name for (name,) in rows]
+
+    def index(self, kind: str) -> list[tuple[str, str]]:
+        """
+        Returns (name, module) for every object of kind without loading them
+        """
+        rows = self.conn.execute(
+            "SELECT name, module FROM objects WHERE kind=? ORDER BY rowid", (kind,)
+        )
+        return list(rows)
+
+    def _shell(self, kind: str, name: str):
+        key = (kind, name)
+        obj = self._memo.get(key)
+        if obj is None:
+            cls = self.classes[kind]
+            obj = cls.__new__(cls)
+            self._memo[key] = obj
+            self._pending.append(key)
+        return obj
+
+    def _fill(self, kind: str, name: str):
+        row = self.conn.execute(
+            "SELECT data FROM objects WHERE kind=? AND name=?", (kind, name)
+        ).fetchone()
+        if row is None:
+            raise MissingArtifactError(f"{kind} {name} not in {self.path}")
+        state = _RecordUnpickler(io.BytesIO(row[0]), self).load()
+        if state.get("filepath"):
+            state["filepath"] = E3SM_SRCROOT + state["filepath"]
+        self._memo[(kind, name)].__dict__.update(state)
+
+    def get(self, kind: str, name: str) -> Optional[Any]:
+        """
+        Load a single object along with the stored objects it references.
+        Returns None if there's no such record, raises MissingArtifactError
+        if a referenced record is missing.
+        """
+        key = (kind, name)
+        if key in self._memo and not self._pending:
+            return self._memo[key]
+        if not self.conn.execute(
+            "SELECT 1 FROM objects WHERE kind=? AND name=?", key
+        ).fetchone():
+            return None
+        obj = self._shell(kind, name)
+        while self._pending:
+            key = self._pending.pop()
+            try:
+                self._fill(*key)
+            except MissingArtifactError:
+                # Drop the objects that couldn't be filled
+                for pending in [key, *self._pending]:
+                    self._memo.pop(pending, None)
+                self._pending.clear()
+                raise
+        return obj
+
+    def iter_objects(self, kind: str) -> Iterator[tuple[str, Any]]:
+        for name in self.names(kind):
+            yield name, self.get(kind, name)
+
+    def load_all(self, kind: str) -> dict[str, Any]:
+        return dict(self.iter_objects(kind))
@@ -0,0 +1,148 @@
+"""
+Benchmark of the HDF5 session handle of hdf5_wrapper.c on a synthetic ELM
+state.
+
+    python -m scripts.benchmarks.bench_h5_session [--columns 20000] [--copies 20]
+        [--driver SourceFiles/tests/test_h5_session]
+
+The comparison runs use h5py as a proxy: the same HDF5 calls as the
+wrapper, not hdf5_wrapper.c/H5InterfaceMod themselves. They compare opening
+and closing the file for every dataset (the previous
+c_write_int/c_write_double) with one open file per write/read, the fields
+stored in the group of their instance ('col_pp/snl'), then the session with
+chunked+zlib+shuffle arrays. Each field is repeated --copies times to get
+the number of datasets of a real unit test. Checks that all read back
+identical values.
+
+With --driver, the Fortran session API is timed as well: the driver
+(`make test_h5_session` in SourceFiles/tests) writes and reads --copies
+(columns, 15) arrays with h5_put/h5_get in one session.
+"""
+
+import argparse
+import os
+import subprocess as sp
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from scripts.benchmarks.bench_nc_layout import make_state
+
+
+def make_datasets(num_columns: int, copies: int) -> dict[str, np.ndarray]:
+    """
+    'inst/field' datasets: the fields of make_state, copies times
+    """
+    datasets = {}
+    for varname, (_, data) in make_state(num_columns).items():
+        inst, field = varname.split("__")
+        for i in range(copies):
+            datasets[f"{inst}/{field}_{i}"] = data
+    return datasets
+
+
+def write_reopen(fn: str, datasets, chunk: int, deflate: int, shuffle: bool) -> float:
+    # Arrays are stored in Fortran order, as the wrapper does
+    start = time.perf_counter()
+    h5py.File(fn, "w").close()
+    for name, data in datasets.items():
+        with h5py.File(fn, "r+") as f:
+            f.create_dataset(name, data=data.T)
+    return time.perf_counter() - start
+
+
+def write_session(fn: str, datasets, chunk: int, deflate: int, shuffle: bool) -> float:
+    start = time.perf_counter()
+    with h5py.File(fn, "w") as f:
+        for name, data in datasets.items():
+            kwargs = {}
+            if chunk or deflate or shuffle:
+                kwargs["chunks"] = (*data.shape[:0:-1], min(chunk, data.shape[0]) if chunk else data.shape[0])
+                kwargs["shuffle"] = shuffle
+                if deflate:
+                    kwargs["compression"] = "gzip"
+                    kwargs["compression_opts"] = deflate
+            f.create_dataset(name, data=data.T, **kwargs)
+    return time.perf_counter() - start
+
+
+def read_reopen(fn: str, datasets) -> tuple[float, dict]:
+    start = time.perf_counter()
+    values = {}
+    for name in datasets:
+        with h5py.File(fn, "r") as f:
+            values[name] = f[name][()].T
+    return time.perf_counter() - start, values
+
+
+def read_session(fn: str, datasets) -> tuple[float, dict]:
+    start = time.perf_counter()
+    values = {}
+    with h5py.File(fn, "r") as f:
+        for name in datasets:
+            values[name] = f[name][()].T
+    return time.perf_counter() - start, values
+
+
+def time_driver(driver: str, fn: str, num_columns: int, copies: int) -> tuple[float, float]:
+    """
+    Returns the write and read times reported by the TestH5Session driver
+    """
+    result = sp.run([driver, fn, str(num_columns), str(copies)], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{driver} failed:\n{result.stdout}{result.stderr}")
+    # Last line: " write <s> read <s>"
+    words = result.stdout.splitlines()[-1].split()
+    return float(words[words.index("write") + 1]), float(words[words.index("read") + 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--columns", type=int, default=20000, help="number of columns")
+    parser.add_argument("--copies", type=int, default=20, help="copies of each field")
+    parser.add_argument("--chunk", type=int, default=4096, help="chunk length of the subgrid dimension")
+    parser.add_argument("--deflate", type=int, default=4, help="zlib level")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--driver", help="TestH5Session executable to time the Fortran session API")
+    args = parser.parse_args()
+
+    datasets = make_datasets(args.columns, args.copies)
+    runs = [
+        ("open per dataset", write_reopen, read_reopen, 0, 0, False),
+        ("session", write_session, read_session, 0, 0, False),
+        ("session+zlib+shuffle", write_session, read_session, args.chunk, args.deflate, True),
+    ]
+
+    print(f"HDF5 state files ({args.columns} columns, {len(datasets)} datasets)")
+    reference = None
+    same = True
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, write, read, chunk, deflate, shuffle in runs:
+            fn = os.path.join(tmpdir, "state.h5")
+            write_time = min(write(fn, datasets, chunk, deflate, shuffle) for _ in range(args.repeat))
+            size = os.path.getsize(fn) / 1.0e6
+            read_time = None
+            for _ in range(args.repeat):
+                elapsed, values = read(fn, datasets)
+                read_time = elapsed if read_time is None else min(read_time, elapsed)
+
+            if reference is None:
+                reference = values
+            same = same and all(np.array_equal(values[k], reference[k]) for k in datasets)
+            print(f"  {label:>22}: {size:9.2f} MB  write {write_time:7.3f} s  read {read_time:7.3f} s")
+        print(f"  identical results: {same}")
+
+        if args.driver:
+            fn = os.path.join(tmpdir, "driver.h5")
+            times = [time_driver(args.driver, fn, args.columns, args.copies) for _ in range(args.repeat)]
+            write_time = min(t[0] for t in times)
+            read_time = min(t[1] for t in times)
+            size = os.path.getsize(fn) / 1.0e6
+            print(f"H5InterfaceMod session ({args.copies} (columns, 15) arrays)")
+            print(f"  {'h5_put/h5_get':>22}: {size:9.2f} MB  write {write_time:7.3f} s  read {read_time:7.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark of the netCDF-4 storage options of the elmtypes state files
+(spel create --chunk/--deflate/--shuffle) on a synthetic ELM state.
+
+    python -m scripts.benchmarks.bench_nc_layout [--columns 100000] [--chunk 4096] [--deflate 4]
+
+Writes the same column/patch fields with each layout (same chunking as
+define_vars: subgrid dimension cut in chunks, levels kept whole) and
+reports the file size, the time to read every field and the time to read
+one clump-sized slice of every field, checking that all layouts read back
+identical values.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import netCDF4
+import numpy as np
+
+# ELM-like level dimensions
+NLEVSNO = 5
+NLEVGRND = 15
+PATCHES_PER_COLUMN = 4
+FILL_DOUBLE = 1.0e36
+
+
+def make_state(num_columns: int, seed: int = 0) -> dict[str, tuple[tuple[str, ...], np.ndarray]]:
+    """
+    Synthetic fields: smooth profiles with noise, integer/flag arrays and
+    snow layers that are mostly fill values, as in the real state.
+    """
+    rng = np.random.default_rng(seed)
+    num_patches = num_columns * PATCHES_PER_COLUMN
+    levels = np.linspace(0.0, 1.0, NLEVSNO + NLEVGRND)
+    t_soisno = 273.15 + 10.0 * levels[None, :] + rng.normal(0.0, 0.5, (num_columns, levels.size))
+    snl = rng.integers(-NLEVSNO, 1, num_columns).astype(np.int32)
+    t_soisno[:, :NLEVSNO][np.arange(NLEVSNO)[None, :] < NLEVSNO + snl[:, None]] = FILL_DOUBLE
+    return {
+        "col_es__t_soisno": (("column", "levtot"), t_soisno),
+        "col_ws__h2osoi_liq": (("column", "levtot"), np.abs(rng.normal(10.0, 3.0, t_soisno.shape))),
+        "col_pp__snl": (("column",), snl),
+        "col_pp__active": (("column",), (rng.random(num_columns) > 0.1).astype(np.int32)),
+        "veg_es__t_veg": (("patch",), 280.0 + rng.normal(0.0, 2.0, num_patches)),
+        "veg_pp__itype": (("patch",), rng.integers(0, 17, num_patches).astype(np.int32)),
+    }
+
+
+def write_state(fn: str, state, chunk: int, deflate: int, shuffle: bool) -> float:
+    start = time.perf_counter()
+    with netCDF4.Dataset(fn, "w", format="NETCDF4") as nc:
+        for dims, data in state.values():
+            for name, size in zip(dims, data.shape):
+                if name not in nc.dimensions:
+                    nc.createDimension(name, size)
+        for varname, (dims, data) in state.items():
+            kwargs = {"contiguous": True}
+            if chunk or deflate or shuffle:
+                kwargs = {"zlib": deflate > 0, "complevel": max(deflate, 1), "shuffle": shuffle}
+                if chunk:
+                    kwargs["chunksizes"] = (min(chunk, data.shape[0]), *data.shape[1:])
+            var = nc.createVariable(varname, data.dtype, dims, **kwargs)
+            var[:] = data
+    return time.perf_counter() - start
+
+
+def read_state(fn: str, state, clump: slice = slice(None)) -> tuple[float, dict]:
+    start = time.perf_counter()
+    values = {}
+    with netCDF4.Dataset(fn, "r") as nc:
+        for varname in state:
+            values[varname] = nc.variables[varname][clump, ...].data
+    return time.perf_counter() - start, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--columns", type=int, default=100000, help="number of columns")
+    parser.add_argument("--chunk", type=int, default=4096, help="chunk length of the subgrid dimension")
+    parser.add_argument("--deflate", type=int, default=4, help="zlib level")
+    parser.add_argument("--clump", type=int, default=2000, help="columns in the partial read")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    args = parser.parse_args()
+
+    state = make_state(args.columns)
+    layouts = [
+        ("contiguous", 0, 0, False),
+        ("chunked", args.chunk, 0, False),
+        ("chunked+zlib", args.chunk, args.deflate, False),
+        ("chunked+zlib+shuffle", args.chunk, args.deflate, True),
+    ]
+    clump = slice(args.columns // 2, args.columns // 2 + args.clump)
+
+    print(f"netCDF-4 layouts ({args.columns} columns, {len(state)} fields)")
+    reference = None
+    same = True
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, chunk, deflate, shuffle in layouts:
+            fn = os.path.join(tmpdir, f"{label}.nc")
+            write = min(write_state(fn, state, chunk, deflate, shuffle) for _ in range(args.repeat))
+            size = os.path.getsize(fn) / 1.0e6
+            read = None
+            for _ in range(args.repeat):
+                elapsed, values = read_state(fn, state)
+                read = elapsed if read is None else min(read, elapsed)
+            partial = min(read_state(fn, state, clump)[0] for _ in range(args.repeat))
+
+            if reference is None:
+                reference = values
+            same = same and all(np.array_equal(values[k], reference[k]) for k in state)
+            print(
+                f"  {label:>22}: {size:9.2f} MB  write {write:7.3f} s"
+                f"  read {read:7.3f} s  read clump {partial * 1e3:8.2f} ms"
+            )
+    print(f"  identical results: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark of the PassManager used by modify_file on a synthetic module.
+
+    python -m scripts.benchmarks.bench_pass_manager [--lines 50000]
+
+Reports lines/second for the combined-regex engine and for testing each
+pass in turn, both for PassManager.run and for PassManager.match alone,
+and checks that both comment out the same lines.
+"""
+
+import argparse
+import logging
+import time
+
+from scripts.edit_files import (bad_subroutines, compile_bad_sub_regexes,
+                                create_parse_state, create_pass_manager,
+                                handle_bad_inst, parse_bad_inst,
+                                parse_sub_call, set_comment)
+from scripts.logging_configs import get_logger, set_logger_level
+from scripts.types import LineTuple, PassManager
+
+SUB_TEMPLATE = """\
+   subroutine {name}(bounds, num_soilc, filter_soilc, arr)
+      use shr_sys_mod, only : shr_sys_flush
+      type(bounds_type), intent(in) :: bounds
+      integer, intent(in) :: num_soilc, filter_soilc(:)
+      real(r8), intent(inout) :: arr(bounds%begc:bounds%endc)
+      integer :: fc, c, j  ! indices
+      real(r8) :: tmp
+      !-----------------------------------------------------------------------
+      SHR_ASSERT_ALL((ubound(arr) == (/bounds%endc/)), errMsg(sourcefile, __LINE__))
+      associate( &
+         t_soisno => col_es%t_soisno , & ! soil temperature
+         h2osoi_liq => col_ws%h2osoi_liq &
+         )
+      do j = 1, nlevgrnd
+         do fc = 1, num_soilc
+            c = filter_soilc(fc)
+            tmp = t_soisno(c,j) * 2._r8 + h2osoi_liq(c,j) &
+                 - arr(c) / 3._r8
+            arr(c) = max(tmp, 0._r8)
+         end do
+      end do
+      if (arr(bounds%begc) < 0._r8) then
+         call endrun(msg=errmsg(sourcefile, __LINE__))
+      end if
+      call {callee}(bounds, num_soilc, filter_soilc, arr)
+      call shr_sys_flush(iulog)
+      end associate
+   end subroutine {name}
+"""
+
+FUNC_TEMPLATE = """\
+   real(r8) function {name}(x) result(y)
+      real(r8), intent(in) :: x
+      y = x*x
+   end function {name}
+"""
+
+
+def make_module(num_lines: int) -> list[str]:
+    lines = ["module bench_mod\n", "   use shr_kind_mod, only : r8 => shr_kind_r8\n"]
+    lines += ["   implicit none\n", "contains\n"]
+    n = 0
+    while len(lines) < num_lines:
+        text = SUB_TEMPLATE.format(name=f"sub_{n}", callee=f"sub_{max(n - 1, 0)}")
+        text += FUNC_TEMPLATE.format(name=f"func_{n}")
+        lines.extend(text.splitlines(keepends=True))
+        n += 1
+    lines.append("end module bench_mod\n")
+    return lines
+
+
+def bench_pass_manager(combined: bool) -> PassManager:
+    pass_manager = create_pass_manager()
+    pass_manager.combined = combined
+    bad_subs = tuple(bad_subroutines + ["shr_sys_flush"])
+    regex_call, regex_bad_inst = compile_bad_sub_regexes(bad_subs)
+    pass_manager.add_pass(pattern=regex_call, fn=set_comment, name=parse_sub_call, keyword="call")
+    pass_manager.add_pass(pattern=regex_bad_inst, fn=handle_bad_inst, name=parse_bad_inst)
+    return pass_manager
+
+
+def time_match(lines: list[str], combined: bool) -> tuple[float, list]:
+    pass_manager = bench_pass_manager(combined)
+    start = time.perf_counter()
+    matched = [pass_manager.match(line) for line in lines]
+    elapsed = time.perf_counter() - start
+    return elapsed, [p.name if p else None for p in matched]
+
+
+def time_run(lines: list[str], combined: bool) -> tuple[float, list]:
+    logger = get_logger("PassManager")
+    iter_logger = get_logger("LineIter")
+    set_logger_level(logger, logging.WARNING)
+    set_logger_level(iter_logger, logging.WARNING)
+
+    pass_manager = bench_pass_manager(combined)
+    work_lines = [LineTuple(line=text, ln=i) for i, text in enumerate(lines)]
+    state = create_parse_state(lines, "bench_mod.F90", "bench_mod", False, work_lines, iter_logger)
+
+    start = time.perf_counter()
+    pass_manager.run(state)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, [[lt.commented for lt in state.work_lines], list(state.sub_init_dict)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--lines", type=int, default=50000, help="size of synthetic module")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    args = parser.parse_args()
+
+    lines = make_module(args.lines)
+    for title, bench in [("PassManager.match", time_match), ("PassManager.run", time_run)]:
+        print(f"{title} ({len(lines)} lines)")
+        results = {}
+        for combined in (False, True):
+            best = None
+            for _ in range(args.repeat):
+                elapsed, result = bench(lines, combined)
+                best = elapsed if best is None else min(best, elapsed)
+            results[combined] = (best, result)
+            label = "combined" if combined else "sequential"
+            print(f"  {label:>10}: {best:8.3f} s  {len(lines) / best:12,.0f} lines/s")
+
+        same = results[True][1] == results[False][1]
+        print(f"  speedup: {results[False][0] / results[True][0]:.2f}x  identical results: {same}")
+
+
+if __name__ == "__main__":
+    main()
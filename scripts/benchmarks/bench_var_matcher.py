@@ -0,0 +1,77 @@
+"""
+Benchmark of the variable matching in analyze_sub_variables/check_global_vars
+on a synthetic module.
+
+    python -m scripts.benchmarks.bench_var_matcher [--lines 20000] [--names 100 1000 5000]
+
+Compares the `\\b(var1|var2|...)\\b` alternation regex (search, then findall
+on matching lines) with VarMatcher for growing numbers of variable names,
+reporting lines/second and checking that both find the same matches.
+"""
+
+import argparse
+import random
+import re
+import time
+
+from scripts.benchmarks.bench_pass_manager import make_module
+from scripts.helper_functions import VarMatcher
+
+# Names that occur in the synthetic module
+USED_NAMES = ["t_soisno", "h2osoi_liq", "arr", "bounds", "num_soilc", "filter_soilc", "nlevgrnd"]
+
+
+def make_names(num_names: int, seed: int = 0) -> list[str]:
+    """
+    Random instance/field-like names plus the ones used by the module,
+    some sharing prefixes with real names so the regex has to backtrack.
+    """
+    rng = random.Random(seed)
+    parts = ["col", "veg", "lun", "grc", "soil", "h2o", "liq", "ice", "flux", "state", "t", "c", "n"]
+    names = set(USED_NAMES)
+    while len(names) < num_names:
+        names.add("_".join(rng.choice(parts) for _ in range(rng.randint(2, 4))))
+    return sorted(names)
+
+
+def time_regex(lines: list[str], names: list[str]) -> tuple[float, list]:
+    start = time.perf_counter()
+    regex_vars = re.compile(r"\b({})\b".format("|".join(names)), re.IGNORECASE)
+    matches = [regex_vars.findall(line) if regex_vars.search(line) else [] for line in lines]
+    return time.perf_counter() - start, matches
+
+
+def time_matcher(lines: list[str], names: list[str]) -> tuple[float, list]:
+    start = time.perf_counter()
+    var_matcher = VarMatcher(names)
+    matches = [var_matcher.findall(line) for line in lines]
+    return time.perf_counter() - start, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--lines", type=int, default=20000, help="size of synthetic module")
+    parser.add_argument("--names", type=int, nargs="+", default=[100, 1000, 5000], help="numbers of variable names")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    args = parser.parse_args()
+
+    lines = make_module(args.lines)
+    print(f"Variable matching ({len(lines)} lines)")
+    for num_names in args.names:
+        names = make_names(num_names)
+        results = {}
+        for label, bench in [("regex", time_regex), ("VarMatcher", time_matcher)]:
+            best = None
+            for _ in range(args.repeat):
+                elapsed, matches = bench(lines, names)
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = (best, matches)
+            print(f"  {num_names:6d} names {label:>10}: {best:8.3f} s  {len(lines) / best:12,.0f} lines/s")
+
+        same = results["regex"][1] == results["VarMatcher"][1]
+        speedup = results["regex"][0] / results["VarMatcher"][0]
+        print(f"  {num_names:6d} names speedup: {speedup:.2f}x  identical results: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,58 @@
 import argparse
 import os
 import subprocess
+import sys
 
 SPEL_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
 
 def create(args):
+    from scripts.io.netcdf_io import NcStorage, parse_chunk_sizes
     from scripts.UnitTestforELM import create_unit_test
 
-    create_unit_test(sub_names=args.subs, casename=args.case, keep=args.keep)
+    nc_storage = None
+    if args.chunks or args.deflate or args.shuffle:
+        nc_storage = NcStorage(
+            chunks=parse_chunk_sizes(args.chunks or []),
+            deflate=args.deflate,
+            shuffle=args.shuffle,
+        )
+    create_unit_test(
+        sub_names=args.subs,
+        casename=args.case,
+        keep=args.keep,
+        jobs=args.jobs,
+        nc_storage=nc_storage,
+        parallel_io=args.parallel_io,
+        split_io=args.split_state_io,
+        summary_cache=not args.no_summary_cache,
+    )
+
+
+def analyze_all(args):
+    from scripts.UnitTestforELM import analyze_all
+
+    analyze_all(casename=args.case, jobs=args.jobs, summary_cache=not args.no_summary_cache)
 
 
 def export(args):
-    from scripts.export_objects import export_table_csv
+    if args.since and not args.db:
+        print("spel export: --since requires --db")
+        sys.exit(1)
+    if args.db:
+        from scripts.export_db import export_db
 
-    export_table_csv(args.commit)
+        export_db(args.commit, since=args.since)
+    else:
+        from scripts.export_objects import export_table_csv
+
+        export_table_csv(args.commit)
 
 
 def diff(args):
     from scripts.relerror import find_diffs
 
-    find_diffs(refn=args.ref, compfn=args.test, var=args.var)
+    find_diffs(refn=args.ref, compfn=args.test, var=args.var, jobs=args.jobs)
     return
 
 
@@ -46,8 +78,11 @@ def main():
         "   Given input of subroutine names,"
         "   SPEL analyzes all dependencies related"
         "   to the subroutines"
+        "spel analyze-all: "
+        "   Analyze every ELM subroutine in one run and store the objects"
         "spel export: "
-        "   Given commit number, take pkl files and create database csvs"
+        "   Given commit number, take stored objects and create database csvs"
+        "   (or load them into the database with --db)"
         "spel diff: "
         "   Input two netcdf files to compare with scripts.relerror"
     )
@@ -77,8 +112,100 @@ def main():
         action="store_true",
         help="Re-use existing case",
     )
+    create_parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to parse module files",
+    )
+    create_parser.add_argument(
+        "--chunk",
+        nargs="+",
+        required=False,
+        dest="chunks",
+        metavar="SUBGRID=LEN",
+        help="Store the elmtypes netcdf arrays in chunks of LEN along each subgrid"
+        " dimension (gridcell, topo, landunit, column, patch), e.g. --chunk column=4096",
+    )
+    create_parser.add_argument(
+        "--deflate",
+        required=False,
+        dest="deflate",
+        type=int,
+        choices=range(0, 10),
+        default=0,
+        metavar="{0-9}",
+        help="zlib compression level of the elmtypes netcdf arrays",
+    )
+    create_parser.add_argument(
+        "--shuffle",
+        required=False,
+        dest="shuffle",
+        action="store_true",
+        help="Apply the shuffle filter to the elmtypes netcdf arrays",
+    )
+    create_parser.add_argument(
+        "--parallel-io",
+        required=False,
+        dest="parallel_io",
+        action="store_true",
+        help="Read the elmtypes netcdf file in parallel (MPI-IO), each rank"
+        " reading only its gridcells and their subgrid elements. Each rank writes"
+        " its results to fut-results-<rank>.nc. Only one set of sites is supported."
+        " To verify, compare each rank file against the serial (whole domain)"
+        " reference: spel diff --ref fut-results.nc --test fut-results-<rank>.nc compares"
+        " the slab given by the arrays' lbounds/ubounds attributes",
+    )
+    create_parser.add_argument(
+        "--split-state-io",
+        required=False,
+        dest="split_state_io",
+        action="store_true",
+        help="Only read the elmtype fields read by the unit test (inputs, written"
+        " by write_elmtypes_inputs) and only write the fields it writes for"
+        " verification, instead of every active field",
+    )
+    create_parser.add_argument(
+        "--no-summary-cache",
+        required=False,
+        dest="no_summary_cache",
+        action="store_true",
+        help="Re-analyze every subroutine instead of reusing cached read/write summaries",
+    )
     create_parser.set_defaults(func=create)
 
+    # Parser for 'spel analyze-all'
+    analyze_parser = subparsers.add_parser(
+        "analyze-all", help="Analyze every ELM subroutine in one run"
+    )
+    analyze_parser.add_argument(
+        "-c",
+        required=False,
+        dest="case",
+        default="analyze_all",
+        help="Specify case name for the modified files",
+    )
+    analyze_parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to parse module files",
+    )
+    analyze_parser.add_argument(
+        "--no-summary-cache",
+        required=False,
+        dest="no_summary_cache",
+        action="store_true",
+        help="Re-analyze every subroutine instead of reusing cached read/write summaries",
+    )
+    analyze_parser.set_defaults(func=analyze_all)
+
     # Parser for 'spel export'
     export_parser = subparsers.add_parser("export", help="Run the export command")
     export_parser.add_argument(
@@ -87,6 +214,18 @@ def main():
         dest="commit",
         help="Specify commit value ",
     )
+    export_parser.add_argument(
+        "--db",
+        required=False,
+        action="store_true",
+        help="Load the objects directly into the database instead of writing csv files",
+    )
+    export_parser.add_argument(
+        "--since",
+        required=False,
+        dest="since",
+        help="Only update the modules affected by the changes since this exported commit",
+    )
     export_parser.set_defaults(func=export)
 
     # Parser for 'spel diff'
@@ -101,7 +240,8 @@ def main():
         "--test",
         required=True,
         dest="test",
-        help="test netcdf file",
+        help="test netcdf file. A rank's results (--parallel-io) are compared"
+        " against the matching slab of the reference",
     )
     diff_parser.add_argument(
         "-v",
@@ -109,6 +249,15 @@ def main():
         dest="var",
         help="Optional: only report variable var",
     )
+    diff_parser.add_argument(
+        "-j",
+        "--jobs",
+        required=False,
+        dest="jobs",
+        type=int,
+        default=1,
+        help="Number of processes used to compare variables",
+    )
     diff_parser.set_defaults(func=diff)
 
     # Parser for 'spel run'
@@ -0,0 +1,278 @@
+"""
+Read/write summaries of subroutines computed over the call graph.
+
+A subroutine's summary is what parse_arguments and analyze_variables record
+for it (arguments_read_write, arg_access_by_ln, elmtype_access_by_ln). Both
+only need the argument summaries of the subroutines it calls, so the
+summaries are computed once per subroutine, callees first, by walking the
+strongly connected components of the call graph in reverse topological
+order. Recursive components are iterated until their argument summaries
+stop changing.
+
+Summaries are cached on disk. The key of a subroutine is the hash of its
+source lines, parsed declarations, active global variables and the type
+instances it accesses, together with the keys of its callees, so analyzing
+a new unit test reuses the summary of every subroutine whose call tree
+didn't change. The cache is bypassed with use_cache=False
+(spel create/analyze-all --no-summary-cache).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional
+
+from scripts.logging_configs import get_logger
+from scripts.mod_config import scripts_dir, spel_output_dir
+from scripts.parse_cache import ParseCache
+from scripts.types import ReadWrite
+
+if TYPE_CHECKING:
+    from scripts.analyze_subroutines import Subroutine
+    from scripts.DerivedType import DerivedType
+
+# Maximum passes over a recursive component before giving up on a fixed point
+MAX_SCC_ITERS = 10
+
+# Source files whose logic determines the summaries
+_analysis_sources = [
+    "analyze_subroutines.py",
+    "helper_functions.py",
+    "dataflow.py",
+    "fortran_parser/evaluate.py",
+]
+
+_analysis_version: Optional[str] = None
+
+summary_cache = ParseCache(cache_dir=f"{spel_output_dir}summary_cache/")
+
+# Field access of a derived type variable, stripped to get the instance
+# name as in Subroutine.analyze_variables
+regex_inst_field = re.compile(r"(?:\(\w+\))?%\w+")
+
+
+class Summary(NamedTuple):
+    """
+    Cached results of parse_arguments and analyze_variables
+    """
+
+    arguments_read_write: dict[str, ReadWrite]
+    arg_access_by_ln: dict[str, list[ReadWrite]]
+    elmtype_access_by_ln: dict[str, list[ReadWrite]]
+
+
+def analysis_version() -> str:
+    global _analysis_version
+    if _analysis_version is None:
+        sha = hashlib.sha1()
+        for fn in _analysis_sources:
+            with open(os.path.join(scripts_dir, fn), "rb") as f:
+                sha.update(f.read())
+        _analysis_version = sha.hexdigest()
+    return _analysis_version
+
+
+def call_graph_sccs(roots: Iterable[Subroutine]) -> list[list[Subroutine]]:
+    """
+    Strongly connected components of the call graph reachable from roots
+    (library functions excluded), callees before callers (Tarjan, iterative).
+    """
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    on_stack: set[str] = set()
+    stack: list[Subroutine] = []
+    sccs: list[list[Subroutine]] = []
+
+    def children(sub: Subroutine):
+        return iter([c for c in sub.child_subroutines.values() if not c.library])
+
+    for root in roots:
+        if root.name in index or root.library:
+            continue
+        work = [(root, children(root))]
+        index[root.name] = lowlink[root.name] = len(index)
+        stack.append(root)
+        on_stack.add(root.name)
+        while work:
+            sub, it = work[-1]
+            child = next(it, None)
+            if child is not None:
+                if child.name not in index:
+                    index[child.name] = lowlink[child.name] = len(index)
+                    stack.append(child)
+                    on_stack.add(child.name)
+                    work.append((child, children(child)))
+                elif child.name in on_stack:
+                    lowlink[sub.name] = min(lowlink[sub.name], index[child.name])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent.name] = min(lowlink[parent.name], lowlink[sub.name])
+            if lowlink[sub.name] == index[sub.name]:
+                scc: list[Subroutine] = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member.name)
+                    scc.append(member)
+                    if member is sub:
+                        break
+                sccs.append(scc)
+    return sccs
+
+
+def instance_map(type_dict: dict[str, DerivedType]) -> dict[str, tuple[str, int]]:
+    """
+    (type, dim) of every type instance, the first one found for each name
+    as in Subroutine.analyze_variables
+    """
+    instances: dict[str, tuple[str, int]] = {}
+    for dtype in type_dict.values():
+        for var in dtype.instances.values():
+            instances.setdefault(var.name, (var.type, var.dim))
+    return instances
+
+
+def source_digest(sub: Subroutine, instances: dict[str, tuple[str, int]]) -> str:
+    """
+    Hash of everything in sub that the analysis reads
+    """
+    sha = hashlib.sha1()
+    inst_names = {
+        regex_inst_field.sub("", name)
+        for name in sub.dtype_vars
+        if regex_inst_field.search(name)
+    }
+    parts = [
+        sub.name,
+        [(lt.ln, lt.line) for lt in sub.sub_lines],
+        sorted((name, var.type) for name, var in sub.Arguments.items()),
+        sorted((name, var.type) for name, var in sub.dtype_vars.items()),
+        sorted(sub.associate_vars.items()),
+        sorted((ptr, sorted(gvs)) for ptr, gvs in sub.ptr_vars.items()),
+        sorted(sub.LocalVariables["arrays"]),
+        sorted(sub.LocalVariables["scalars"]),
+        sorted((name, var.type, var.dim) for name, var in sub.active_global_vars.items()),
+        sorted((name, instances.get(name)) for name in inst_names),
+    ]
+    for part in parts:
+        sha.update(repr(part).encode())
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+def scc_keys(
+    scc: list[Subroutine],
+    keys: dict[str, str],
+    instances: dict[str, tuple[str, int]],
+) -> dict[str, str]:
+    """
+    Cache keys of the members of scc. keys holds the keys of the
+    subroutines called from scc that aren't part of it.
+    instances is the instance_map of the type_dict.
+    """
+    members = {sub.name for sub in scc}
+    callees = sorted(
+        (child.name, "lib" if child.library else keys[child.name])
+        for sub in scc
+        for child in sub.child_subroutines.values()
+        if child.name not in members
+    )
+    digests = sorted((sub.name, source_digest(sub, instances)) for sub in scc)
+    scc_digest = hashlib.sha1(repr((digests, callees)).encode()).hexdigest()
+    return {
+        sub.name: summary_cache.make_key(
+            "rw", sub.filepath, scc_digest, sub.name, analysis_version()
+        )
+        for sub in scc
+    }
+
+
+def _arg_status(scc: list[Subroutine]) -> dict[str, dict[str, str]]:
+    return {
+        sub.name: {arg: rw.status for arg, rw in sub.arguments_read_write.items()}
+        for sub in scc
+    }
+
+
+def analyze_scc(
+    scc: list[Subroutine],
+    sub_dict: dict[str, Subroutine],
+    type_dict: dict[str, DerivedType],
+) -> None:
+    """
+    Runs parse_arguments and analyze_variables for the members of scc.
+    Recursive components start from unused ('-') arguments and repeat
+    parse_arguments until the argument summaries are stable.
+    """
+    recursive = len(scc) > 1 or scc[0].name in scc[0].child_subroutines
+    if not recursive:
+        scc[0].parse_arguments(sub_dict, type_dict)
+    else:
+        for sub in scc:
+            sub.arguments_read_write = {arg: ReadWrite("-", -999) for arg in sub.Arguments}
+        for _ in range(MAX_SCC_ITERS):
+            before = _arg_status(scc)
+            for sub in scc:
+                sub.parse_arguments(sub_dict, type_dict)
+            if _arg_status(scc) == before:
+                break
+        else:
+            logger = get_logger("SPEL")
+            names = " ".join(sub.name for sub in scc)
+            logger.warning(f"Warning: argument status of {names} didn't converge")
+
+    for sub in scc:
+        sub.analyze_variables(sub_dict, type_dict)
+    return None
+
+
+def analyze_call_graph(
+    roots: Iterable[Subroutine],
+    sub_dict: dict[str, Subroutine],
+    type_dict: dict[str, DerivedType],
+    cache: Optional[ParseCache] = None,
+    use_cache: bool = True,
+) -> tuple[int, int]:
+    """
+    Computes the summary of every subroutine called (directly or not) from
+    roots, reusing cached summaries unless use_cache is False.
+    Returns the number of subroutines analyzed and loaded from the cache.
+    """
+    cache = cache or summary_cache
+    instances = instance_map(type_dict)
+    keys: dict[str, str] = {}
+    num_analyzed = 0
+    num_cached = 0
+    for scc in call_graph_sccs(roots):
+        keys.update(scc_keys(scc, keys, instances))
+        if all(sub.args_analyzed and sub.global_analyzed for sub in scc):
+            continue
+        cached: list[Optional[Summary]] = []
+        if use_cache:
+            cached = [cache.get(keys[sub.name]) for sub in scc]
+        if cached and all(cached):
+            for sub, summary in zip(scc, cached):
+                sub.arguments_read_write = summary.arguments_read_write
+                sub.arg_access_by_ln = summary.arg_access_by_ln
+                sub.elmtype_access_by_ln = summary.elmtype_access_by_ln
+                sub.args_analyzed = sub.global_analyzed = True
+            num_cached += len(scc)
+            continue
+
+        analyze_scc(scc, sub_dict, type_dict)
+        if use_cache:
+            for sub in scc:
+                cache.put(
+                    keys[sub.name],
+                    Summary(
+                        sub.arguments_read_write,
+                        sub.arg_access_by_ln,
+                        sub.elmtype_access_by_ln,
+                    ),
+                )
+        num_analyzed += len(scc)
+
+    return num_analyzed, num_cached
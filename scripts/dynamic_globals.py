@@ -1,7 +1,6 @@
-import subprocess as sp
 from typing import Optional, Tuple
 
-from scripts.mod_config import ELM_SRC
+from scripts.source_index import get_source_index
 
 interface_list: list[str] = []
 
@@ -17,15 +16,9 @@ def populate_interface_list():
     """
     returns a list of all interfaces
     """
-    cmd = f'grep -rin --exclude-dir={ELM_SRC}external_models/ -E "^[[:space:]]+(interface)" {ELM_SRC}*'
-    output = sp.getoutput(cmd)
-    output = output.split("\n")
     global interface_list
     if interface_list:
         print("Warning - Trying to recalculate interface list")
-    for el in output:
-        el = el.split()
-        interface = el[2]
-        interface_list.append(interface.lower())
+    interface_list.extend(get_source_index().interface_names())
 
     return
@@ -4,10 +4,11 @@ import logging
 import os
 import pprint
 import re
-import subprocess as sp
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from logging import Logger
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import scripts.dynamic_globals as dg
 from scripts.analyze_subroutines import Subroutine
@@ -17,10 +18,14 @@ from scripts.fortran_modules import (FortranModule, ModTree, build_module_tree,
                                      get_filename_from_module,
                                      get_module_name_from_file)
 from scripts.logging_configs import get_logger, set_logger_level
-from scripts.mod_config import E3SM_SRCROOT, spel_output_dir
+from scripts.mod_config import spel_output_dir
+from scripts.parse_cache import (hash_includes, hash_lines, names_in_text,
+                                  parse_cache)
+from scripts.preprocess import get_cpp_lines, needs_cpp, preprocess_files
 from scripts.profiler_context import profile_ctx
-from scripts.types import (LineTuple, LogicalLineIterator, ParseState,
-                           PassManager, PreProcTuple, SubInit, SubStart)
+from scripts.types import (LineTuple, LogicalLineIterator, ModifiedFile,
+                           ParseState, PassManager, PreProcTuple, SubInit,
+                           SubStart)
 from scripts.utilityFunctions import (comment_line, find_file_for_subroutine,
                                       find_variables, line_unwrapper,
                                       parse_line_for_variables, unwrap_section)
@@ -405,40 +410,44 @@ def parse_local_mods(lines, start):
     return remove
 
 
-def get_used_mods(
-        ifile: str, # fpath
-        mods: list[str], # list[fpath]
-        singlefile: bool,
-        mod_dict: dict[str, FortranModule],
-        verbose: bool=False,
-):
+def parse_module_head(
+    ifile: str,
+    module_name: str,
+    linenumber: int,
+    verbose: bool = False,
+) -> tuple[FortranModule, list[str]]:
     """
-    Checks to see what mods are needed to compile the file
+    Parses file for the module's global variables, user-defined types and `use` statements.
+    Returns the FortranModule and the list of (not bad) modules it uses.
+    Results are cached by file contents.
     """
-    func_name = "get_used_mods"
-
-    # Keep track of nested level
-    linenumber, module_name = get_module_name_from_file(fpath=ifile)
-    fort_mod = FortranModule(fname=ifile, name=module_name, ln=linenumber)
-
-    # Return if this module was aleady added for another subroutine
-    if fort_mod.name in mod_dict:
-        return mods, mod_dict
-
-    # Read file
-    needed_mods = []
-    ct = 0
-    fn = ifile
-    file = open(fn, "r")
+    file = open(ifile, "r")
     lines = file.readlines()
     file.close()
 
+    text = "".join(lines).lower()
+    cache_key = parse_cache.make_key(
+        "module_head",
+        ifile,
+        hash_lines(lines),
+        hash_includes(ifile, lines),
+        module_name,
+        linenumber,
+        names_in_text(text, bad_modules),
+    )
+    cached: Optional[tuple[FortranModule, list[str]]] = parse_cache.get(cache_key)
+    if cached:
+        return cached
+
+    fort_mod = FortranModule(fname=ifile, name=module_name, ln=linenumber)
     fort_mod.num_lines = len(lines)
 
     # Define regular expressions for catching variables declared in the module
     regex_contains = re.compile(r"^(contains)", re.IGNORECASE)
     user_defined_types = {}  # dictionary to store user-defined types in module
+    used_mods: list[str] = []
 
+    ct = 0
     module_head = True
     while ct < len(lines):
         l, ct = line_unwrapper(lines=lines, ct=ct)
@@ -496,15 +505,59 @@ def get_used_mods(
             mod = mod.lower()
             if mod not in bad_modules:
                 fort_mod.add_dependency(mod=mod,line=l,ln=ct)
-                lower_mods = [get_module_name_from_file(m)[1] for m in mods] 
-                if (
-                    mod not in needed_mods
-                    and mod not in lower_mods
-                    and mod not in ["elm_instmod", "cudafor", "verificationmod"]
-                ):
-                    needed_mods.append(mod)
+                if mod not in used_mods:
+                    used_mods.append(mod)
         ct += 1
 
+    # Store user-defined types in the module object
+    # and find any global variables that have the user-defined type
+    list_type_names = [key for key in user_defined_types.keys()]
+    for gvar in fort_mod.global_vars.values():
+        if gvar.type in list_type_names:
+            if gvar.name not in user_defined_types[gvar.type].instances:
+                user_defined_types[gvar.type].instances[gvar.name] = gvar
+
+    fort_mod.defined_types = user_defined_types
+
+    parse_cache.put(cache_key, (fort_mod, used_mods))
+
+    return fort_mod, used_mods
+
+
+def get_used_mods(
+        ifile: str, # fpath
+        mods: list[str], # list[fpath]
+        singlefile: bool,
+        mod_dict: dict[str, FortranModule],
+        verbose: bool=False,
+):
+    """
+    Checks to see what mods are needed to compile the file
+    """
+    func_name = "get_used_mods"
+
+    # Keep track of nested level
+    linenumber, module_name = get_module_name_from_file(fpath=ifile)
+
+    # Return if this module was aleady added for another subroutine
+    if module_name in mod_dict:
+        return mods, mod_dict
+
+    fort_mod, used_mods = parse_module_head(
+        ifile=ifile,
+        module_name=module_name,
+        linenumber=linenumber,
+        verbose=verbose,
+    )
+
+    lower_mods = {get_module_name_from_file(m)[1] for m in mods}
+    needed_mods = [
+        mod
+        for mod in used_mods
+        if mod not in lower_mods
+        and mod not in ["elm_instmod", "cudafor", "verificationmod"]
+    ]
+
     # Done with first pass through the file.
     # Check against already used Mods
     files_to_parse = []
@@ -526,16 +579,6 @@ def get_used_mods(
             files_to_parse.append(needed_modfile)
             mods.append(needed_modfile)
 
-    # Store user-defined types in the module object
-    # and find any global variables that have the user-defined type
-
-    list_type_names = [key for key in user_defined_types.keys()]
-    for gvar in fort_mod.global_vars.values():
-        if gvar.type in list_type_names:
-            if gvar.name not in user_defined_types[gvar.type].instances:
-                user_defined_types[gvar.type].instances[gvar.name] = gvar
-
-    fort_mod.defined_types = user_defined_types
     mod_dict[fort_mod.name] = fort_mod
     if ifile not in mods:
         mods.append(ifile)
@@ -598,63 +641,49 @@ def remove_cpp_directives(cpp_lines: list[str], fn: str, logger: Logger) -> list
     return work_lines
 
 
-def modify_file(
+def preprocess_file(
     lines: list[str],
     fn: str,
-    mod_name: str,
-    pass_manager: PassManager,
-    case_dir: str,
-    overwrite: bool,
-)->ModParseResult:
+    logger: Logger,
+) -> tuple[bool, list[LineTuple]]:
     """
-    Function that modifies the source code of the file
-    Occurs after parsing the file for subroutines and modules
+    Runs the preprocessor on fn if it has any ifdef statements.
+    Returns if the file was preprocessed and the lines to parse, which
+    keep the line numbers of the original file.
     """
-    func_name = "( modify_file )"
-    iter_logger = get_logger("LineIter")
-    set_logger_level(logger=iter_logger, level=logging.INFO)
-    set_logger_level(logger=pass_manager.logger, level=logging.INFO)
-    mod_debug = "???"
-    if mod_name == mod_debug:
-        set_logger_level(logger=pass_manager.logger, level=logging.DEBUG)
-        set_logger_level(logger=iter_logger, level=logging.DEBUG)
-
-    logger = pass_manager.logger
-    # Test if the file in question contains any ifdef statements:
-    cmd = f'grep -E "ifn?def"  {fn} | grep -v "_OPENACC"'
-    output = sp.getoutput(cmd)
     base_fn = fn.split("/")[-1]
+    # Test if the file in question contains any ifdef statements:
+    if not needs_cpp(fn):
+        return False, [ LineTuple(line=text,ln=i) for i,text in enumerate(lines) ]
 
-    if output:
-        # For CPP files, regex operates on the cpp_lines, but only the original lines are commented
-        cpp_file = True
-        new_fn = f"{spel_output_dir}cpp_{base_fn}"
+    # For CPP files, regex operates on the cpp_lines, but only the original lines are commented
+    cpp_lines = get_cpp_lines(fn, macros)
 
-        # Set up cmd for preprocessing. Get macros used:
-        macros_string = "-D" + " -D".join(macros)
-        cmd = f"gfortran -I{E3SM_SRCROOT}/share/include {macros_string} -cpp -E {fn} > {new_fn}"
-        _ = sp.getoutput(cmd)
+    work_lines = remove_cpp_directives(cpp_lines, fn,logger)
+    ### SANITY CHECK ####
+    for lt in work_lines:
+        if lt.line.rstrip("\n").strip():
+            if not re.search(r'(__FILE__|__LINE__|include)', lines[lt.ln]):
+                assert lt.line == lines[lt.ln], f"Couldn't map cpp lines for {base_fn}\n{lt.line} /= {lines[lt.ln]}"
+
+    return True, work_lines
 
-        # read lines of preprocessed file
-        file = open(new_fn, "r")
-        cpp_lines = file.readlines()
-        file.close()
-    else:
-        cpp_file = False
-        cpp_lines = lines[:]
 
-    orig_lines = [ LineTuple(line=text,ln=i) for i,text in enumerate(lines) ]
+def create_parse_state(
+    lines: list[str],
+    fn: str,
+    mod_name: str,
+    cpp_file: bool,
+    work_lines: list[LineTuple],
+    iter_logger: Logger,
+) -> ParseState:
+    # Without cpp, comments are applied directly to the original lines
     if cpp_file:
-        work_lines = remove_cpp_directives(cpp_lines, fn,logger)
-        ### SANITY CHECK ####
-        for lt in work_lines:
-            if lt.line.rstrip("\n").strip():
-                if not re.search(r'(__FILE__|__LINE__|include)', lines[lt.ln]):
-                    assert lt.line == lines[lt.ln], f"Couldn't map cpp lines for {base_fn}\n{lt.line} /= {lines[lt.ln]}"
+        orig_lines = [ LineTuple(line=text,ln=i) for i,text in enumerate(lines) ]
     else:
-        work_lines = orig_lines
+        orig_lines = work_lines
 
-    state = ParseState(
+    return ParseState(
         module_name=mod_name,
         cpp_file=cpp_file,
         work_lines=work_lines,
@@ -669,20 +698,90 @@ def modify_file(
         sub_start=None,
         func_init=None,
     )
+
+
+@lru_cache(maxsize=16)
+def compile_bad_sub_regexes(bad_subs: tuple[str, ...]) -> tuple[re.Pattern, re.Pattern]:
+    """
+    Returns regexes for calls to and references of bad subroutines.
+    Cached since bad_subroutines only grows occasionally between files.
+    """
+    bad_sub_string = "|".join(bad_subs)
+    bad_sub_string = f"({bad_sub_string})"
+    regex_call = re.compile(rf"\s*(call)[\s]+{bad_sub_string}",  re.IGNORECASE)
+    regex_bad_inst = re.compile(rf"\b({bad_sub_string})\b")
+    return regex_call, regex_bad_inst
+
+
+def modify_file(
+    lines: list[str],
+    fn: str,
+    mod_name: str,
+    pass_manager: PassManager,
+    case_dir: str,
+    overwrite: bool,
+)->ModParseResult:
+    """
+    Function that modifies the source code of the file
+    Occurs after parsing the file for subroutines and modules
+    """
+    func_name = "( modify_file )"
+    iter_logger = get_logger("LineIter")
+    set_logger_level(logger=iter_logger, level=logging.INFO)
+    set_logger_level(logger=pass_manager.logger, level=logging.INFO)
+    mod_debug = "???"
+    if mod_name == mod_debug:
+        set_logger_level(logger=pass_manager.logger, level=logging.DEBUG)
+        set_logger_level(logger=iter_logger, level=logging.DEBUG)
+
+    logger = pass_manager.logger
+    global bad_subroutines
+    base_fn = fn.split("/")[-1]
+
+    # Only the bad names present in this file can change how it's parsed
+    text = "".join(lines).lower()
+    cache_key = parse_cache.make_key(
+        "modify_file",
+        fn,
+        hash_lines(lines),
+        hash_includes(fn, lines),
+        mod_name,
+        names_in_text(text, bad_modules),
+        names_in_text(text, bad_subroutines),
+        macros,
+    )
+    cached: Optional[ModifiedFile] = parse_cache.get(cache_key)
+    if cached:
+        # Subroutines of preprocessed files point to the cpp output so it must still exist
+        if cached.cpp_file and not os.path.exists(f"{spel_output_dir}cpp_{base_fn}"):
+            get_cpp_lines(fn, macros)
+        logger.debug(f"{func_name} using cached parse for {base_fn}")
+        bad_subroutines.extend(
+            el for el in cached.new_bad_subs if el not in bad_subroutines and el != "nan"
+        )
+        if overwrite:
+            cached_lts = [
+                LineTuple(line=line, ln=i, commented=cmt)
+                for i, (line, cmt) in enumerate(zip(lines, cached.commented))
+            ]
+            write_lines = [lt.line for lt in apply_comments(cached_lts)]
+            write_modified_file(case_dir, fn, write_lines, logger)
+        return cached.sub_init_dict, cached.parsed_lines
+
+    cpp_file, work_lines = preprocess_file(lines, fn, logger)
+    state = create_parse_state(lines, fn, mod_name, cpp_file, work_lines, iter_logger)
+    known_bad_subs = set(bad_subroutines)
     parse_bad_modules(state, logger)
+    new_bad_subs = [el for el in bad_subroutines if el not in known_bad_subs]
 
     # Join bad subroutines into single string with logical OR for regex. Commented out if matched.
     # these two likely don't need to be separate regexes
-    global bad_subroutines
     bad_subroutines = [el for el in bad_subroutines if el != 'nan']
-    bad_sub_string = "|".join(bad_subroutines)
-    bad_sub_string = f"({bad_sub_string})"
-    regex_call = re.compile(rf"\s*(call)[\s]+{bad_sub_string}",  re.IGNORECASE)
-    regex_bad_inst = re.compile(rf"\b({bad_sub_string})\b")
+    regex_call, regex_bad_inst = compile_bad_sub_regexes(tuple(bad_subroutines))
 
     pass_manager.remove_pass(name=parse_sub_call)
     pass_manager.remove_pass(name=parse_bad_inst)
-    pass_manager.add_pass(pattern=regex_call,fn=set_comment,name=parse_sub_call)
+    pass_manager.add_pass(pattern=regex_call,fn=set_comment,name=parse_sub_call,keyword="call")
     pass_manager.add_pass(pattern=regex_bad_inst,fn=handle_bad_inst,name=parse_bad_inst)
     pass_manager.run(state)
 
@@ -708,14 +807,179 @@ def modify_file(
     parsed_lines = [ line.line for line in parsed_lts]
 
     if overwrite:
-        out_fn = f"{case_dir}/{fn.split('/')[-1]}"
-        logger.debug("Writing to file: %s", out_fn)
-        with open(out_fn, "w") as ofile:
-            ofile.writelines(write_lines)
+        write_modified_file(case_dir, fn, write_lines, logger)
+
+    parse_cache.put(
+        cache_key,
+        ModifiedFile(
+            sub_init_dict=state.sub_init_dict,
+            parsed_lines=parsed_lines,
+            commented=[lt.commented for lt in state.orig_lines],
+            cpp_file=cpp_file,
+            new_bad_subs=new_bad_subs,
+        ),
+    )
 
     return state.sub_init_dict, parsed_lines
 
 
+def write_modified_file(case_dir: str, fn: str, write_lines: list[str], logger: Logger):
+    out_fn = f"{case_dir}/{fn.split('/')[-1]}"
+    logger.debug("Writing to file: %s", out_fn)
+    with open(out_fn, "w") as ofile:
+        ofile.writelines(write_lines)
+
+
+def create_pass_manager() -> PassManager:
+    pass_manager = PassManager(logger=get_logger("PassManager"))
+    pass_manager.add_pass(pattern=regex_sub,fn=set_in_subroutine, name=parse_sub_start )
+    pass_manager.add_pass(pattern=regex_end_sub,fn=finalize_subroutine,name=parse_sub_end)
+    pass_manager.add_pass(pattern=regex_end_func,fn=finalize_function,name=parse_func_end,keyword="function")
+    pass_manager.add_pass(pattern=regex_func,fn=set_in_function,name=parse_func_start,keyword="function")
+    pass_manager.add_pass(pattern=regex_shr_assert,fn=set_comment,name=parse_shr_assert)
+    pass_manager.add_pass(pattern=regex_include_assert,fn=set_comment,name=parse_inc_shr_assert)
+    return pass_manager
+
+
+class ModifyTask(NamedTuple):
+    """
+    Arguments for modifying a single module file in a worker process.
+    The bad lists are passed explicitly so workers don't rely on fork.
+    """
+    mod_name: str
+    mod_file: str
+    case_dir: str
+    overwrite: bool
+    bad_modules: list[str]
+    bad_subroutines: list[str]
+
+
+def _set_bad_lists(task: ModifyTask):
+    global bad_modules, bad_subroutines
+    bad_modules[:] = task.bad_modules
+    bad_subroutines[:] = task.bad_subroutines
+
+
+def collect_bad_subroutines(task: ModifyTask) -> tuple[str, list[str]]:
+    """
+    Returns the names that parsing mod_file would add to bad_subroutines
+    """
+    _set_bad_lists(task)
+    logger = get_logger("PassManager")
+    iter_logger = get_logger("LineIter")
+    set_logger_level(logger=iter_logger, level=logging.INFO)
+
+    with open(task.mod_file, "r") as ifile:
+        lines = ifile.readlines()
+
+    text = "".join(lines).lower()
+    cache_key = parse_cache.make_key(
+        "bad_subs",
+        task.mod_file,
+        hash_lines(lines),
+        hash_includes(task.mod_file, lines),
+        names_in_text(text, bad_modules),
+        names_in_text(text, bad_subroutines),
+        macros,
+    )
+    new_bad_subs: Optional[list[str]] = parse_cache.get(cache_key)
+    if new_bad_subs is None:
+        cpp_file, work_lines = preprocess_file(lines, task.mod_file, logger)
+        state = create_parse_state(
+            lines, task.mod_file, task.mod_name, cpp_file, work_lines, iter_logger
+        )
+        num_known = len(bad_subroutines)
+        parse_bad_modules(state, logger)
+        new_bad_subs = bad_subroutines[num_known:]
+        parse_cache.put(cache_key, new_bad_subs)
+
+    return task.mod_name, new_bad_subs
+
+
+def modify_file_task(task: ModifyTask) -> tuple[str, dict[str, SubInit], list[LineTuple]]:
+    """
+    Worker for modify_files_parallel. Returns the SubInits and unwrapped module lines
+    """
+    _set_bad_lists(task)
+    with open(task.mod_file, "r") as ifile:
+        lines = ifile.readlines()
+
+    temp_objs, parsed_lines = modify_file(
+        lines,
+        task.mod_file,
+        task.mod_name,
+        create_pass_manager(),
+        task.case_dir,
+        overwrite=task.overwrite,
+    )
+    mod_lines_unwrp = unwrap_section(lines=parsed_lines, startln=0)
+    return task.mod_name, temp_objs, mod_lines_unwrp
+
+
+def modify_files_parallel(
+    ordered_mods: list[str],
+    mod_dict: ModDict,
+    sub_init_dict: dict[str, SubInit],
+    case_dir: str,
+    overwrite: bool,
+    jobs: int,
+):
+    """
+    Runs modify_file for every unmodified module in ordered_mods over a process pool.
+
+    Serially, each file sees the names that earlier files appended to bad_subroutines.
+    To give identical results, the additions of every file are collected first and
+    each file is then modified with the bad_subroutines it would have seen serially.
+    Results are merged in dependency order.
+    """
+    global bad_subroutines
+    todo = [m for m in ordered_mods if not mod_dict[m].modified]
+    if not todo:
+        return
+
+    def make_task(mod_name: str, bad_subs: list[str]) -> ModifyTask:
+        mod_file = get_filename_from_module(mod_name)
+        if not mod_file:
+            sys.exit(f"Error -- couldn't find file for {mod_name}")
+        return ModifyTask(
+            mod_name=mod_name,
+            mod_file=mod_file,
+            case_dir=case_dir,
+            overwrite=overwrite,
+            bad_modules=list(bad_modules),
+            bad_subroutines=bad_subs,
+        )
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        base_bad_subs = list(bad_subroutines)
+        tasks = [make_task(m, base_bad_subs) for m in todo]
+        additions = dict(executor.map(collect_bad_subroutines, tasks))
+
+        tasks = []
+        seen_bad_subs = list(base_bad_subs)
+        for mod_name in todo:
+            tasks.append(make_task(mod_name, list(seen_bad_subs)))
+            seen_bad_subs.extend(
+                el for el in additions[mod_name] if el not in seen_bad_subs and el != "nan"
+            )
+
+        results = {
+            mod_name: (temp_objs, mod_lines)
+            for mod_name, temp_objs, mod_lines in executor.map(modify_file_task, tasks)
+        }
+
+    bad_subroutines[:] = seen_bad_subs
+    for mod_name in todo:
+        temp_objs, mod_lines = results[mod_name]
+        sub_init_dict.update(temp_objs)
+        fort_mod = mod_dict[mod_name]
+        fort_mod.subroutines = { sub.split("::")[-1] for sub in temp_objs.keys() }
+        fort_mod.module_lines = mod_lines
+        fort_mod.modified = True
+
+    return
+
+
 def process_for_unit_test(
     case_dir: str,
     mod_dict: dict[str, FortranModule],
@@ -726,6 +990,7 @@ def process_for_unit_test(
     overwrite=False,
     verbose=False,
     singlefile=False,
+    jobs: int = 1,
 ):
     """
     This function looks at the whole .F90 file.
@@ -742,18 +1007,13 @@ def process_for_unit_test(
         main_sub_dict -> dictionary of all subroutines encountered for the unit test.
         verbose  -> Print more info
         singlefile -> flag that disables recursive processing.
+        jobs     -> number of processes used to modify the module files
     """
     func_name = "( process_for_unit_test )"
 
     # First, get complete list of module to be processed and removed.
     # and then add processed file to list of mods:
-    pass_manager = PassManager(logger=get_logger("PassManager"))
-    pass_manager.add_pass(pattern=regex_sub,fn=set_in_subroutine, name=parse_sub_start )
-    pass_manager.add_pass(pattern=regex_end_sub,fn=finalize_subroutine,name=parse_sub_end)
-    pass_manager.add_pass(pattern=regex_end_func,fn=finalize_function,name=parse_func_end)
-    pass_manager.add_pass(pattern=regex_func,fn=set_in_function,name=parse_func_start)
-    pass_manager.add_pass(pattern=regex_shr_assert,fn=set_comment,name=parse_shr_assert)
-    pass_manager.add_pass(pattern=regex_include_assert,fn=set_comment,name=parse_inc_shr_assert)
+    pass_manager = create_pass_manager()
 
     with profile_ctx(enabled=False, section="get_used_mods") as pc:
         # Find if this file has any not-processed mods
@@ -792,7 +1052,22 @@ def process_for_unit_test(
     #    Modules are parsed starting with leaf nodes so that all
     #    child subroutines will have been instantiated
     sub_init_dict: dict[str, SubInit] = {} 
+    with profile_ctx(enabled=False,section="preprocess_files") as pc:
+        mod_files = [
+            get_filename_from_module(m) for m in ordered_mods if not mod_dict[m].modified
+        ]
+        preprocess_files([f for f in mod_files if f], macros, jobs=jobs)
+
     with profile_ctx(enabled=False,section="modify_file") as pc:
+        if jobs > 1:
+            modify_files_parallel(
+                ordered_mods=ordered_mods,
+                mod_dict=mod_dict,
+                sub_init_dict=sub_init_dict,
+                case_dir=case_dir,
+                overwrite=overwrite,
+                jobs=jobs,
+            )
         for mod_name in ordered_mods:
             mod_file = get_filename_from_module(mod_name)
             if not mod_file:
@@ -0,0 +1,179 @@
+"""
+Export SPEL's objects for an E3SM commit straight into the Django database
+(`spel export --db`), instead of writing CSV files for update_all_data.
+"""
+
+import os
+import sys
+import time
+from typing import Optional
+
+from scripts.artifact_store import MOD, SUB, TYPE
+from scripts.DerivedType import DerivedType
+from scripts.export_objects import (active_dtype_rows, call_tree_rows,
+                                    instance_types, module_usage_rows,
+                                    open_store, subroutine_arg_rows,
+                                    subroutine_rows, type_def_rows,
+                                    type_inst_rows)
+from scripts.gitutils import changed_modules
+from scripts.mod_config import spel_dir
+
+django_project_dir = os.path.abspath(f"{spel_dir}/spel/spel")
+
+
+def setup_django():
+    """
+    Make the Django project importable and configure it (spel.settings
+    unless DJANGO_SETTINGS_MODULE is set)
+    """
+    import django
+
+    if django_project_dir not in sys.path:
+        sys.path.insert(0, django_project_dir)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "spel.settings")
+    django.setup()
+
+
+def export_db(commit: str, since: Optional[str] = None):
+    """
+    Load the objects stored for commit into the database. Each table is
+    written in one transaction, in the same order as update_all_data.
+
+    If since is an exported commit, only the modules affected by the changes
+    between the two commits (see affected_modules) are updated: their rows
+    are inserted, updated or deleted to match commit.
+    """
+    setup_django()
+    store = open_store(commit)
+    mod_names = store.names(MOD)
+    sub_index = store.index(SUB)
+    subroutines = {(module, sub_name) for sub_name, module in sub_index}
+
+    affected = since_id = None
+    if since:
+        affected, since_id, prev_mods, prev_subs = affected_modules(
+            since, commit, set(mod_names), subroutines
+        )
+        mod_dict = {m: store.get(MOD, m) for m in mod_names if m in affected}
+        sub_dict = {s: store.get(SUB, s) for s, module in sub_index if module in affected}
+        # Contents of commit: unaffected modules are the same as in since
+        modules = (prev_mods - affected) | (set(mod_names) & affected)
+        subroutines = {key for key in prev_subs if key[0] not in affected} | {
+            key for key in subroutines if key[0] in affected
+        }
+    else:
+        mod_dict = store.load_all(MOD)
+        sub_dict = store.load_all(SUB)
+        modules = set(mod_names)
+    type_dict: dict[str, DerivedType] = store.load_all(TYPE)
+    store.close()
+
+    load_tables(
+        commit,
+        [
+            ("module_deps", module_usage_rows(mod_dict)),
+            ("type_defs", type_def_rows(type_dict)),
+            ("user_type_instances", type_inst_rows(type_dict)),
+            ("subroutines", subroutine_rows([(s, m) for m, s in subroutines])),
+            ("subroutine_calltree", call_tree_rows(sub_dict)),
+            ("active_dtype_vars", active_dtype_rows(sub_dict, instance_types(type_dict))),
+            ("subroutine_args", subroutine_arg_rows(sub_dict)),
+        ],
+        modules=modules,
+        subroutines=subroutines,
+        affected=affected,
+        since_id=since_id,
+    )
+
+
+def affected_modules(
+    since: str,
+    commit: str,
+    modules: set[str],
+    subroutines: set[tuple[str, str]],
+) -> tuple[set[str], int, set[str], set[tuple[str, str]]]:
+    """
+    Returns the modules whose rows need to be updated from since to commit,
+    and the id, modules and subroutines of the exported since commit.
+
+    Those are the modules in files changed between the commits, modules
+    (or their subroutines) that were added or removed, and every module that
+    uses one of them, directly or not (per module_dependency).
+    """
+    from app.calltree import get_module_graph_cache
+    from app.models import ExportedCommits
+
+    try:
+        prev = ExportedCommits.objects.get(commit=since)
+    except ExportedCommits.DoesNotExist:
+        print(f"export_db::{since} hasn't been exported. Run spel export -c {since} --db")
+        sys.exit(1)
+    prev_mods = set(prev.modules.values_list("module_name", flat=True))
+    prev_subs = set(prev.subroutines.values_list("module__module_name", "subroutine_name"))
+
+    changed = changed_modules(since, commit) & (modules | prev_mods)
+    changed |= modules ^ prev_mods
+    changed |= {module for module, _ in subroutines ^ prev_subs}
+
+    graph = get_module_graph_cache(prev.pk)
+    users: dict[str, set[str]] = {}
+    for mod_id, deps in graph.deps.items():
+        for dep_id in deps:
+            users.setdefault(graph.names[dep_id], set()).add(graph.names[mod_id])
+
+    affected = set(changed)
+    stack = list(changed)
+    while stack:
+        for user in users.get(stack.pop(), ()):
+            if user not in affected:
+                affected.add(user)
+                stack.append(user)
+
+    print(f"{len(changed)} modules changed since {since}, {len(affected)} affected")
+    return affected, prev.pk, prev_mods, prev_subs
+
+
+def load_tables(commit, tables, modules, subroutines, affected=None, since_id=None):
+    """
+    tables: (name, rows) in load order
+    modules/subroutines: contents of commit recorded in ExportedCommits
+    affected: if set, only the rows of these modules are taken from tables,
+    the others are copied from commit since_id
+
+    The rows of commit are synced: rows that are no longer exported are
+    deleted, so exporting a commit again only writes what changed.
+    """
+    from app.management import bulk_load
+    from app.models import ExportedCommits, Modules, Subroutines
+    from django.db import transaction
+
+    start = time.perf_counter()
+    commit_id = bulk_load.get_commit_id(commit)
+    for name, rows in tables:
+        t0 = time.perf_counter()
+        try:
+            with transaction.atomic():
+                counts, errors = bulk_load.sync_table(
+                    name, rows, commit_id, modules=affected, since_id=since_id
+                )
+        except bulk_load.LoadError as e:
+            print(f"export_db::Couldn't load {name}:\n{e}")
+            sys.exit(1)
+        for msg in errors:
+            print(f"export_db::{name}: {msg}")
+        summary = ", ".join(f"{num} {what}" for what, num in counts.items())
+        print(f"{name}: {summary} in {time.perf_counter() - t0:.2f} s")
+
+    with transaction.atomic():
+        exported = ExportedCommits.objects.get(pk=commit_id)
+        mod_ids = bulk_load.id_map(Modules, "module_name")
+        sub_ids = bulk_load.id_map(Subroutines, "module__module_name", "subroutine_name")
+        exported.modules.set([mod_ids[m] for m in modules if m in mod_ids])
+        exported.subroutines.set([sub_ids[key] for key in subroutines if key in sub_ids])
+        exported.save()
+        bulk_load.bump_version(commit_id)
+        pruned = bulk_load.prune_shared()
+    print("Deleted unused " + ", ".join(f"{num} {model}" for model, num in pruned.items()))
+
+    print(f"Exported {commit} in {time.perf_counter() - start:.2f} s")
+    return
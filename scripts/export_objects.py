@@ -1,27 +1,23 @@
+import os
 import pickle
 import sys
 
 import pandas as pd
 
 from scripts.analyze_subroutines import Subroutine
+from scripts.artifact_store import MOD, SUB, TYPE, ArtifactStore
 from scripts.DerivedType import DerivedType
 from scripts.fortran_modules import FortranModule
 from scripts.mod_config import E3SM_SRCROOT, django_database, scripts_dir
-from scripts.utilityFunctions import Variable
 
 
-def pickle_unit_test(
-    mod_dict: dict[str, FortranModule],
-    sub_dict: dict[str, Subroutine],
-    type_dict: dict[str, DerivedType],
-):
+def get_e3sm_commit() -> str:
     """
-    Function to dump SPEL's output as pickled objects.
+    Returns the short hash of E3SM_SRCROOT's HEAD
     """
-
     import subprocess as sp
 
-    func_name = "pickle_unit_test"
+    func_name = "get_e3sm_commit"
     cmd = f"{scripts_dir}/git_commit.sh {E3SM_SRCROOT}"
     output = sp.getoutput(cmd)
 
@@ -29,172 +25,172 @@ def pickle_unit_test(
         print(f"{func_name}::Couldn't find GIT COMMIT\n{output}")
         sys.exit(1)
     output = output.split()
-    output[1] = output[1][0:7]
-    commit = output[1]
+    return output[1][0:7]
 
-    for mod in mod_dict.values():
-        mod.filepath = mod.filepath.replace(E3SM_SRCROOT, "")
 
-    dbfile = open(f"{scripts_dir}/mod_dict-{commit}.pkl", "ab")
-    pickle.dump(mod_dict, dbfile)
-    dbfile.close()
+def pickle_unit_test(
+    mod_dict: dict[str, FortranModule],
+    sub_dict: dict[str, Subroutine],
+    type_dict: dict[str, DerivedType],
+):
+    """
+    Function to save SPEL's output to the artifact store of the E3SM commit.
+    Objects from previous unit tests of the same commit are kept/updated.
+    """
+    commit = get_e3sm_commit()
+    store = ArtifactStore(commit)
+    store.put_objects(mod_dict, sub_dict, type_dict)
+    store.close()
 
-    for sub in sub_dict.values():
-        sub.filepath = sub.filepath.replace(E3SM_SRCROOT, "")
 
-    dbfile = open(f"{scripts_dir}/sub_dict-{commit}.pkl", "ab")
-    pickle.dump(sub_dict, dbfile)
-    dbfile.close()
+def import_legacy_pickles(store: ArtifactStore, fns: list[str]):
+    """
+    Merge every record appended to the old `<kind>_dict-<commit>.pkl` files
+    (fns ordered mod, sub, type) into store.
+    """
 
-    for dtype in type_dict.values():
-        dtype.filepath = dtype.filepath.replace(E3SM_SRCROOT, "")
+    def records(fn):
+        with open(fn, "rb") as dbfile:
+            while True:
+                try:
+                    yield pickle.load(dbfile)
+                except EOFError:
+                    return
 
-    dbfile = open(f"{scripts_dir}/type_dict-{commit}.pkl", "ab")
-    pickle.dump(type_dict, dbfile)
-    dbfile.close()
+    for mod_dict, sub_dict, type_dict in zip(*(records(fn) for fn in fns)):
+        store.put_objects(mod_dict, sub_dict, type_dict)
+    return
 
 
-def unpickle_unit_test(commit):
+def open_store(commit: str) -> ArtifactStore:
     """
-    Function to load SPEL's output from pickled files.
+    Open the artifact store of commit, importing the legacy pickle files if needed.
     """
-    mod_dict, sub_dict, type_dict = {}, {}, {}
-    dbfile = open(f"{scripts_dir}/mod_dict-{commit}.pkl", "rb")
-    mod_dict = pickle.load(dbfile)
-    dbfile.close()
-
-    for mod in mod_dict.values():
-        mod.filepath = E3SM_SRCROOT + mod.filepath
+    fns = [f"{scripts_dir}/{kind}_dict-{commit}.pkl" for kind in ("mod", "sub", "type")]
+    legacy = all(os.path.exists(fn) for fn in fns)
+    if not ArtifactStore.exists(commit) and not legacy:
+        print(f"Error: No objects stored for commit {commit}")
+        sys.exit(1)
 
-    dbfile = open(f"{scripts_dir}/sub_dict-{commit}.pkl", "rb")
-    sub_dict = pickle.load(dbfile)
-    dbfile.close()
+    store = ArtifactStore(commit)
+    if not store.names(MOD) and legacy:
+        import_legacy_pickles(store, fns)
+    return store
 
-    for sub in sub_dict.values():
-        sub.filepath = E3SM_SRCROOT + sub.filepath
 
-    dbfile = open(f"{scripts_dir}/type_dict-{commit}.pkl", "rb")
-    type_dict = pickle.load(dbfile)
-    dbfile.close()
-    for dtype in type_dict.values():
-        dtype.filepath = E3SM_SRCROOT + dtype.filepath
+def unpickle_unit_test(commit):
+    """
+    Function to load SPEL's output from the artifact store.
+    """
+    store = open_store(commit)
 
+    mod_dict = store.load_all(MOD)
+    sub_dict = store.load_all(SUB)
+    type_dict = store.load_all(TYPE)
+    store.close()
     return mod_dict, sub_dict, type_dict
 
 
-def export_table_csv(commit: str):
-    """ """
-
-    mod_dict: dict[str, FortranModule] = {}
-    sub_dict: dict[str, Subroutine] = {}
-    type_dict: dict[str, DerivedType] = {}
-
-    mod_dict, sub_dict, type_dict = unpickle_unit_test(commit)
-
+def instance_types(type_dict: dict[str, DerivedType]) -> dict[str, DerivedType]:
+    """
+    Map of instance name to its DerivedType
+    """
     inst_to_dtype: dict[str, DerivedType] = {}
     for dtype in type_dict.values():
         for inst in dtype.instances:
             inst_to_dtype[inst] = dtype
 
     inst_to_dtype["bounds"] = type_dict["bounds_type"]
+    return inst_to_dtype
+
+
+def export_table_csv(commit: str):
+    """ """
+
+    store = open_store(commit)
+
+    mod_dict: dict[str, FortranModule] = store.load_all(MOD)
+    sub_dict: dict[str, Subroutine] = store.load_all(SUB)
+    type_dict: dict[str, DerivedType] = store.load_all(TYPE)
+
+    inst_to_dtype = instance_types(type_dict)
 
     prefix = django_database
     export_module_usage(mod_dict, prefix)
-    export_subroutines(sub_dict, prefix)
+    export_subroutines(store.index(SUB), prefix)
     export_subroutine_args(sub_dict, prefix)
     export_sub_call_tree(sub_dict, prefix)
     export_type_insts(type_dict, prefix)
     export_type_defs(type_dict, prefix)
     export_sub_active_dtypes(sub_dict, inst_to_dtype, prefix)
+    store.close()
     return
 
 
-def export_type_defs(type_dict: dict[str, DerivedType], prefix: str):
-    field_names = [
-        "module",
-        "user_type_name",
-        "member_type",
-        "member_name",
-        "dim",
-        "bounds",
-    ]
-    data = {f: [] for f in field_names}
-    csv_file = f"{prefix}type_defs.csv"
-
-    def add_row(mod_name, type_name, field_var):
-        data["module"].append(mod_name)
-        data["user_type_name"].append(type_name)
-        data["member_type"].append(field_var.type)
-        data["member_name"].append(field_var.name)
-        data["dim"].append(field_var.dim)
-        data["bounds"].append(field_var.bounds)
-        return
-
+# Columns of each exported table. Rows are dicts with these keys.
+TYPE_DEF_FIELDS = ["module", "user_type_name", "member_type", "member_name", "dim", "bounds"]
+SUBROUTINE_FIELDS = ["module", "subroutine"]
+ACTIVE_DTYPE_FIELDS = [
+    "sub_module",
+    "subroutine",
+    "type_module",
+    "inst_type",
+    "inst_name",
+    "member_type",
+    "member_name",
+    "status",
+]
+TYPE_INST_FIELDS = ["module", "user_type_name", "instance_name"]
+CALL_TREE_FIELDS = ["mod_parent", "parent_subroutine", "mod_child", "child_subroutine"]
+SUBROUTINE_ARG_FIELDS = ["module", "subroutine", "arg_type", "arg_name", "dim"]
+MODULE_DEP_FIELDS = ["module_name", "dep_module_name", "object_used"]
+
+
+def type_def_rows(type_dict: dict[str, DerivedType]) -> list[dict]:
+    rows = []
     for dtype in type_dict.values():
         type_name = dtype.type_name
         mod = dtype.declaration
         for field_var in dtype.components.values():
             if "%" in field_var.name:
                 field_var.name = field_var.name.split("%")[1]
-            add_row(mod, type_name, field_var)
+            rows.append(
+                {
+                    "module": mod,
+                    "user_type_name": type_name,
+                    "member_type": field_var.type,
+                    "member_name": field_var.name,
+                    "dim": field_var.dim,
+                    "bounds": field_var.bounds,
+                }
+            )
+    return rows
+
 
-    write_dict_to_csv(data, field_names, csv_file)
+def export_type_defs(type_dict: dict[str, DerivedType], prefix: str):
+    csv_file = f"{prefix}type_defs.csv"
+    write_dict_to_csv(type_def_rows(type_dict), TYPE_DEF_FIELDS, csv_file)
     return
 
 
-def export_subroutines(sub_dict: dict[str, Subroutine], prefix: str):
-    """ """
-    field_names = ["module", "subroutine"]
-    data = {f: [] for f in field_names}
+def subroutine_rows(sub_index: list[tuple[str, str]]) -> list[dict]:
+    """
+    sub_index: (subroutine, module) pairs from the artifact store's index
+    """
+    return [{"module": module, "subroutine": sub_name} for sub_name, module in sub_index]
 
-    csv_file = f"{prefix}subroutines.csv"
-    for sub in sub_dict.values():
-        module = sub.module
-        sub_name = sub.name
-        data["module"].append(module)
-        data["subroutine"].append(sub_name)
 
-    write_dict_to_csv(data, field_names, csv_file)
+def export_subroutines(sub_index: list[tuple[str, str]], prefix: str):
+    csv_file = f"{prefix}subroutines.csv"
+    write_dict_to_csv(subroutine_rows(sub_index), SUBROUTINE_FIELDS, csv_file)
     return
 
 
-def export_sub_active_dtypes(
+def active_dtype_rows(
     sub_dict: dict[str, Subroutine],
     inst_to_type_dict: dict[str, DerivedType],
-    prefix: str,
-):
-    field_names = [
-        "sub_module",
-        "subroutine",
-        "type_module",
-        "inst_type",
-        "inst_name",
-        "member_type",
-        "member_name",
-        "status",
-    ]
-    data = {f: [] for f in field_names}
-    csv_file = f"{prefix}active_dtype_vars.csv"
-
-    def add_row(
-        mod_name,
-        sub_name,
-        type_module,
-        inst_type,
-        inst_name,
-        field_var,
-        status,
-    ):
-        data["sub_module"].append(mod_name)
-        data["subroutine"].append(sub_name)
-        data["type_module"].append(type_module)
-        data["inst_type"].append(inst_type)
-        data["inst_name"].append(inst_name)
-        data["member_type"].append(field_var.type)
-        data["member_name"].append(field_var.name)
-        data["status"].append(status)
-        return
-
+) -> list[dict]:
+    rows = []
     for sub in sub_dict.values():
         module = sub.module
         sub_name = sub.name
@@ -206,129 +202,124 @@ def export_sub_active_dtypes(
             field_var = dtype.components[field]
             if "%" in field_var.name:
                 field_var.name = field_var.name.split("%")[1]
-            add_row(
-                module,
-                sub_name,
-                dtype.declaration,
-                dtype.type_name,
-                inst,
-                field_var,
-                stat,
+            rows.append(
+                {
+                    "sub_module": module,
+                    "subroutine": sub_name,
+                    "type_module": dtype.declaration,
+                    "inst_type": dtype.type_name,
+                    "inst_name": inst,
+                    "member_type": field_var.type,
+                    "member_name": field_var.name,
+                    "status": stat,
+                }
             )
+    return rows
 
-    write_dict_to_csv(data, field_names, csv_file)
 
+def export_sub_active_dtypes(
+    sub_dict: dict[str, Subroutine],
+    inst_to_type_dict: dict[str, DerivedType],
+    prefix: str,
+):
+    csv_file = f"{prefix}active_dtype_vars.csv"
+    rows = active_dtype_rows(sub_dict, inst_to_type_dict)
+    write_dict_to_csv(rows, ACTIVE_DTYPE_FIELDS, csv_file)
     return
 
 
-def export_type_insts(type_dict: dict[str, DerivedType], prefix: str):
-    field_names = ["module", "user_type_name", "instance_name"]
-    data = {f: [] for f in field_names}
-    csv_file = f"{prefix}user_type_instances.csv"
-
-    def add_row(mod_name, type_name, inst_name):
-        data["module"].append(mod_name)
-        data["user_type_name"].append(type_name)
-        data["instance_name"].append(inst_name)
-        return
-
+def type_inst_rows(type_dict: dict[str, DerivedType]) -> list[dict]:
+    rows = []
     for dtype in type_dict.values():
         type_name = dtype.type_name
         mod = dtype.declaration
         for inst in dtype.instances:
-            add_row(mod, type_name, inst)
-
-    write_dict_to_csv(data, field_names, csv_file)
-    return
+            rows.append({"module": mod, "user_type_name": type_name, "instance_name": inst})
+    return rows
 
 
-def export_sub_call_tree(sub_dict: dict[str, Subroutine], prefix: str):
-    field_names = ["mod_parent", "parent_subroutine", "mod_child", "child_subroutine"]
-    data = {f: [] for f in field_names}
-
-    csv_file = f"{prefix}subroutine_calltree.csv"
+def export_type_insts(type_dict: dict[str, DerivedType], prefix: str):
+    csv_file = f"{prefix}user_type_instances.csv"
+    write_dict_to_csv(type_inst_rows(type_dict), TYPE_INST_FIELDS, csv_file)
+    return
 
-    def add_row(mod_parent, parent, mod_child, child):
-        data["mod_parent"].append(mod_parent)
-        data["parent_subroutine"].append(parent)
-        data["mod_child"].append(mod_child)
-        data["child_subroutine"].append(child)
-        return
 
+def call_tree_rows(sub_dict: dict[str, Subroutine]) -> list[dict]:
+    rows = []
     for sub in sub_dict.values():
         parent = sub.name
         mod_p = sub.module
-        for child in sub.child_subroutines:
-            mod_c = sub_dict[child].module
-            add_row(mod_p, parent, mod_c, child)
-
-    write_dict_to_csv(data, field_names, csv_file)
-    return
-
-
-def export_subroutine_args(sub_dict: dict[str, Subroutine], prefix):
+        for child, child_sub in sub.child_subroutines.items():
+            rows.append(
+                {
+                    "mod_parent": mod_p,
+                    "parent_subroutine": parent,
+                    "mod_child": child_sub.module,
+                    "child_subroutine": child,
+                }
+            )
+    return rows
 
-    field_names = ["module", "subroutine", "arg_type", "arg_name", "dim"]
-    csv_file = f"{prefix}subroutine_args.csv"
 
-    export_dict = {f: [] for f in field_names}
+def export_sub_call_tree(sub_dict: dict[str, Subroutine], prefix: str):
+    csv_file = f"{prefix}subroutine_calltree.csv"
+    write_dict_to_csv(call_tree_rows(sub_dict), CALL_TREE_FIELDS, csv_file)
+    return
 
-    def add_row(mod_name, sub_name, arg: Variable):
-        export_dict["module"].append(mod_name)
-        export_dict["subroutine"].append(sub_name)
-        export_dict["arg_type"].append(arg.type)
-        export_dict["arg_name"].append(arg.name)
-        export_dict["dim"].append(arg.dim)
-        return
 
+def subroutine_arg_rows(sub_dict: dict[str, Subroutine]) -> list[dict]:
+    rows = []
     for sub in sub_dict.values():
         sub_name = sub.name
         module = sub.module
         for arg in sub.Arguments.values():
-            add_row(module, sub_name, arg)
-
-    write_dict_to_csv(export_dict, field_names, csv_file)
-    return
-
-
-def export_module_usage(mod_dict: dict[str, FortranModule], prefix):
-    """
-    Function creates csv file to update Modules/ModuleDependency Tables
-    """
+            rows.append(
+                {
+                    "module": module,
+                    "subroutine": sub_name,
+                    "arg_type": arg.type,
+                    "arg_name": arg.name,
+                    "dim": arg.dim,
+                }
+            )
+    return rows
 
-    field_names = ["module_name", "dep_module_name", "object_used"]
-    csv_file = f"{prefix}module_deps.csv"
 
-    export_dict = {f: [] for f in field_names}
+def export_subroutine_args(sub_dict: dict[str, Subroutine], prefix):
+    csv_file = f"{prefix}subroutine_args.csv"
+    write_dict_to_csv(subroutine_arg_rows(sub_dict), SUBROUTINE_ARG_FIELDS, csv_file)
+    return
 
-    def add_row(mod_name, dep_name, obj):
-        export_dict["module_name"].append(mod_name)
-        export_dict["dep_module_name"].append(dep_name)
-        export_dict["object_used"].append(obj)
-        return
 
+def module_usage_rows(mod_dict: dict[str, FortranModule]) -> list[dict]:
+    rows = []
     for mod in mod_dict.values():
         mod_name = mod.name
         for dep_mod, usage in mod.modules.items():
             if usage.all:
-                add_row(mod_name, dep_mod, "all")
+                objs = ["all"]
             else:
-                for ptrobj in usage.clause_vars:
-                    add_row(mod_name, dep_mod, ptrobj.obj)
+                objs = [ptrobj.obj for ptrobj in usage.clause_vars]
+            for obj in objs:
+                rows.append(
+                    {"module_name": mod_name, "dep_module_name": dep_mod, "object_used": obj}
+                )
+    return rows
 
-    write_dict_to_csv(
-        export_dict,
-        field_names,
-        csv_file,
-    )
 
+def export_module_usage(mod_dict: dict[str, FortranModule], prefix):
+    """
+    Function creates csv file to update Modules/ModuleDependency Tables
+    """
+    csv_file = f"{prefix}module_deps.csv"
+    write_dict_to_csv(module_usage_rows(mod_dict), MODULE_DEP_FIELDS, csv_file)
     return
 
 
-def write_dict_to_csv(data, fieldnames, csv_file):
+def write_dict_to_csv(rows: list[dict], fieldnames, csv_file):
     print(f"writing to {csv_file}")
 
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(rows, columns=fieldnames)
     print(df)
     df.to_csv(f"{csv_file}", index=False)
     print(f"CSV file '{csv_file}' has been created.")
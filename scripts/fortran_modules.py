@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import subprocess as sp
 import sys
 from copy import deepcopy
 from typing import TYPE_CHECKING, Optional
@@ -12,7 +11,8 @@ if TYPE_CHECKING:
     from scripts.DerivedType import DerivedType
 
 import scripts.dynamic_globals as dg
-from scripts.mod_config import ELM_SRC, SHR_SRC, _bc
+from scripts.mod_config import _bc
+from scripts.source_index import get_source_index
 from scripts.types import LineTuple, ModUsage, PointerAlias
 
 
@@ -21,16 +21,13 @@ def get_module_name_from_file(fpath: str) -> tuple[int, str]:
     Given a file path, returns the name of the module
     """
     if fpath not in dg.map_fpath_to_module_name:
-        cmd = f'grep -rin -E "^[[:space:]]*module [[:space:]]*[[:alnum:]]+" {fpath}'
-        # the module declaration will be the first one. Any others will be interfaces
-        module_name = sp.getoutput(cmd).split("\n")[0]
-        # grep will have pattern <line_number>:module <module_name>
-        linenumber, module_name = module_name.split(":")
-        module_name = module_name.split()[1].lower()
-        linenumber = int(linenumber)
-        dg.map_fpath_to_module_name[fpath] = (linenumber, module_name)
-    else:
-        linenumber, module_name = dg.map_fpath_to_module_name[fpath]
+        # the module declaration will be the first one.
+        mod_info = get_source_index().module_of_file(fpath)
+        if mod_info is None:
+            sys.exit(f"get_module_name_from_file::Couldn't find module in {fpath}")
+        dg.map_fpath_to_module_name[fpath] = mod_info
+
+    linenumber, module_name = dg.map_fpath_to_module_name[fpath]
 
     return linenumber, module_name
 
@@ -42,27 +39,12 @@ def get_filename_from_module(module_name: str, verbose: bool = False):
     if module_name in dg.map_module_name_to_fpath:
         return dg.map_module_name_to_fpath[module_name]
 
-    cmd = f'grep -rin --exclude-dir=external_models/ "module {module_name}" {ELM_SRC}*'
-    elm_output = sp.getoutput(cmd)
-    if not elm_output:
-        if verbose:
-            print("Checking shared modules...")
-        #
-        # If file is not an ELM file, may be a shared module in E3SM/share/util/
-        #
-        cmd = f'grep -rin --exclude-dir=external_models/ "module {module_name}" {SHR_SRC}*'
-        shr_output = sp.getoutput(cmd)
-
-        if not shr_output:
-            if verbose:
-                print(
-                    f"Couldn't find {module_name} in ELM or shared source -- adding to removal list"
-                )
-            file_path = None
-        else:
-            file_path = shr_output.split("\n")[0].split(":")[0]
-    else:
-        file_path = elm_output.split("\n")[0].split(":")[0]
+    # Modules in ELM_SRC take precedence over shared modules in E3SM/share/util/
+    file_path = get_source_index().file_of_module(module_name)
+    if file_path is None and verbose:
+        print(
+            f"Couldn't find {module_name} in ELM or shared source -- adding to removal list"
+        )
 
     dg.map_module_name_to_fpath[module_name] = file_path
 
@@ -3,6 +3,7 @@ from __future__ import annotations
 import re
 import sys
 from dataclasses import dataclass
+from functools import lru_cache
 from pprint import pprint
 from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
@@ -15,6 +16,7 @@ if TYPE_CHECKING:
 
 from scripts.fortran_parser.environment import Environment, add_ptr_vars
 from scripts.fortran_parser.lexer import Lexer
+from scripts.fortran_parser.spel_ast import Statement
 from scripts.fortran_parser.spel_parser import Parser
 from scripts.fortran_parser.tracing import Trace
 from scripts.types import (ArgDesc, ArgNode, ArgType, ArgVar, CallDesc,
@@ -199,6 +201,34 @@ def make_tree(flat_arg_nodes: List[ArgNode]) -> ArgTree:
     return root
 
 
+regex_blanks = re.compile(r"[ \t]+")
+
+# Parser reused for every call statement (see reset_lexer)
+call_parser = Parser(lex=Lexer(input=""))
+
+
+def normalize_call_text(line: str) -> str:
+    """
+    Key for parse_call_text. Runs of blanks are only collapsed outside
+    of lines with string literals so the literals are unchanged.
+    """
+    line = line.strip().lower()
+    if "'" not in line and '"' not in line:
+        line = regex_blanks.sub(" ", line)
+    return line
+
+
+@lru_cache(maxsize=4096)
+def parse_call_text(text: str) -> tuple[Statement, ...]:
+    """
+    Parse normalized call text. Identical call lines across subroutines are
+    only parsed once -- callers must not modify the returned statements.
+    """
+    call_parser.reset_lexer(Lexer(input=text))
+    program = call_parser.parse_program()
+    return tuple(program.statements)
+
+
 @Trace.trace_decorator("parse_subroutine_call")
 def parse_subroutine_call(
     sub: Subroutine,
@@ -211,14 +241,12 @@ def parse_subroutine_call(
     """
     Function to generate and parse an AST for a subroutine call string
     """
-    lex = Lexer(input=input.line)
-    parser = Parser(lex=lex)
-    program = parser.parse_program()
-    if len(program.statements) > 1:
+    statements = parse_call_text(normalize_call_text(input.line))
+    if len(statements) > 1:
         print("Error -- multiple calls in input")
         sys.exit(1)
 
-    stmt = program.statements[0]
+    stmt = statements[0]
     ast: Dict[str, Any] = stmt.to_dict()
 
     node_type = ast["Node"]
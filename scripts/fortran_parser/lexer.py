@@ -1,170 +1,105 @@
+import re
+from functools import lru_cache
+
 import scripts.fortran_parser.tokens as tokens
-from scripts.fortran_parser.tracing import Trace
+
+# Single-character operators/delimiters
+_char_tokens: dict[str, tokens.TokenTypes] = {
+    "=": tokens.TokenTypes.ASSIGN,
+    "(": tokens.TokenTypes.LPAREN,
+    ")": tokens.TokenTypes.RPAREN,
+    ",": tokens.TokenTypes.COMMA,
+    "+": tokens.TokenTypes.PLUS,
+    "-": tokens.TokenTypes.MINUS,
+    "*": tokens.TokenTypes.ASTERISK,
+    "/": tokens.TokenTypes.SLASH,
+    "\n": tokens.TokenTypes.NEWLINE,
+    ":": tokens.TokenTypes.COLON,
+    "%": tokens.TokenTypes.PERCENT,
+    "==": tokens.TokenTypes.EQUIV,
+    "**": tokens.TokenTypes.EXP,
+}
+
+# Master regex. Alternatives are tried in order at each position.
+#   NUM: digits, each optionally followed by a single "." (e.g., 1.5, 10.)
+#   IDENT: FORTRAN allows numbers, _, and % (for derived types) in identifier names
+#   STRING/DOT: read to the closing delimiter, e.g., 'abc' or .true.
+regex_token = re.compile(
+    r"""[ \t]*(?:
+        (?P<NUM>(?:\d\.?)+)
+        |(?P<IDENT>[^\W\d][\w%]*)
+        |'(?P<SQUOTE>[^']*)'?
+        |"(?P<DQUOTE>[^"]*)"?
+        |\.(?P<DOT>[^.]*)\.?
+        |(?P<OP>==|\*\*|[=(),+\-*/\n:%])
+        |(?P<ILLEGAL>[^ \t])
+    )""",
+    re.VERBOSE | re.DOTALL,
+)
+
+# Scientific notation/precision following a number with a ".".
+# EX: 1.D-10, 1.E+3, 1._r8
+regex_precision = re.compile(
+    r"[de](?![ \t])[+-]?.?(?:\d\.?)*|_(?![ \t])[\w%]*",
+    re.DOTALL,
+)
+
+
+@lru_cache(maxsize=4096)
+def tokenize(input: str) -> tuple[tokens.Token, ...]:
+    """
+    Returns the tokens of input (already lowercased), excluding EOF.
+    """
+    toks: list[tokens.Token] = []
+    pos = 0
+    end = len(input)
+    while pos < end:
+        m = regex_token.match(input, pos)
+        if not m:
+            # trailing white space
+            break
+        kind = m.lastgroup
+        pos = m.end()
+        lit = m.group(kind)
+        if kind == "NUM":
+            if "." in lit:
+                m_prec = regex_precision.match(input, pos)
+                if m_prec:
+                    pos = m_prec.end()
+                    lit = input[m.start(kind) : pos]
+                toks.append(new_token(tokens.TokenTypes.FLOAT, lit))
+            else:
+                toks.append(new_token(tokens.TokenTypes.INT, lit))
+        elif kind == "IDENT":
+            toks.append(new_token(tokens.lookup_indentifer(lit), lit))
+        elif kind == "SQUOTE" or kind == "DQUOTE":
+            toks.append(new_token(tokens.TokenTypes.STRING, lit))
+        elif kind == "DOT":
+            toks.append(new_token(tokens.lookup_indentifer(f".{ lit }."), f".{ lit }."))
+        elif kind == "OP":
+            toks.append(new_token(_char_tokens[lit], lit))
+        else:
+            toks.append(new_token(tokens.TokenTypes.ILLEGAL, lit))
+    return tuple(toks)
 
 
 class Lexer:
     def __init__(self, input: str):
         self.input: str = input.lower()  # FORTRAN case-insensitive
+        self.tokens: tuple[tokens.Token, ...] = tokenize(self.input)
         self.position: int = 0
-        self.read_position: int = 0
-        self.ch: str = ""
-        self.read_char()
-
-    @Trace.trace_decorator("read_to_delim")
-    def read_to_delim(self, delim: str):
-        """
-        Func to read to delim (i.e. '  or ") for string tokens
-        """
-        pos = self.position
-        while self.peek_char() != delim:
-            self.read_char()
-        self.read_char()
-        return self.input[pos + 1 : self.position]
-
-    def read_char(self):
-        if self.read_position >= len(self.input):
-            self.ch = ""
-        else:
-            self.ch = self.input[self.read_position]
-        self.position = self.read_position
-        self.read_position += 1
-
-    def read_identifier(self) -> str:
-        # Identifiers may contain digits but can't start with digits
-        pos = self.position
-        while is_valid_ident(self.ch):
-            self.read_char()
-        return self.input[pos : self.position]
-
-    def read_num(self) -> str:
-        pos = self.position
-        check_prec = False
-        while is_number(self.ch):
-            self.read_char()
-            if self.ch == ".":
-                check_prec = True
-                self.read_char()
-        if check_prec:
-            self.check_precision()
-
-        return self.input[pos : self.position]
-
-    def check_precision(self):
-        """
-        Need to retrieve scientific notation/precision.
-        EX: 1.D-10, 1.E+3, 1._r8
-        """
-        peek_ch = self.peek_char()
-        if peek_ch == " " or peek_ch == "\t":
-            return
-        if self.ch in ["d", "e"]:
-            self.read_char()  # cur token is now one of the above.
-            if self.ch in ["-", "+"]:
-                self.read_char()
-            # self.ch is either a letter or +/-
-            self.read_char()
-            self.read_num()  # Advance position to end of exponent
-        elif self.ch == "_":
-            self.read_identifier()
-        return
-
-    def skip_white_space(self) -> None:
-        while self.ch == " " or self.ch == "\t":
-            self.read_char()
-        return
-
-    def peek_char(self):
-        if self.read_position >= len(self.input):
-            return ""
-        else:
-            return self.input[self.read_position]
 
     def next_token(self) -> tokens.Token:
         """
         Get next tokens
         """
-
-        self.skip_white_space()
-
-        match self.ch:
-            case "=":
-                next_ch = self.peek_char()
-                if next_ch == "=":
-                    tok = new_token(tokens.TokenTypes.EQUIV, "==")
-                    self.read_char()
-                else:
-                    tok = new_token(tokens.TokenTypes.ASSIGN, self.ch)
-            case "(":
-                tok = new_token(tokens.TokenTypes.LPAREN, self.ch)
-            case ")":
-                tok = new_token(tokens.TokenTypes.RPAREN, self.ch)
-            case ",":
-                tok = new_token(tokens.TokenTypes.COMMA, self.ch)
-            case "+":
-                tok = new_token(tokens.TokenTypes.PLUS, self.ch)
-            case "-":
-                tok = new_token(tokens.TokenTypes.MINUS, self.ch)
-            case "*":
-                next_ch = self.peek_char()
-                if next_ch == "*":
-                    lit = "**"
-                    self.read_char()
-                    tok = new_token(tokens.TokenTypes.EXP, lit)
-                else:
-                    tok = new_token(tokens.TokenTypes.ASTERISK, self.ch)
-            case "/":
-                tok = new_token(tokens.TokenTypes.SLASH, self.ch)
-            case "":
-                tok = new_token(tokens.TokenTypes.EOF, "")
-            case "\n":
-                tok = new_token(tokens.TokenTypes.NEWLINE, self.ch)
-            case ":":
-                tok = new_token(tokens.TokenTypes.COLON, self.ch)
-            case "%":
-                tok = new_token(tokens.TokenTypes.PERCENT, self.ch)
-            case "'":
-                delim = self.ch
-                lit: str = self.read_to_delim(delim)
-                tok = new_token(tokens.TokenTypes.STRING, lit)
-            case '"':
-                delim = self.ch
-                lit: str = self.read_to_delim(delim)
-                tok = new_token(tokens.TokenTypes.STRING, lit)
-            case ".":
-                delim = self.ch
-                lit: str = self.read_to_delim(delim)
-                tok_type = tokens.lookup_indentifer(f".{ lit }.")
-                tok = new_token(tok_type, f".{ lit }.")
-            case _:
-                cur_ch = self.ch
-                if cur_ch.isalpha() or cur_ch == "_":
-                    lit: str = self.read_identifier()
-                    tok_type = tokens.lookup_indentifer(lit)
-                    tok = new_token(tok_type, lit)
-                    return tok
-                elif is_number(cur_ch):
-                    lit: str = self.read_num()
-                    if "." in lit:
-                        tok = new_token(tokens.TokenTypes.FLOAT, lit)
-                    else:
-                        tok = new_token(tokens.TokenTypes.INT, lit)
-                    return tok
-                else:
-                    tok = new_token(tokens.TokenTypes.ILLEGAL, self.ch)
-
-        self.read_char()
+        if self.position >= len(self.tokens):
+            return new_token(tokens.TokenTypes.EOF, "")
+        tok = self.tokens[self.position]
+        self.position += 1
         return tok
 
 
-def is_valid_ident(ch: str) -> bool:
-    "FORTRAN allows numbers, _, and % (for derived types) in identifier names"
-    return ch.isalnum() or ch == "_" or ch == "%"
-
-
-def is_number(ch: str) -> bool:
-    return ch.isdigit()
-
-
 def new_token(tok_type, lit) -> tokens.Token:
     token = tokens.Token(
         token=tok_type,
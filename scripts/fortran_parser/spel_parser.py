@@ -94,6 +94,7 @@ class Parser:
         Function to reuse parser with new input/lexer
         """
         self.lexer = lex
+        self.errors = []
         self.next_token()
         self.next_token()
 
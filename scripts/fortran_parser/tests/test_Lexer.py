@@ -82,6 +82,26 @@ class LexTests(unittest.TestCase):
         for stmt in program1.statements:
             pprint(stmt.to_dict(), sort_dicts=False)
 
+    def test_reused_parser(self):
+        from scripts.fortran_parser.evaluate import (normalize_call_text,
+                                                     parse_call_text)
+
+        inputs = [
+            "call foo(a%b, x(1:n), 1.e-10_r8, 'A  B', .true.)",
+            "CALL  foo(a%b,   x(1:n), 1.e-10_r8, 'A  B', .true.)",
+            "call bar(min(2*x,arg=4.0), y**2 == z)",
+        ]
+        for input in inputs:
+            with self.subTest(input=input):
+                fresh = Parser(lex=lexer.Lexer(input)).parse_program()
+                cached = parse_call_text(normalize_call_text(input))
+                self.assertEqual([str(s) for s in fresh.statements], [str(s) for s in cached])
+
+        # String literals aren't normalized
+        self.assertNotEqual(
+            normalize_call_text("call f('a  b')"), normalize_call_text("call f('a b')")
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,60 +1,123 @@
 """
 Functions to process the git output and show differences between commits
 """
-def check_new_additions(): 
-    from edit_files import process_for_unit_test 
-    
-    files, lines = git_diff() 
-    needed_mods = []
-
-    for f in files: 
-        sublist = process_for_unit_test(fname=f,casename="casename",
-                     mods=needed_mods,overwrite=False,verbose=False,singlefile=True)
-    
-    for s in sublist:
-        s.examineLoops()
-
-def git_diff(commit="067be7cbc99cd349770d4eeb8270b58f47498dfe"):
-    import subprocess as sp 
-    import re 
-    cmd = f"git show {commit}"
-    log = sp.getoutput(cmd)
-    log = log.split('\n')
-    # use to find which files the modifications are for 
-    regex_gitdiff = re.compile("^diff --git ") 
-    # Find new set of diffs.
-    regex_lines = re.compile("^@@")
-    regex_ln = re.compile("[0-9]+?,[0-9]+\s*?")
-    files = []
-    lines = []
-    for l in log:
-        match_gitdiff = regex_gitdiff.search(l) 
-        if(match_gitdiff): 
-            larr = l 
-            larr = larr.replace("diff --git","")
-            larr = larr.split() 
-            file = larr[0]
-            file = file[1:] 
-            file = '.'+file 
-            files.append(file[:])
-
-        match_lines = regex_lines.search(l) 
-        if(match_lines):
-            l = l.split('@@') 
-            nums = l[1] 
-            m_ln = regex_ln.findall(nums)
-            # Second element should be the new file
-            lines.append(m_ln[1])
-    
-    print(files)
-    print(lines)
-    return files, lines 
-    
-
-if(__name__ == "__main__"):
-    import mod_config 
-    mod_config.elm_files = '' 
-    check_new_additions()
-
-
-    
+
+import os
+import re
+import subprocess as sp
+import sys
+from typing import Optional
+
+from scripts.mod_config import E3SM_SRCROOT
+from scripts.parse_cache import regex_include
+from scripts.source_index import SourceIndex, get_source_index
+
+# New file line range of a hunk. The count is omitted when it's 1.
+regex_hunk = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+regex_gitdiff = re.compile(r"^diff --git a/(\S+) b/(\S+)")
+
+# Fortran sources and the headers they include
+SOURCE_PATHSPEC = ("*.F90", "*.f90", "*.F", "*.f", "*.inc", "*.h")
+
+
+def git_diff(
+    old_commit: str,
+    new_commit: str = "HEAD",
+    repo: str = E3SM_SRCROOT,
+    pathspec: tuple[str, ...] = SOURCE_PATHSPEC,
+) -> dict[str, list[tuple[int, int]]]:
+    """
+    Returns the files (relative to repo) changed between old_commit and new_commit
+    with the (start, count) line ranges modified in the new version.
+    Deleted files have no ranges.
+    """
+    cmd = [
+        "git",
+        "-C",
+        repo,
+        "diff",
+        "--unified=0",
+        "--no-color",
+        "--no-renames",
+        old_commit,
+        new_commit,
+        "--",
+        *pathspec,
+    ]
+    result = sp.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"git_diff::{' '.join(cmd)} failed\n{result.stderr}")
+        sys.exit(1)
+
+    files: dict[str, list[tuple[int, int]]] = {}
+    current = None
+    for line in result.stdout.splitlines():
+        match_gitdiff = regex_gitdiff.match(line)
+        if match_gitdiff:
+            current = match_gitdiff.group(2)
+            files[current] = []
+            continue
+        match_hunk = regex_hunk.match(line)
+        if match_hunk and current:
+            start = int(match_hunk.group(1))
+            count = int(match_hunk.group(2)) if match_hunk.group(2) else 1
+            if count:
+                files[current].append((start, count))
+
+    return files
+
+
+def changed_modules(
+    old_commit: str,
+    new_commit: str = "HEAD",
+    repo: str = E3SM_SRCROOT,
+    index: Optional[SourceIndex] = None,
+) -> set[str]:
+    """
+    Names of the modules defined in files that changed between the commits,
+    and of the modules that include a changed (or deleted) header.
+    Deleted module files are skipped.
+    """
+    if index is None:
+        index = get_source_index()
+    modules = set()
+    headers = set()
+    for fn in git_diff(old_commit, new_commit, repo):
+        fpath = os.path.join(repo, fn)
+        mod_info = index.module_of_file(fpath) if os.path.exists(fpath) else None
+        if mod_info:
+            modules.add(mod_info[1])
+        else:
+            headers.add(os.path.basename(fn))
+    if headers:
+        modules |= including_modules(headers, index)
+    return modules
+
+
+def including_modules(headers: set[str], index: SourceIndex) -> set[str]:
+    """
+    Modules of the indexed files that include one of headers (by file name),
+    directly or through other included files
+    """
+    includes: dict[str, set[str]] = {}
+    for fpath in index.files:
+        with open(fpath, errors="replace") as f:
+            names = regex_include.findall(f.read())
+        if names:
+            includes[fpath] = {os.path.basename(name) for name in names}
+
+    modules = set()
+    found = set()
+    while headers:
+        nested = set()
+        for fpath, names in includes.items():
+            if fpath in found or headers.isdisjoint(names):
+                continue
+            found.add(fpath)
+            mod_info = index.module_of_file(fpath)
+            if mod_info:
+                modules.add(mod_info[1])
+            else:
+                nested.add(os.path.basename(fpath))
+        headers = nested
+    return modules
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import heapq
 import re
 import sys
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Iterable, Optional
 
 from scripts.mod_config import _bc
 from scripts.utilityFunctions import Variable
@@ -29,6 +30,48 @@ regex_io = re.compile(r"^\s*(write|print)\b")
 regex_case = re.compile(r"^select\s+case\b")
 regex_usemod = re.compile(r"^use\b\s+\w+")
 intrinsic_types = { "real", "integer", "character", "logical" }
+regex_word = re.compile(r"\w+")
+
+
+class VarMatcher:
+    """
+    Finds whole-word, case-insensitive uses of a set of variable names.
+
+    Drop-in for re.compile(rf"\b({'|'.join(names)})\b", re.IGNORECASE):
+    a name can only match a maximal run of word characters, so each line is
+    split into words that are looked up in a set instead of trying every
+    alternative at every position. search/findall return the same matches
+    (text as it appears in the line). Names that aren't plain words fall
+    back to the regex.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        names = list(names)
+        self.names: set[str] = {name.lower() for name in names}
+        self.regex: Optional[re.Pattern] = None
+        if not all(regex_word.fullmatch(name) for name in names):
+            self.regex = re.compile(r"\b({})\b".format("|".join(names)), re.IGNORECASE)
+
+    def __repr__(self):
+        return f"VarMatcher({len(self.names)} names)"
+
+    def findall(self, line: str) -> list[str]:
+        if self.regex:
+            return self.regex.findall(line)
+        names = self.names
+        return [word for word in regex_word.findall(line) if word.lower() in names]
+
+    def search(self, line: str) -> Optional[str]:
+        """First match in line, or None"""
+        if self.regex:
+            match = self.regex.search(line)
+            return match.group(1) if match else None
+        names = self.names
+        for word in regex_word.findall(line):
+            if word.lower() in names:
+                return word
+        return None
+
 
 def normalize_soa_keys(d: dict[str, list[ReadWrite]]) -> dict[str, list[ReadWrite]]:
     # This pattern matches any characters inside parentheses that are immediately followed by a '%'
@@ -38,8 +81,7 @@ def normalize_soa_keys(d: dict[str, list[ReadWrite]]) -> dict[str, list[ReadWrit
         new_key = pattern.sub('(index)', key)
         # If the normalized key already exists, merge the value lists
         if new_key in new_dict:
-            new_dict[new_key].extend(values)
-            new_dict[new_key].sort(key=lambda rw: rw.ln)
+            new_dict[new_key] = merge_sorted_runs(new_dict[new_key], values)
         else:
             new_dict[new_key] = values.copy()
     return new_dict
@@ -110,8 +152,7 @@ def analyze_sub_variables(
     if not vars_to_match:
         return vars_accessed
 
-    var_match_string = "|".join(vars_to_match)
-    regex_vars = re.compile(r"\b({})\b".format(var_match_string), re.IGNORECASE)
+    var_matcher = VarMatcher(vars_to_match)
 
     fileinfo = sub.get_file_info()
 
@@ -121,13 +162,11 @@ def analyze_sub_variables(
     else:
         lines = [ lpair for lpair in lines if lpair.ln >= fileinfo.startln ]
 
-    matched_lines = [
-        line for line in filter(lambda x: regex_vars.search(x.line), lines)
-    ]
-
-    for line in matched_lines:
+    for line in lines:
+        match_var_use: list[str] = var_matcher.findall(line.line)
+        if not match_var_use:
+            continue
         match_call: bool = line.ln in sub.sub_call_desc
-        match_var_use: list[str] = regex_vars.findall(line.line)
         if not match_call:
             match_var_use = list(set(match_var_use))
             line_accessed = determine_variable_status(
@@ -575,10 +614,17 @@ def construct_call_tree(
     sub_dict: dict[str, Subroutine],
     dtype_dict: dict[str, DerivedType],
     nested: int,
+    memo: Optional[dict[str, list[CallTuple]]] = None,
 ) -> list[CallTuple]:
     """
     Function that constructs a CallTree for the input subroutine
+
+    memo holds the call list (rooted at nested=0) of every subroutine whose
+    tree was already built, so shared subtrees are only walked once when
+    building the trees of many subroutines.
     """
+    if memo is not None and sub.name in memo:
+        return [CallTuple(call.nested + nested, call.subname) for call in memo[sub.name]]
 
     for childsub in sub.child_subroutines.values():
         if childsub.preprocessed or childsub.library:
@@ -600,9 +646,14 @@ def construct_call_tree(
             sub_dict,
             dtype_dict,
             nested + 1,
+            memo,
         )
         flat_call_list.extend(child_list)
-    sub.abstract_call_tree = make_call_tree(flat_call_list)
+    # Trees are rooted at nested=0 whichever caller they were reached from
+    call_list = [CallTuple(call.nested - nested, call.subname) for call in flat_call_list]
+    sub.abstract_call_tree = make_call_tree(call_list)
+    if memo is not None:
+        memo[sub.name] = call_list
 
     return flat_call_list
 
@@ -627,10 +678,18 @@ def make_call_tree(flat_calls: list[CallTuple]) -> CallTree:
 
     return root
 
+def merge_sorted_runs(a: list[ReadWrite], b: list[ReadWrite]) -> list[ReadWrite]:
+    """
+    Merge two status lists sorted by line number. Entries of a come first on ties.
+    """
+    return list(heapq.merge(a, b, key=lambda rw: rw.ln))
+
 def merge_status_list(gv:str, elmtype:dict[str,list[ReadWrite]], stat_list: list[ReadWrite]):
+    """
+    Add stat_list to the status of gv in elmtype. Status lists are kept sorted by line.
+    """
     if gv in elmtype:
-        elmtype[gv].extend(stat_list)
-        elmtype[gv].sort(key=lambda rw: rw.ln)
+        elmtype[gv] = merge_sorted_runs(elmtype[gv], stat_list)
     else:
         elmtype[gv] = stat_list.copy()
     return
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import re
-import subprocess as sp
 import sys
 from typing import TYPE_CHECKING, Optional
 
@@ -10,7 +9,8 @@ from scripts.types import ArgDesc, ArgType
 if TYPE_CHECKING:
     from scripts.analyze_subroutines import Subroutine
 
-from scripts.mod_config import ELM_SRC, _bc
+from scripts.mod_config import _bc
+from scripts.source_index import get_source_index
 from scripts.types import PointerAlias
 from scripts.utilityFunctions import Variable
 
@@ -235,43 +235,9 @@ def get_interface_procedures(iname: str, verbose: bool = False) -> list[str]:
     Function that finds the potential procedures of an interface
     """
     if verbose:
-        print(_bc.FAIL + f"Resolving interface for {iname}\n with args: {args}")
-    cmd = f'grep -rin --exclude-dir={ELM_SRC}external_models/ -E "^[[:space:]]+(interface {iname})" {ELM_SRC}*'
-    output = sp.getoutput(cmd)
-
-    # Get file and line number for interface
-    # list that goes:  [filename, linenumber, interface {iname}]
-    output = output.split(":")
-    if len(output) != 3:
-        sys.exit(
-            f"resolve_interface:: Couldn't find file with interface {iname}\n"
-            f"cmd: {cmd}\noutput: {output}"
-        )
-    fn, ln, _ = output
-
-    ln = int(ln)
-
-    # Read file:
-    ifile = open(fn, "r")
-    lines = ifile.readlines()
-    ifile.close()
-    # Get list of possible procedures within the interface
-
-    regex_end = re.compile(r"^\s*(end)\s+(interface)", re.IGNORECASE)
-    regex_procedure = re.compile(r"^\s*(module)\s+(procedure)\s+", re.IGNORECASE)
-
-    interface_sub_names = []  # list of subroutine names in the interface
-    ct = ln - 1
-    in_interface = True
-    while in_interface:
-        m_end = regex_end.search(lines[ct])
-        if m_end:
-            in_interface = False
-        else:
-            m_proc = regex_procedure.search(lines[ct])
-            if m_proc:
-                subname = lines[ct].replace(m_proc.group(), "").strip().lower()
-                interface_sub_names.extend([s.strip() for s in subname.split(",")])
-        ct += 1
+        print(_bc.FAIL + f"Resolving interface for {iname}" + _bc.ENDC)
+    iface = get_source_index().find_interface(iname)
+    if iface is None:
+        sys.exit(f"resolve_interface:: Couldn't find file with interface {iname}")
 
-    return interface_sub_names
+    return list(iface.procedures)
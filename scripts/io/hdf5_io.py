@@ -1,7 +1,9 @@
 import re
+from typing import Optional
 
 import scripts.io.helper as hio
 from scripts.DerivedType import DerivedType
+from scripts.io.netcdf_io import NcStorage, first_subgrid
 from scripts.utilityFunctions import Variable
 
 
@@ -23,7 +25,14 @@ def generate_elmtypes_io_hdf5(
     type_dict: dict[str, DerivedType],
     inst_to_dtype_map: dict[str, str],
     casedir: str,
+    storage: Optional[NcStorage] = None,
 ):
+    """
+    Generates ReadWriteMod for the HDF5 backend (H5InterfaceMod).
+    The fields of each instance are stored in the group of the instance
+    (e.g. col_pp/snl). storage sets the chunking/compression of the arrays
+    (contiguous if None).
+    """
     tabs = hio.indent(hio.Tab.reset)
     filename = "ReadWriteMod.F90"
     mod_name = filename.replace(".F90", "")
@@ -38,7 +47,7 @@ def generate_elmtypes_io_hdf5(
     lines: list[str] = []
     lines.append(f"module {mod_name}\n")
     lines.append(f"{tabs}!!! Auto-generated Fortran code for HDF5 I/O\n")
-    lines.append(f"{tabs}use hdf5\n")
+    lines.append(f"{tabs}use H5InterfaceMod\n")
     use_statements: set[str] = set()
     for inst_var in active_instances.values():
         stmt = f"{tabs}use {inst_var.declaration}, only: {inst_var.name}\n"
@@ -66,17 +75,16 @@ def generate_elmtypes_io_hdf5(
 
     print("Number of fields for i/o:", len(dtype_vars.keys()))
     sub_lines = create_h5io_routine(
-        mode="r",
+        mode=hio.IOMode.read,
         sub_name="read_elmtypes",
         vars=dtype_vars,
-        fn="spel_elmtypes.h5",
     )
     lines.extend(sub_lines)
     sub_lines = create_h5io_routine(
-        mode="w",
+        mode=hio.IOMode.write,
         sub_name="write_elmtypes",
         vars=dtype_vars,
-        fn="spel_elmtypes.h5",
+        storage=storage,
     )
     lines.extend(sub_lines)
 
@@ -99,7 +107,7 @@ def generate_constants_io_hdf5(
     lines: list[str] = []
     lines.append(f"module {mod_name}\n")
     lines.append(f"{tabs}!!! Auto-generated Fortran code for HDF5 I/O\n")
-    lines.append(f"{tabs}use hdf5\n")
+    lines.append(f"{tabs}use H5InterfaceMod\n")
     use_stmts = hio.var_use_statements(vars)
     lines.extend(use_stmts)
 
@@ -112,17 +120,15 @@ def generate_constants_io_hdf5(
     )
 
     sub_lines = create_h5io_routine(
-        mode="r",
+        mode=hio.IOMode.read,
         sub_name="read_constants",
         vars=vars,
-        fn="spel_constants.h5",
     )
     lines.extend(sub_lines)
     sub_lines = create_h5io_routine(
-        mode="w",
+        mode=hio.IOMode.write,
         sub_name="write_constants",
         vars=vars,
-        fn="spel_constants.h5",
     )
     lines.extend(sub_lines)
 
@@ -135,115 +141,111 @@ def generate_constants_io_hdf5(
 
 
 def create_h5io_routine(
-    mode: str,
+    mode: hio.IOMode,
     sub_name: str,
     vars: dict[str, Variable],
-    fn: str,
-):
+    storage: Optional[NcStorage] = None,
+) -> list[str]:
+    """
+    Generates subroutine sub_name(nsets, fn), which opens fn once and
+    reads/writes every variable of vars through the same session handle.
+    """
     lines: list[str] = []
     tabs = hio.indent()
 
     max_var_dim = 5
-    lines.append(f"{tabs}subroutine {sub_name}(nsets)\n")
+    lines.append(f"{tabs}subroutine {sub_name}(nsets,fn)\n")
     tabs = hio.indent(hio.Tab.shift)
 
     lines.extend(
         [
-            f"{tabs}use H5InterfaceMod\n",
             f"{tabs}integer, intent(in) :: nsets\n",
+            f"{tabs}character(len=*), intent(in) :: fn\n\n",
             f"{tabs}integer, parameter :: maxdim={max_var_dim}\n",
-            f"{tabs}integer, parameter :: mode_create = 0, mode_open=1\n",
-            f"{tabs}integer :: errcode\n",
-            f"{tabs}integer(hid_t) :: file_id\n",
-            f"{tabs}integer :: lbounds(5), ubounds(5), delta, nsets_m_1, err\n",
-            f"{tabs}character(len=256) :: fn='{fn}'\n\n",
+            f"{tabs}integer :: h5\n",
+            f"{tabs}integer :: lbounds(maxdim), ubounds(maxdim), delta, nsets_m_1\n\n",
             f"{tabs}nsets_m_1 = nsets - 1\n",
-            f"{tabs}call h5open_f(err) ! initialize hdf5\n",
         ]
     )
 
-    if mode == "r":
-        lines.append(f"{tabs}call h5_open_create_file(fn, mode_open, file_id)\n")
-    elif mode == "w":
-        lines.append(f"{tabs}call h5_open_create_file(fn, mode_create, file_id)\n")
+    if mode == hio.IOMode.read:
+        lines.append(f"{tabs}h5 = h5_session_open(fn, h5_readonly)\n")
+    elif storage and storage.filtered:
+        shuffle = ".true." if storage.shuffle else ".false."
+        lines.append(
+            f"{tabs}h5 = h5_session_open(fn, h5_create, deflate_level={storage.deflate}, shuffle={shuffle})\n"
+        )
+    else:
+        lines.append(f"{tabs}h5 = h5_session_open(fn, h5_create)\n")
 
     for var in vars.values():
-        # Open dataset
         if var.dim > 0:
-            newlines = h5_array_read(var) if mode == "r" else h5_array_write(var)
+            assert (
+                var.type != "character"
+            ), f"Error - Need to implement array of characters hdf5 i/o for {var.name}"
+            newlines = h5_array_read(var) if mode == hio.IOMode.read else h5_array_write(var, storage)
         else:
             newlines = h5_scalar(mode, var)
 
         lines.extend(newlines)
 
-    lines.append(f"{tabs}call h5fclose_f(file_id, errcode)\n")
-    lines.append(f"{tabs}call h5close_f(errcode)\n")
+    lines.append(f"{tabs}call h5_session_close(h5)\n")
 
     tabs = hio.indent(hio.Tab.unshift)
     lines.append(f"{tabs}end subroutine {sub_name}\n\n")
     return lines
 
 
-def h5_array_write(var: Variable) -> list[str]:
-    lines: list[str] = []
-    tabs = hio.indent()
+def h5_dset_name(var: Variable) -> str:
+    """
+    Dataset of var: fields go in the group of their instance (col_pp%snl -> col_pp/snl)
+    """
+    return var.name.replace("%", "/")
 
-    # Write the bounds for each dimension
-    lubounds = set_lubounds(var)
 
-    lines.extend(lubounds)
-    lines.extend(
-        [
-            # bounds dims
-            f"{tabs}call h5_write_data(file_id, '{var.name}_lb', lbounds(1:{var.dim}))\n",
-            f"{tabs}call h5_write_data(file_id, '{var.name}_ub', ubounds(1:{var.dim}))\n",
-            # Write the actual array data
-            f"{tabs}call h5_write_data(file_id, '{var.name}', {var.name})\n",
-        ]
-    )
-
-    return lines
-
-
-def set_lubounds(var: Variable) -> list[str]:
+def h5_array_write(var: Variable, storage: Optional[NcStorage] = None) -> list[str]:
     tabs = hio.indent()
-    lines: list[str] = []
-    lines.append(f"{tabs}lbounds(1:{var.dim}) = lbound({var.name})\n")
-    lines.append(f"{tabs}ubounds(1:{var.dim}) = ubound({var.name})\n")
-    return lines
+    chunk = ""
+    if storage and first_subgrid(var) in storage.chunks:
+        chunk = f", chunk={storage.chunks[first_subgrid(var)]}"
+
+    # The lower bounds are stored with the array
+    return [f"{tabs}call h5_put(h5, '{h5_dset_name(var)}', {var.name}, lbound({var.name}){chunk})\n"]
 
 
 def h5_array_read(var: Variable) -> list[str]:
     lines: list[str] = []
     tabs = hio.indent()
+    dset_name = h5_dset_name(var)
+    target = var.name
 
     # Allocate array if necessary
     if var.allocatable:
         # Read the bounds for each dimension
-        lines.extend(
-            [
-                f"{tabs}call h5_read_data(file_id,'{var.name}_lb', lbounds(1:{var.dim}))\n"
-                f"{tabs}call h5_read_data(file_id,'{var.name}_ub', ubounds(1:{var.dim}))\n"
-            ]
-        )
+        lines.append(f"{tabs}call h5_get_bounds(h5, '{dset_name}', {var.dim}, lbounds, ubounds)\n")
         alloc_ = [f"lbounds({i}):ubounds({i})" for i in range(1, var.dim + 1)]
         if var.subgrid in ["g", "l", "t", "c", "p"]:
             lines.append(f"{tabs}delta = ubounds(1)-lbounds(1)+1\n")
             alloc_[0] = f"{alloc_[0]}+nsets_m_1*delta"
+            # the file holds the first set
+            section = ",".join(["lbounds(1):ubounds(1)"] + [":"] * (var.dim - 1))
+            target = f"{var.name}({section})"
         alloc_str = ",".join(alloc_)
         lines.append(f"{tabs}allocate({var.name}({alloc_str}))\n")
-    lines.append(f"{tabs}call h5_read_data(file_id, '{var.name}', {var.name})\n")
+    lines.append(f"{tabs}call h5_get(h5, '{dset_name}', {target})\n")
 
     return lines
 
 
-def h5_scalar(mode: str, var: Variable) -> list[str]:
+def h5_scalar(mode: hio.IOMode, var: Variable) -> list[str]:
     lines: list[str] = []
     tabs = hio.indent()
 
-    if mode == "r":
-        lines.append(f"{tabs}call h5_read_data(file_id, '{var.name}', {var.name})\n")
+    if mode == hio.IOMode.read:
+        if var.ptrscalar:
+            lines.append(f"{tabs}allocate({var.name})\n")
+        lines.append(f"{tabs}call h5_get(h5, '{h5_dset_name(var)}', {var.name})\n")
     else:
-        lines.append(f"{tabs}call h5_write_data(file_id, '{var.name}', {var.name})\n")
+        lines.append(f"{tabs}call h5_put(h5, '{h5_dset_name(var)}', {var.name})\n")
 
     return lines
@@ -1,5 +1,6 @@
 import sys
 import textwrap
+from typing import NamedTuple, Optional
 
 import scripts.io.helper as hio
 from scripts.DerivedType import DerivedType
@@ -8,23 +9,130 @@ from scripts.utilityFunctions import Variable
 
 Tab = hio.Tab
 
-def create_nc_define_vars(vars: dict[str, Variable],bounds: bool=False) -> list[str]:
+# Highest rank of the arrays written by nc_write_var_array
+nc_max_dims = 3
+
+# Dimension names returned by hio.get_subgrid for the subgrid levels
+subgrid_dims = ("gridcell", "topo", "landunit", "column", "patch")
+
+# bounds_type members of each subgrid level and the array giving the gridcell
+# of its elements, used to split the levels among ranks (parallel read_elmtypes)
+subgrid_decomp = {
+    "gridcell": ("begg", "endg", None),
+    "topo": ("begt", "endt", "top_pp%gridcell"),
+    "landunit": ("begl", "endl", "lun_pp%gridcell"),
+    "column": ("begc", "endc", "col_pp%gridcell"),
+    "patch": ("begp", "endp", "veg_pp%gridcell"),
+}
+
+
+class NcStorage(NamedTuple):
+    """
+    netCDF-4 storage options for the arrays of the generated state files.
+        * chunks : chunk length of each subgrid dimension. Other dimensions
+                   (levels, pfts, ...) are stored whole in each chunk.
+                   Empty means contiguous storage.
+        * deflate : zlib level (0 for none)
+        * shuffle : byte shuffle filter
+    """
+
+    chunks: dict[str, int] = {}
+    deflate: int = 0
+    shuffle: bool = False
+
+    @property
+    def filtered(self) -> bool:
+        return self.deflate > 0 or self.shuffle
+
+
+class StateFields(NamedTuple):
+    """
+    Split of the active elmtype fields ('inst%field') from the read/write
+    status of the unit-test call trees (see aggregate.state_field_sets)
+        * inputs : fields read by the unit test, loaded by read_elmtypes
+        * outputs : fields written by the unit test, dumped by write_elmtypes
+                    for verification
+    """
+
+    inputs: set[str]
+    outputs: set[str]
+
+
+def split_state_vars(
+    dtype_vars: dict[str, Variable],
+    fields: Optional[StateFields] = None,
+) -> tuple[dict[str, Variable], dict[str, Variable], dict[str, Variable]]:
+    """
+    Returns the fields of dtype_vars that are
+        * read from the inputs file by read_elmtypes
+        * only allocated by read_elmtypes: arrays written before being read.
+          They are set to the fill values, that spel diff ignores, so the
+          elements the unit test doesn't write aren't compared.
+        * written for verification by write_elmtypes
+    Logical arrays have no fill value and the gridcell indices are needed
+    by decomp_elmtypes, so those are always read.
+    Without fields, every field is read and verified.
+    """
+    if not fields:
+        return dtype_vars, {}, dtype_vars
+
+    index_vars = {index_var for _, _, index_var in subgrid_decomp.values() if index_var}
+    alloc_only = {
+        name: var
+        for name, var in dtype_vars.items()
+        if var.dim > 0
+        and var.type in ("real", "integer")
+        and name in fields.outputs
+        and name not in fields.inputs
+        and name not in index_vars
+    }
+    input_vars = {name: var for name, var in dtype_vars.items() if name not in alloc_only}
+    verify_vars = {name: var for name, var in dtype_vars.items() if name in fields.outputs}
+    if not verify_vars:
+        print("(split_state_vars) Warning - no field is written, write_elmtypes will write every field")
+        verify_vars = dtype_vars
+    return input_vars, alloc_only, verify_vars
+
+
+def parse_chunk_sizes(specs: list[str]) -> dict[str, int]:
+    """
+    Parses ["column=1000", "patch=4000", ...] into {subgrid: chunk length}
+    """
+    chunks: dict[str, int] = {}
+    for spec in specs:
+        name, _, size = spec.partition("=")
+        if name not in subgrid_dims or not size.isdigit() or int(size) < 1:
+            print(
+                f"(parse_chunk_sizes) Bad chunk size '{spec}'.\n"
+                f"Expected <subgrid>=<length> with subgrid one of {', '.join(subgrid_dims)}"
+            )
+            sys.exit(1)
+        chunks[name] = int(size)
+    return chunks
+
+
+def create_nc_define_vars(
+    vars: dict[str, Variable],
+    bounds: bool = False,
+    storage: Optional[NcStorage] = None,
+    sub_name: str = "define_vars",
+) -> list[str]:
     """
     Create Subroutine for defining netcdf variables
     """
     tabs = hio.indent()
     arg_str = ",bounds" if bounds else ''
-    lines: list[str] = [f"{tabs}subroutine define_vars(ncid{arg_str})\n"]
+    lines: list[str] = [f"{tabs}subroutine {sub_name}(ncid{arg_str})\n"]
     tabs = hio.indent(hio.Tab.shift)
     lines.append(f"{tabs}integer, intent(in) :: ncid\n")
     if bounds:
         lines.append(f"{tabs}type(bounds_type), intent(in) :: bounds\n")
     lines.append(f"{tabs}integer :: varid\n")
     lines.append(f"{tabs}character(len=32), dimension(4) :: dim_names\n")
-    nc_defns = create_nc_def(vars)
+    nc_defns = create_nc_def(vars, storage)
     lines.extend(nc_defns)
     tabs = hio.indent(hio.Tab.unshift)
-    lines.append(f"{tabs}end subroutine define_vars\n")
+    lines.append(f"{tabs}end subroutine {sub_name}\n")
 
     return lines
 
@@ -33,7 +141,19 @@ def generate_elmtypes_io_netcdf(
     type_dict: dict[str, DerivedType],
     inst_to_dtype_map: dict[str, str],
     casedir: str,
+    storage: Optional[NcStorage] = None,
+    parallel: bool = False,
+    fields: Optional[StateFields] = None,
 ):
+    """
+    Generates ReadWriteMod. storage sets the chunking/compression of the
+    arrays defined by define_vars (contiguous if None).
+    If parallel, read_elmtypes opens the file on all ranks of a communicator
+    and each rank reads its slab of the subgrid arrays (see decomp_elmtypes).
+    fields splits the state between the inputs file (write_elmtypes_inputs,
+    read_elmtypes) and the verification file (write_elmtypes), see
+    split_state_vars. Both files hold every field otherwise.
+    """
     tabs = hio.indent(hio.Tab.reset)
     filename = "ReadWriteMod.F90"
     mod_name = filename.replace(".F90", "")
@@ -48,6 +168,8 @@ def generate_elmtypes_io_netcdf(
             f"{tabs}use nc_io\n",
             f"{tabs}use nc_allocMod\n",
         ])
+    if parallel:
+        lines.append(f"{tabs}use mpi\n")
 
     active_instances = {
         inst_var.name: inst_var
@@ -61,10 +183,13 @@ def generate_elmtypes_io_netcdf(
     lines.extend(
         [
             f"{tabs}implicit none\n",
-            f"{tabs}public :: read_elmtypes, write_elmtypes, define_vars\n",
-            "contains\n",
+            f"{tabs}public :: read_elmtypes, write_elmtypes, write_elmtypes_inputs\n",
+            f"{tabs}public :: define_vars, bench_elmtypes\n",
         ]
     )
+    if parallel:
+        lines.append(f"{tabs}public :: decomp_elmtypes\n")
+    lines.append("contains\n")
 
     dtype_vars: dict[str, Variable] = {}
 
@@ -77,23 +202,52 @@ def generate_elmtypes_io_netcdf(
                 new_var.name = f"{inst_var.name}%{field_var.name.split('%')[-1]}"
                 dtype_vars[new_var.name] = new_var
 
-    sub_lines = create_nc_define_vars(dtype_vars,bounds=True)
+    input_vars, alloc_only, verify_vars = split_state_vars(dtype_vars, fields)
+    print(
+        f"State fields: {len(input_vars)} inputs, {len(alloc_only)} allocated only,"
+        f" {len(verify_vars)} verified"
+    )
+
+    # The inputs file defines every field so that read_elmtypes can allocate them
+    sub_lines = create_nc_define_vars(dtype_vars,bounds=True,storage=storage)
     lines.extend(sub_lines)
+    verify_define = "define_vars"
+    if fields:
+        verify_define = "define_verify_vars"
+        sub_lines = create_nc_define_vars(
+            verify_vars, bounds=True, storage=storage, sub_name=verify_define
+        )
+        lines.extend(sub_lines)
 
+    decomp = None
+    if parallel:
+        decomp = decomposed_subgrids(dtype_vars)
+        lines.extend(create_nc_decomp(dtype_vars, decomp))
     sub_lines = create_netcdf_io_routine(
         mode=hio.IOMode.read,
         sub_name="read_elmtypes",
-        vars=dtype_vars,
+        vars=input_vars,
+        bounds=True,
+        decomp=decomp,
+        alloc_only=alloc_only,
+    )
+    lines.extend(sub_lines)
+    sub_lines = create_netcdf_io_routine(
+        mode=hio.IOMode.write,
+        sub_name="write_elmtypes_inputs",
+        vars=input_vars,
         bounds=True,
     )
     lines.extend(sub_lines)
     sub_lines = create_netcdf_io_routine(
         mode=hio.IOMode.write,
         sub_name="write_elmtypes",
-        vars=dtype_vars,
+        vars=verify_vars,
         bounds=True,
+        define_sub=verify_define,
     )
     lines.extend(sub_lines)
+    lines.extend(create_nc_bench(dtype_vars))
 
     lines.append(f"end module {mod_name}\n")
 
@@ -160,11 +314,28 @@ def create_netcdf_io_routine(
     mode: hio.IOMode,
     sub_name: str,
     vars: dict[str, Variable],
-    time: bool,
+    time: bool = False,
     bounds: bool = False,
+    decomp: Optional[dict[str, tuple[str, str, Optional[str]]]] = None,
+    define_sub: str = "define_vars",
+    alloc_only: Optional[dict[str, Variable]] = None,
 ) -> list[str]:
+    """
+    time: write the arrays at record `timestep` of the unlimited dimension
+    decomp: read the file in parallel over the ranks of `comm`, each rank
+            reading the slab given by bounds of the subgrid levels in decomp
+            (see decomposed_subgrids)
+    define_sub: routine defining the variables of the file written
+    alloc_only: arrays allocated but not read (see split_state_vars)
+    """
     tabs = hio.indent()
     arg_str = ",bounds" if bounds else ''
+    time = time and mode == hio.IOMode.write
+    if time:
+        arg_str += ",timestep"
+    parallel = decomp is not None and mode == hio.IOMode.read
+    if parallel:
+        arg_str += ",comm"
 
     lines: list[str] = [f"{tabs}subroutine {sub_name}(nsets,fn{arg_str})\n"]
     tabs = hio.indent(hio.Tab.shift)
@@ -179,29 +350,35 @@ def create_netcdf_io_routine(
     lines.extend(
         [
             f"{tabs}integer, intent(in) :: nsets\n{stmt}\n",
+            f"{tabs}integer, intent(in) :: timestep\n" if time else "",
+            f"{tabs}integer, intent(in) :: comm\n" if parallel else "",
             f"{tabs}character(len=*), intent(in) :: fn \n\n",
             f"{tabs}integer :: ncid\n",
-            f"{tabs}ncid = nc_create_or_open_file(trim(fn), {mode_str})\n",
         ]
     )
+    if parallel:
+        lines.append(f"{tabs}ncid = nc_create_or_open_file_par(trim(fn), {mode_str}, comm)\n")
+    else:
+        lines.append(f"{tabs}ncid = nc_create_or_open_file(trim(fn), {mode_str})\n")
     if mode == hio.IOMode.write:
         lines.extend([
-                f"{tabs}call define_vars(ncid{arg_str})\n",
+                f"{tabs}call {define_sub}(ncid{arg_str})\n",
                 f"{tabs}call check(nf90_enddef(ncid))\n",  # exit define mode:
             ]
         )
     if mode == hio.IOMode.read:
-        sub_lines = create_nc_read(vars)
+        sub_lines = create_nc_read(vars, decomp if parallel else None, alloc_only)
     else:
-        sub_lines = create_nc_write(vars)
+        sub_lines = create_nc_write(vars, unlim=time)
     lines.extend(sub_lines)
+    lines.append(f"{tabs}call check(nf90_close(ncid))\n")
     tabs = hio.indent(hio.Tab.unshift)
     lines.append(f"{tabs}end subroutine {sub_name}\n")
 
     return lines
 
 
-def create_nc_def(vars: dict[str, Variable]) -> list[str]:
+def create_nc_def(vars: dict[str, Variable], storage: Optional[NcStorage] = None) -> list[str]:
     lines: list[str] = []
     tabs = hio.indent()
 
@@ -219,7 +396,8 @@ def create_nc_def(vars: dict[str, Variable]) -> list[str]:
         if var.dim>0 or nc_type == "nf90_char":
             lines.append(f"{tabs}dim_names(1:{dim}) = {dim_names_str}\n")
         #                            file,   ndims,  shape    ,   [dim names]  ,  var name,    ncf type , varid
-        stmt = f"call nc_define_var(ncid, {dim}, {dim_str}, dim_names, '{varname}', {nc_type}, varid)\n"
+        storage_str = get_storage_args(var, storage) if nc_type != "nf90_char" else ""
+        stmt = f"call nc_define_var(ncid, {dim}, {dim_str}, dim_names, '{varname}', {nc_type}, varid{storage_str})\n"
         lines.append(f"{tabs}{stmt}")
         # if array store lbounds and ubounds:
         if var.dim > 0:
@@ -244,6 +422,27 @@ def get_dim_names(var: Variable) -> str:
     return f"[character(len=32) :: {dim_str}]"
 
 
+def get_storage_args(var: Variable, storage: Optional[NcStorage]) -> str:
+    """
+    Optional nc_define_var arguments for the chunking/filters of an array:
+    subgrid dimensions are cut in chunks of storage.chunks[subgrid], others
+    are kept whole.
+    """
+    if not storage or var.dim == 0:
+        return ""
+    args = ""
+    if storage.chunks:
+        dim_names = [hio.get_subgrid(dim) for dim in var.bounds.split(",")]
+        sizes = [
+            f"{storage.chunks[name]}" if name in storage.chunks else f"size({var.name},{i})"
+            for i, name in enumerate(dim_names, start=1)
+        ]
+        args += f", chunks=[{','.join(sizes)}]"
+    if storage.filtered:
+        args += f", deflate_level={storage.deflate}, shuffle={'.true.' if storage.shuffle else '.false.'}"
+    return args
+
+
 def match_nc_type(var_type: str) -> str:
     match var_type:
         case "real":
@@ -259,12 +458,15 @@ def match_nc_type(var_type: str) -> str:
             sys.exit(1)
 
 
-def create_nc_write(vars: dict[str, Variable], unlim: bool) -> list[str]:
+def create_nc_write(vars: dict[str, Variable], unlim: bool = False) -> list[str]:
     """
     Function to create the
-        call nc_write_var(ncid, dim, shape, dim_names, var, varname)
-    or for characters:
-        call nc_write_var(ncid, var, varname)
+        call nc_write_var_array(ncid, var, varname)
+    or for scalars:
+        call nc_write_var_scalar(ncid, var, varname)
+
+    Arrays are passed as is to the rank-specific nc_write_<type>_<ndim>
+    so nf90_put_var writes from the field itself (no reshaped copy).
     """
     lines: list[str] = []
     tabs = hio.indent()
@@ -283,22 +485,30 @@ def create_nc_write(vars: dict[str, Variable], unlim: bool) -> list[str]:
         lines.append(f"{tabs}{stmt}")
 
     for var in arrays:
-        dim_names_str = get_dim_names(var)
-        reshape_str = f"reshape({var.name}, [product(shape({var.name}))])"
+        assert var.dim <= nc_max_dims, f"Error - {var.name} has more than {nc_max_dims} dimensions"
         varname = var.name.replace('%','__')
-        stmt = f"call nc_write_var_array(ncid,{var.dim}, shape({var.name}), {dim_names_str}, {reshape_str}, '{varname}'{timestep})\n"
+        stmt = f"call nc_write_var_array(ncid, {var.name}, '{varname}'{timestep})\n"
         # lines.append(f"{tabs}print *, 'Writing {var.name}'\n")
         lines.append(f"{tabs}{stmt}")
 
     return lines
 
 
-def create_nc_read(vars: dict[str, Variable]) -> list[str]:
+def create_nc_read(
+    vars: dict[str, Variable],
+    decomp: Optional[dict[str, tuple[str, str, Optional[str]]]] = None,
+    alloc_only: Optional[dict[str, Variable]] = None,
+) -> list[str]:
     """
     Function to create the
-        call nc_write_var(ncid, dim, shape, dim_names, var, varname)
-    or for characters:
-        call nc_write_var(ncid, var, varname)
+        call nc_alloc(ncid, varname, dim, var)
+        call nc_read_var(ncid, varname, dim, var)
+    or for scalars:
+        call nc_read_var(ncid, varname, var)
+
+    Arrays over a subgrid level in decomp are allocated and read over
+    bounds%beg<x>:bounds%end<x> only. Arrays in alloc_only are allocated
+    and set to the fill value instead of being read.
     """
     lines: list[str] = []
     tabs = hio.indent()
@@ -315,6 +525,8 @@ def create_nc_read(vars: dict[str, Variable]) -> list[str]:
             stmt = f"call nc_read_var(ncid, '{varname}', {var.name})\n"
         lines.append(f"{tabs}{stmt}")
 
+    alloc_only = alloc_only or {}
+    arrays.extend(alloc_only.values())
     for var in arrays:
         assert (
             var.type != "character"
@@ -322,28 +534,145 @@ def create_nc_read(vars: dict[str, Variable]) -> list[str]:
 
         varname = var.name.replace('%','__')
         # lines.append(f"{tabs}print *, 'Reading {var.name}'\n")
-        lines.append( f'{tabs}call nc_alloc(ncid, "{varname}", {var.dim}, {var.name})\n')
-        stmt = f"call nc_read_var(ncid,'{varname}', {var.dim}, {var.name})\n"
+        subgrid = first_subgrid(var)
+        if decomp and subgrid in decomp:
+            beg, end, _ = decomp[subgrid]
+            slab = f", lb1=bounds%{beg}"
+            alloc_slab = f"{slab}, ub1=bounds%{end}"
+        else:
+            slab = alloc_slab = ""
+        lines.append( f'{tabs}call nc_alloc(ncid, "{varname}", {var.dim}, {var.name}{alloc_slab})\n')
+        if var.name in alloc_only:
+            fill = "fill_double" if var.type == "real" else "fill_int"
+            stmt = f"{var.name} = {fill}\n"
+        else:
+            stmt = f"call nc_read_var(ncid,'{varname}', {var.dim}, {var.name}{slab})\n"
         lines.append(f"{tabs}{stmt}")
 
     return lines
 
-def generate_verify(rw_set: set[str], type_dict: dict[str,DerivedType]):
+def first_subgrid(var: Variable) -> str:
+    """
+    Dimension name of the first dimension of an array (subgrid level or not)
     """
-    rw_set is set of active elmtypes with status of 'w' or 'rw'
+    return hio.get_subgrid(var.bounds.split(",")[0]) if var.dim > 0 else ""
 
+
+def decomposed_subgrids(vars: dict[str, Variable]) -> dict[str, tuple[str, str, Optional[str]]]:
     """
-    lines: list[str] = []
-    active_instances = {
-        inst_var.name: inst_var
-        for dtype in type_dict.values()
-        for inst_var in dtype.instances.values()
-        if inst_var.active
-    }
-    use_statements = hio.var_use_statements(active_instances)
-    lines.extend(list(use_statements))
+    Subgrid levels of the arrays in vars that can be split among ranks:
+    gridcells are split in contiguous blocks and the other levels follow
+    the gridcells through their gridcell index (e.g. col_pp%gridcell),
+    which then needs to be one of vars. Arrays over other levels are
+    read whole by every rank.
+    """
+    used = {first_subgrid(var) for var in vars.values() if var.dim > 0 and var.type != "character"}
+    if "gridcell" not in used:
+        print("(decomposed_subgrids) Warning - no gridcell arrays, elmtypes will be read whole by every rank")
+        return {}
+    decomp = {}
+    for subgrid, (beg, end, index_var) in subgrid_decomp.items():
+        if subgrid not in used:
+            continue
+        if index_var and index_var not in vars:
+            print(f"(decomposed_subgrids) Warning - {index_var} isn't active, {subgrid} arrays will be read whole")
+            continue
+        decomp[subgrid] = (beg, end, index_var)
+    return decomp
+
+
+def create_nc_decomp(
+    vars: dict[str, Variable],
+    decomp: dict[str, tuple[str, str, Optional[str]]],
+) -> list[str]:
+    """
+    Function to create decomp_elmtypes(fn, comm, bounds), which sets the
+    bounds of the slab read by each rank of comm in read_elmtypes.
+    Levels that aren't decomposed get their full range.
+    """
+    tabs = hio.indent()
+    lines: list[str] = [f"{tabs}subroutine decomp_elmtypes(fn, comm, bounds)\n"]
+    tabs = hio.indent(hio.Tab.shift)
+    lines.extend(
+        [
+            f"{tabs}character(len=*), intent(in) :: fn\n",
+            f"{tabs}integer, intent(in) :: comm\n",
+            f"{tabs}type(bounds_type), intent(inout) :: bounds\n",
+            f"{tabs}integer :: ncid, rank, nranks, ierr\n\n",
+            f"{tabs}call MPI_Comm_rank(comm, rank, ierr)\n",
+            f"{tabs}call MPI_Comm_size(comm, nranks, ierr)\n",
+            f"{tabs}! Every rank reads the (small) gridcell indices to find its slab\n",
+            f"{tabs}ncid = nc_create_or_open_file(trim(fn), open_file)\n",
+        ]
+    )
+    used = {first_subgrid(var) for var in vars.values() if var.dim > 0 and var.type != "character"}
+    for subgrid, (beg, end, index_var) in subgrid_decomp.items():
+        if subgrid in decomp and not index_var:
+            stmt = f"call nc_split_dim(ncid, '{subgrid}', rank, nranks, bounds%{beg}, bounds%{end})"
+        elif subgrid in decomp:
+            index_name = index_var.replace('%','__')
+            stmt = f"call nc_subgrid_range(ncid, '{index_name}', bounds%begg, bounds%endg, bounds%{beg}, bounds%{end})"
+        elif subgrid in used:
+            stmt = f"call nc_split_dim(ncid, '{subgrid}', 0, 1, bounds%{beg}, bounds%{end})"
+        else:
+            continue
+        lines.append(f"{tabs}{stmt}\n")
+    lines.append(f"{tabs}call check(nf90_close(ncid))\n")
+    tabs = hio.indent(hio.Tab.unshift)
+    lines.append(f"{tabs}end subroutine decomp_elmtypes\n")
+    return lines
+
+
+def create_nc_bench(vars: dict[str, Variable]) -> list[str]:
+    """
+    Function to create bench_elmtypes(fn, bounds): writes and then reads
+    back every array in vars one at a time, reporting the size and time of
+    each (see nc_bench_report). Arrays are read into the already allocated
+    fields.
+    """
+    tabs = hio.indent()
+    lines: list[str] = [f"{tabs}subroutine bench_elmtypes(fn, bounds)\n"]
+    tabs = hio.indent(hio.Tab.shift)
+    lines.extend(
+        [
+            f"{tabs}character(len=*), intent(in) :: fn\n",
+            f"{tabs}type(bounds_type), intent(in) :: bounds\n",
+            f"{tabs}integer :: ncid\n",
+            f"{tabs}integer(8) :: t0, t1, t_start, rate, nbytes, total_bytes\n\n",
+            f"{tabs}call system_clock(count_rate=rate)\n",
+        ]
+    )
+    arrays = [var for var in vars.values() if var.dim > 0 and var.type != "character"]
+
+    for mode in (hio.IOMode.write, hio.IOMode.read):
+        op = "write" if mode == hio.IOMode.write else "read"
+        mode_str = "create_file" if mode == hio.IOMode.write else "open_file"
+        lines.append(f"{tabs}ncid = nc_create_or_open_file(trim(fn), {mode_str})\n")
+        if mode == hio.IOMode.write:
+            lines.append(f"{tabs}call define_vars(ncid,bounds)\n")
+            lines.append(f"{tabs}call check(nf90_enddef(ncid))\n")
+        lines.append(f"{tabs}total_bytes = 0; call system_clock(t_start)\n")
+        for var in arrays:
+            varname = var.name.replace('%','__')
+            if mode == hio.IOMode.write:
+                stmt = f"call nc_write_var_array(ncid, {var.name}, '{varname}')"
+            else:
+                stmt = f"call nc_read_var(ncid, '{varname}', {var.dim}, {var.name})"
+            lines.extend(
+                [
+                    f"{tabs}call system_clock(t0); {stmt}; call system_clock(t1)\n",
+                    f"{tabs}nbytes = storage_size({var.name}, kind=8)/8*size({var.name}, kind=8)\n",
+                    f"{tabs}total_bytes = total_bytes + nbytes\n",
+                    f"{tabs}call nc_bench_report('{op}', '{var.name}', nbytes, t0, t1, rate)\n",
+                ]
+            )
+        lines.append(f"{tabs}call check(nf90_close(ncid)); call system_clock(t1)\n")
+        lines.append(f"{tabs}call nc_bench_report('{op}', 'total', total_bytes, t_start, t1, rate)\n")
+
+    tabs = hio.indent(hio.Tab.unshift)
+    lines.append(f"{tabs}end subroutine bench_elmtypes\n")
+    return lines
 
-    return
 
 def generate_nc_io():
     lines: list[str] = []
@@ -357,6 +686,9 @@ def generate_nc_io():
     {tabs}use netcdf
     {tabs}use iso_fortran_env
     {tabs}use iso_c_binding
+    #ifdef SPEL_PARALLEL_IO
+    {tabs}use mpi
+    #endif
     {tabs}implicit none
 
     {tabs}public
@@ -372,8 +704,12 @@ def generate_nc_io():
     # Interfaces for nc write procedures
     tabs = hio.indent(hio.Tab.shift)
     for t in type_list:
-        name = f"nc_write_{t}"
-        lines.append(f"{tabs}module procedure {name}\n")
+        if t == 'string':
+            lines.append(f"{tabs}module procedure nc_write_string\n")
+        else:
+            for ndim in range(1,nc_max_dims+1):
+                name = f"nc_write_{t}_{ndim}"
+                lines.append(f"{tabs}module procedure {name}\n")
     tabs = hio.indent(hio.Tab.unshift)
     lines.append(f"{tabs}end interface\n")
 
@@ -406,6 +742,7 @@ def generate_nc_io():
     # nc_create_or_open_file
     nc_file = gen_nc_file()
     lines.append(nc_file)
+    lines.append(gen_nc_par_io())
 
     # nc_define_var subroutine
     nc_define = gen_nc_define_var()
@@ -420,10 +757,15 @@ def generate_nc_io():
                 lines.append(gen_nc_read_type(i,t))
 
     # nc_write_
-    lines.extend(gen_nc_write_numeric_array())
+    for t in type_list:
+        if t != 'string':
+            for ndim in range(1,nc_max_dims+1):
+                lines.append(gen_nc_write_array(t,ndim))
     lines.extend(gen_nc_write_numeric_scalar())
     lines.append(gen_nc_write_string())
     lines.append(gen_nc_write_logical())
+    lines.append(gen_nc_bench_report())
+    lines.append("end module nc_io\n")
 
     with open(f'{spel_mods_dir}/new_nc_io.F90', 'w') as ofile:
         ofile.writelines(lines)
@@ -501,10 +843,92 @@ def gen_nc_file()->str:
 
     """)
 
+def gen_nc_par_io()->str:
+    """
+    Parallel file access and the helpers used to split the elmtypes among
+    ranks (see create_nc_decomp)
+    """
+    tabs = hio.indent(Tab.reset)
+    return textwrap.dedent(f"""
+    {tabs}#ifdef SPEL_PARALLEL_IO
+    {tabs}integer function nc_create_or_open_file_par(fn, mode, comm) result(ncid)
+    {tabs}   ! Opens/creates fn on all ranks of comm for parallel (MPI-IO) access
+    {tabs}   character(len=*), intent(in) :: fn
+    {tabs}   integer, intent(in) :: mode, comm
+
+    {tabs}   if (mode == open_file) then
+    {tabs}      call check(nf90_open_par(trim(fn), nf90_nowrite + nf90_netcdf4, comm, MPI_INFO_NULL, ncid))
+    {tabs}   else
+    {tabs}      call check(nf90_create_par(trim(fn), nf90_clobber + nf90_netcdf4, comm, MPI_INFO_NULL, ncid))
+    {tabs}   end if
+    {tabs}end function nc_create_or_open_file_par
+    {tabs}#endif
+
+    {tabs}subroutine nc_split_dim(ncid, dim_name, rank, nranks, beg, end)
+    {tabs}   ! Contiguous block of dimension dim_name assigned to rank (0-based) out of nranks
+    {tabs}   integer, intent(in) :: ncid
+    {tabs}   character(len=*), intent(in) :: dim_name
+    {tabs}   integer, intent(in) :: rank, nranks
+    {tabs}   integer, intent(out) :: beg, end
+    {tabs}   ! Locals
+    {tabs}   integer :: dimid, len, nper, nextra
+
+    {tabs}   call check(nf90_inq_dimid(ncid, trim(dim_name), dimid))
+    {tabs}   call check(nf90_inquire_dimension(ncid, dimid, len=len))
+    {tabs}   nper = len/nranks
+    {tabs}   nextra = mod(len, nranks)
+    {tabs}   beg = rank*nper + min(rank, nextra) + 1
+    {tabs}   end = beg + nper - 1
+    {tabs}   if (rank < nextra) end = end + 1
+    {tabs}end subroutine nc_split_dim
+
+    {tabs}subroutine nc_subgrid_range(ncid, varname, begg, endg, beg, end)
+    {tabs}   ! Range of a subgrid level (landunit, column, ...) that belongs to gridcells begg:endg.
+    {tabs}   ! varname is the gridcell index of that level (e.g. col_pp__gridcell), which is
+    {tabs}   ! sorted by gridcell as in ELM's decomposition.
+    {tabs}   integer, intent(in) :: ncid
+    {tabs}   character(len=*), intent(in) :: varname
+    {tabs}   integer, intent(in) :: begg, endg
+    {tabs}   integer, intent(out) :: beg, end
+    {tabs}   ! Locals
+    {tabs}   integer :: var_id, dimids(1), len, lbs(1)
+    {tabs}   integer, allocatable :: gridcell(:)
+
+    {tabs}   call check(nf90_inq_varid(ncid, trim(varname), var_id))
+    {tabs}   call check(nf90_inquire_variable(ncid, var_id, dimids=dimids))
+    {tabs}   call check(nf90_inquire_dimension(ncid, dimids(1), len=len))
+    {tabs}   call check(nf90_get_att(ncid, var_id, "lbounds", lbs))
+    {tabs}   allocate (gridcell(len))
+    {tabs}   call check(nf90_get_var(ncid, var_id, gridcell))
+
+    {tabs}   beg = lbs(1) + count(gridcell < begg)
+    {tabs}   end = beg + count(gridcell >= begg .and. gridcell <= endg) - 1
+    {tabs}end subroutine nc_subgrid_range
+
+    {tabs}subroutine nc_slab_start(ncid, var_id, ndim, lb1, start)
+    {tabs}   ! Start of the slab of var_id whose first dimension begins at index lb1.
+    {tabs}   ! Slabs are read collectively when the file is opened for parallel access.
+    {tabs}   integer, intent(in) :: ncid, var_id, ndim, lb1
+    {tabs}   integer, intent(out) :: start(ndim)
+    {tabs}   ! Locals
+    {tabs}   integer :: lbs(ndim), status
+
+    {tabs}   call check(nf90_get_att(ncid, var_id, "lbounds", lbs))
+    {tabs}   start(:) = 1
+    {tabs}   start(1) = lb1 - lbs(1) + 1
+    {tabs}#ifdef SPEL_PARALLEL_IO
+    {tabs}   ! Returns nf90_enopar for files opened serially, which are then read independently
+    {tabs}   status = nf90_var_par_access(ncid, var_id, nf90_collective)
+    {tabs}#endif
+    {tabs}end subroutine nc_slab_start
+
+    """)
+
 def gen_nc_define_var()->str:
     tabs=hio.indent(Tab.reset)
     return textwrap.dedent(f"""
-    {tabs}subroutine nc_define_var(ncid, ndim, dims, dim_names, varname, xtype, var_id, time)
+    {tabs}subroutine nc_define_var(ncid, ndim, dims, dim_names, varname, xtype, var_id, time, &
+    {tabs}                         chunks, deflate_level, shuffle)
     {tabs}   integer, intent(in) :: ncid, ndim
     {tabs}   integer, intent(in) :: dims(ndim)
     {tabs}   character(len=32), dimension(ndim), intent(in) :: dim_names
@@ -512,8 +936,12 @@ def gen_nc_define_var()->str:
     {tabs}   integer, intent(in) :: xtype  ! e.g. NF90_DOUBLE, NF90_INT, NF90_CHAR, NF90_STRING
     {tabs}   integer, intent(out) :: var_id
     {tabs}   logical, intent(in) :: time
+    {tabs}   ! Optional netCDF-4 storage: chunk lengths (clipped to dims), zlib level and shuffle filter
+    {tabs}   integer, intent(in), optional :: chunks(ndim)
+    {tabs}   integer, intent(in), optional :: deflate_level
+    {tabs}   logical, intent(in), optional :: shuffle
     {tabs}   ! Locals
-    {tabs}   integer :: i, status, total_dims
+    {tabs}   integer :: i, status, total_dims, level, shuffle_flag
     {tabs}   integer, allocatable :: dim_ids(:)
 
     {tabs}   if (time) then 
@@ -537,6 +965,19 @@ def gen_nc_define_var()->str:
     {tabs}      call check(nf90_def_var(ncid, trim(varname), xtype, dim_ids, var_id))
     {tabs}   end if
 
+    {tabs}   if (present(chunks) .and. ndim > 0) then
+    {tabs}      ! one record of the unlimited dimension per chunk
+    {tabs}      call check(nf90_def_var_chunking(ncid, var_id, nf90_chunked, &
+    {tabs}         [max(1, min(chunks, dims)), spread(1, 1, total_dims - ndim)]))
+    {tabs}   end if
+    {tabs}   if (present(deflate_level) .or. present(shuffle)) then
+    {tabs}      level = 0
+    {tabs}      if (present(deflate_level)) level = deflate_level
+    {tabs}      shuffle_flag = 0
+    {tabs}      if (present(shuffle)) shuffle_flag = merge(1, 0, shuffle)
+    {tabs}      call check(nf90_def_var_deflate(ncid, var_id, shuffle_flag, merge(1, 0, level > 0), level))
+    {tabs}   end if
+
     {tabs}   select case (xtype)
     {tabs}   case (nf90_double)
     {tabs}      call check(nf90_put_att(ncid,var_id,"_FillValue", fill_double))
@@ -571,70 +1012,57 @@ def gen_nc_write_numeric_scalar()->list[str]:
         """))
     return lines
 
-def gen_nc_write_numeric_array()->list[str]:
-    lines: list[str] = []
-    n_types = ['integer', 'double']
-    map_ftype = {'integer': 'integer', 'double': 'real(8)'}
+def gen_nc_write_array(t: str, ndim: int)->str:
+    """
+    nc_write_<t>_<ndim> passes the assumed-shape array straight to
+    nf90_put_var. Logicals need an integer copy.
+    """
+    map_ftype = {'integer': 'integer', 'double': 'real(8)', 'logical': 'logical'}
     tabs = hio.indent(Tab.reset)
-
-    for t in n_types:
-        ftype = map_ftype[t]
-        sub_lines = textwrap.dedent(f"""
-    {tabs}subroutine nc_write_{t}(ncid, ndim, dims, dim_names, var, varname, timestep)
+    ftype = map_ftype[t]
+    colons = ",".join([":"] * ndim)
+    data = "var"
+    int_buf = ""
+    if t == 'logical':
+        data = "int_buf"
+        int_buf = (
+            f"\n    {tabs}   integer, allocatable :: int_buf({colons})\n"
+            f"\n    {tabs}   int_buf = merge(1, 0, var)  ! logical → int (1=true, 0=false)"
+        )
+    return textwrap.dedent(f"""
+    {tabs}subroutine nc_write_{t}_{ndim}(ncid, var, varname, timestep)
     {tabs}   integer, intent(in) :: ncid
-    {tabs}   integer, intent(in) :: ndim
-    {tabs}   integer, intent(in) :: dims(ndim)
-    {tabs}   character(len=*), dimension(:), intent(in) :: dim_names
-    {tabs}   {ftype}, intent(in) :: var(product(dims))
+    {tabs}   {ftype}, intent(in) :: var({colons})
     {tabs}   character(len=*), intent(in) :: varname
-    {tabs}   integer, optional :: timestep
+    {tabs}   integer, intent(in), optional :: timestep
     {tabs}   !! locals:
-    {tabs}   integer :: var_id, i
-    {tabs}   logical :: unlim
-    {tabs}   real(8), allocatable :: data_1d(:), data_2d(:, :), data_3d(:, :, :)
-    {tabs}   real(8), allocatable :: buffer(:)
-    {tabs}   integer, allocatable :: start(:), count(:)
+    {tabs}   integer :: var_id{int_buf}
 
-    {tabs}   allocate (buffer(product(dims)))
-    {tabs}   buffer = var
-    {tabs}   if(present(timestep)) then 
-    {tabs}      unlim = .true.
-    {tabs}      allocate(start(ndim+1), count(ndim+1))
+    {tabs}   call check(nf90_inq_varid(ncid, trim(varname), var_id))
+    {tabs}   if (present(timestep)) then
+    {tabs}      call check(nf90_put_var(ncid, var_id, {data}, &
+    {tabs}         start=[spread(1, 1, {ndim}), timestep], count=[shape(var), 1]))
     {tabs}   else
-    {tabs}      unlim = .false.
-    {tabs}      allocate(start(ndim), count(ndim))
-    {tabs}   endif
-
-    {tabs}   do i = 1, ndim
-    {tabs}      start(i) = 1
-    {tabs}      count(i) = dims(i)
-    {tabs}   end do
+    {tabs}      call check(nf90_put_var(ncid, var_id, {data}))
+    {tabs}   end if
+    {tabs}end subroutine nc_write_{t}_{ndim}
+    """)
 
-    {tabs}   if (unlim) then 
-    {tabs}      start(ndim+1) = timestep
-    {tabs}      count(ndim+1) = 1
-    {tabs}   endif
+def gen_nc_bench_report()->str:
+    tabs = hio.indent(Tab.reset)
+    return textwrap.dedent(f"""
+    {tabs}subroutine nc_bench_report(op, varname, nbytes, t0, t1, rate)
+    {tabs}   character(len=*), intent(in) :: op, varname
+    {tabs}   integer(8), intent(in) :: nbytes, t0, t1, rate
+    {tabs}   !! locals:
+    {tabs}   real(8) :: mb, secs
 
-    {tabs}   call check(nf90_inq_varid(ncid, trim(varname), var_id))
-    {tabs}   select case (ndim)
-    {tabs}   case (1)
-    {tabs}      allocate (data_1d(dims(1))); data_1d = reshape(buffer, [dims(1)])
-    {tabs}      call check(nf90_put_var(ncid, var_id, data_1d))
-    {tabs}   case (2)
-    {tabs}      allocate (data_2d(dims(1), dims(2))); data_2d = reshape(buffer, [dims(1), dims(2)])
-    {tabs}      call check(nf90_put_var(ncid, var_id, data_2d))
-    {tabs}   case (3)
-    {tabs}      allocate (data_3d(dims(1), dims(2), dims(3))); data_3d = reshape(buffer, [dims(1), dims(2), dims(3)])
-    {tabs}      call check(nf90_put_var(ncid, var_id, data_3d))
-    {tabs}   case default
-    {tabs}      stop "(nc_write_{t}) doesn't support >3D doubles"
-    {tabs}   end select
-    {tabs}end subroutine nc_write_{t}
+    {tabs}   mb = real(nbytes, 8)/1.d6
+    {tabs}   secs = max(real(t1 - t0, 8)/real(rate, 8), 1.d-9)
+    {tabs}   write (*, '(a6,1x,a48,f12.3," MB",f10.4," s",f12.1," MB/s")') op, varname, mb, secs, mb/secs
+    {tabs}end subroutine nc_bench_report
+    """)
 
-        """)
-        lines.append(sub_lines)
-    return lines
-    
 def gen_nc_write_string()->str:
     tabs = hio.indent(Tab.reset)
     return textwrap.dedent(f"""
@@ -651,22 +1079,6 @@ def gen_nc_write_string()->str:
 def gen_nc_write_logical()->str:
     tabs = hio.indent(Tab.reset)
     return textwrap.dedent(f"""
-    {tabs}subroutine nc_write_logical(ncid, ndim, dims, dim_names, var, varname)
-    {tabs}   integer, intent(in) :: ncid, ndim
-    {tabs}   integer, intent(in) :: dims(ndim)
-    {tabs}   character(len=*), dimension(:), intent(in) :: dim_names
-    {tabs}   logical, intent(in) :: var(product(dims))
-    {tabs}   character(len=*), intent(in) :: varname
-    {tabs}   integer :: var_id
-    {tabs}   integer, allocatable :: int_buf(:)
-
-    {tabs}   allocate (int_buf(product(dims)))
-    {tabs}   int_buf = merge(1, 0, var)  ! logical → int (1=true, 0=false)
-
-    {tabs}   call check(nf90_inq_varid(ncid, trim(varname), var_id))
-    {tabs}   call check(nf90_put_var(ncid, var_id, int_buf))
-    {tabs}end subroutine nc_write_logical
-
     {tabs}subroutine nc_write_logical_scalar(ncid, var, varname)
     {tabs}   integer, intent(in) :: ncid
     {tabs}   logical, intent(in) :: var
@@ -0,0 +1,166 @@
+"""
+On-disk cache for the per-file parsing done by edit_files.
+
+Entries are keyed by the content hash of the source file together with the
+configuration that can change the parse (bad_modules, bad_subroutines,
+macros). Only the names that actually occur in the file are part of the key,
+so building a different unit test against the same E3SM commit reuses the
+entries of every shared module.
+
+The hash of the parser's own source is folded into every key, so editing
+SPEL invalidates stale entries without manual clean up. The contents of the
+headers a file includes are part of its key as well.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import re
+from typing import Any, Iterable, Optional
+
+from scripts.mod_config import E3SM_SRCROOT, scripts_dir, spel_output_dir
+
+CACHE_VERSION = 1
+
+parse_cache_dir = f"{spel_output_dir}parse_cache/"
+
+# Include path of `gfortran -cpp`, searched after the directory of the file
+cpp_include_dirs = [f"{E3SM_SRCROOT}/share/include"]
+
+regex_include = re.compile(r"""^\s*#?\s*include\s+["']([^"']+)["']""", re.IGNORECASE | re.MULTILINE)
+
+# Source files whose logic determines the cached results
+_parser_sources = [
+    "edit_files.py",
+    "check_sections.py",
+    "types.py",
+    "utilityFunctions.py",
+    "DerivedType.py",
+    "fortran_modules.py",
+    "parse_cache.py",
+    "preprocess.py",
+]
+
+_code_version: Optional[str] = None
+
+
+def code_version() -> str:
+    global _code_version
+    if _code_version is None:
+        sha = hashlib.sha1(str(CACHE_VERSION).encode())
+        for fn in _parser_sources:
+            with open(os.path.join(scripts_dir, fn), "rb") as f:
+                sha.update(f.read())
+        _code_version = sha.hexdigest()
+    return _code_version
+
+
+def hash_lines(lines: list[str]) -> str:
+    return hashlib.sha1("".join(lines).encode()).hexdigest()
+
+
+def find_include(name: str, fpath: str) -> Optional[str]:
+    for inc_dir in [os.path.dirname(fpath), *cpp_include_dirs]:
+        path = os.path.join(inc_dir, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def hash_includes(fpath: str, lines: list[str]) -> str:
+    """
+    Hash of the headers included by fpath (`#include` and Fortran `include`),
+    following nested includes. Headers that can't be found hash as missing.
+    """
+    sha = hashlib.sha1()
+    seen: set[str] = set()
+    todo = [(fpath, "".join(lines))]
+    while todo:
+        parent, text = todo.pop()
+        for name in regex_include.findall(text):
+            path = find_include(name, parent)
+            sha.update(f"{name}\0".encode())
+            if path is None:
+                sha.update(b"missing\0")
+                continue
+            if path in seen:
+                continue
+            seen.add(path)
+            with open(path, "rb") as f:
+                content = f.read()
+            sha.update(content)
+            todo.append((path, content.decode(errors="replace")))
+    return sha.hexdigest()
+
+
+def names_in_text(text: str, names: Iterable[str]) -> list[str]:
+    """
+    Returns the sorted subset of names that could match in text.
+    Entries of the form `name|alias` are kept if either part occurs.
+    Substring tests are used since some of the regexes don't end on a word boundary.
+    """
+    found = set()
+    for name in names:
+        if any(part and part in text for part in name.split("|")):
+            found.add(name)
+    return sorted(found)
+
+
+class ParseCache:
+    """
+    Simple key -> pickle store. One file per entry so concurrent writers
+    of different modules never contend.
+    """
+
+    def __init__(self, cache_dir: str = parse_cache_dir, enabled: bool = True):
+        self.cache_dir: str = cache_dir
+        self.enabled: bool = enabled
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __repr__(self):
+        return f"ParseCache({self.cache_dir}, hits={self.hits}, misses={self.misses})"
+
+    def make_key(self, kind: str, fpath: str, digest: str, *config: Any) -> str:
+        sha = hashlib.sha1(code_version().encode())
+        for part in (kind, fpath, digest, *config):
+            sha.update(repr(part).encode())
+            sha.update(b"\0")
+        return f"{kind}-{os.path.basename(fpath)}-{sha.hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def clear(self) -> None:
+        if not os.path.isdir(self.cache_dir):
+            return
+        for fn in os.listdir(self.cache_dir):
+            if fn.endswith(".pkl"):
+                os.remove(os.path.join(self.cache_dir, fn))
+
+
+parse_cache = ParseCache()
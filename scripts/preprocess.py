@@ -0,0 +1,156 @@
+"""
+Cached C-preprocessing of Fortran sources.
+
+Which files need the preprocessor is read from the source index instead of
+grepping each file. Outputs of `gfortran -cpp -E` are stored under
+`script-output/cpp_cache/` keyed by the file's content hash, the hash of the
+headers it includes and the macros,
+and files that miss the cache are preprocessed in batches so a single
+gfortran invocation handles many files.
+
+The working copy `script-output/cpp_<file>` that Subroutines refer to is
+always refreshed from the store.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import subprocess as sp
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from scripts.logging_configs import get_logger
+from scripts.mod_config import spel_output_dir
+from scripts.parse_cache import cpp_include_dirs, hash_includes
+from scripts.source_index import get_source_index
+
+cpp_cache_dir = f"{spel_output_dir}cpp_cache/"
+
+# Max number of files handed to a single gfortran invocation
+BATCH_SIZE = 64
+
+logger = get_logger("CPP")
+
+
+def needs_cpp(fn: str) -> bool:
+    return get_source_index().needs_cpp(fn)
+
+
+def cpp_output_path(fn: str) -> str:
+    """Path of the preprocessed copy of fn used by the rest of SPEL"""
+    return f"{spel_output_dir}cpp_{os.path.basename(fn)}"
+
+
+def cpp_cache_path(fn: str, macros: list[str]) -> str:
+    digest = get_source_index().get_file(fn).digest
+    with open(fn, "r", errors="replace") as ifile:
+        lines = ifile.readlines()
+    sha = hashlib.sha1(digest.encode())
+    sha.update(hash_includes(fn, lines).encode())
+    sha.update(" ".join(sorted(macros)).encode())
+    return f"{cpp_cache_dir}{os.path.basename(fn)}-{sha.hexdigest()}"
+
+
+def cpp_command(fpaths: list[str], macros: list[str]) -> list[str]:
+    macro_flags = [f"-D{m}" for m in macros]
+    include_flags = [f"-I{inc_dir}" for inc_dir in cpp_include_dirs]
+    return ["gfortran", *include_flags, *macro_flags, "-cpp", "-E", *fpaths]
+
+
+def split_cpp_output(output: str, fpaths: list[str]) -> Optional[dict[str, str]]:
+    """
+    Split the output of one gfortran call on several files. Each translation unit
+    starts with `# 1 "<file>"` followed by `# 1 "<built-in>"`.
+    Returns None if the output can't be split unambiguously.
+    """
+    lines = output.splitlines(keepends=True)
+    starts: list[int] = []
+    i = 0
+    for fn in fpaths:
+        marker = f'# 1 "{fn}"'
+        while i < len(lines) - 1:
+            if lines[i].rstrip("\n") == marker and lines[i + 1].startswith('# 1 "<built-in>"'):
+                break
+            i += 1
+        else:
+            return None
+        starts.append(i)
+        i += 1
+    starts.append(len(lines))
+    return {fn: "".join(lines[starts[n] : starts[n + 1]]) for n, fn in enumerate(fpaths)}
+
+
+def run_cpp(fpaths: list[str], macros: list[str]) -> dict[str, str]:
+    """
+    Preprocess fpaths with a single gfortran call, falling back to one call
+    per file if the batch fails. Files that gfortran fails on are logged and
+    left out of the returned outputs, so their output is never cached.
+    """
+    if len(fpaths) > 1:
+        result = sp.run(cpp_command(fpaths, macros), capture_output=True, text=True)
+        outputs = split_cpp_output(result.stdout, fpaths) if result.returncode == 0 else None
+        if outputs is not None:
+            return outputs
+        logger.warning(f"Batched preprocessing failed -- preprocessing {len(fpaths)} files individually")
+
+    outputs = {}
+    for fn in fpaths:
+        result = sp.run(cpp_command([fn], macros), capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.error(f"gfortran -cpp -E failed for {fn}:\n{result.stderr}")
+            continue
+        outputs[fn] = result.stdout
+    return outputs
+
+
+def store_cpp_output(fn: str, macros: list[str], output: str) -> str:
+    os.makedirs(cpp_cache_dir, exist_ok=True)
+    path = cpp_cache_path(fn, macros)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as ofile:
+        ofile.write(output)
+    os.replace(tmp, path)
+    return path
+
+
+def preprocess_files(fpaths: list[str], macros: list[str], jobs: int = 1) -> None:
+    """
+    Fill the cache for every file in fpaths that needs preprocessing.
+    Batches are run concurrently on `jobs` threads.
+    """
+    todo = [
+        fn
+        for fn in dict.fromkeys(fpaths)
+        if needs_cpp(fn) and not os.path.exists(cpp_cache_path(fn, macros))
+    ]
+    if not todo:
+        return
+    batches = [todo[i : i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)]
+    logger.info(f"Preprocessing {len(todo)} files in {len(batches)} batch(es)")
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        for outputs in executor.map(lambda batch: run_cpp(batch, macros), batches):
+            for fn, output in outputs.items():
+                store_cpp_output(fn, macros, output)
+    return
+
+
+def get_cpp_lines(fn: str, macros: list[str]) -> list[str]:
+    """
+    Returns the preprocessed lines of fn and makes sure `cpp_<file>` is in
+    script-output.
+    """
+    path = cpp_cache_path(fn, macros)
+    if not os.path.exists(path):
+        output = run_cpp([fn], macros).get(fn)
+        if output is None:
+            sys.exit(f"Error -- couldn't preprocess {fn}")
+        path = store_cpp_output(fn, macros, output)
+
+    os.makedirs(spel_output_dir, exist_ok=True)
+    shutil.copyfile(path, cpp_output_path(fn))
+    with open(path, "r") as ifile:
+        return ifile.readlines()
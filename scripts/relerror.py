@@ -1,6 +1,7 @@
 import sys
 import time
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import xarray
@@ -35,7 +36,110 @@ def progressbar(it, prefix="", size=60, out=sys.stdout):
     print("\n", flush=True, file=out)
 
 
-def rel_error(refdata, compdata, var, error_log):
+# Max number of elements of a variable held in memory at once
+CHUNK_SIZE = 2**22
+
+
+class ScratchBuffers:
+    """
+    Flat work arrays reused for every slab of every variable.
+    Buffers are keyed by (name, dtype) and only grow.
+    """
+
+    def __init__(self):
+        self.buffers: dict[tuple[str, np.dtype], np.ndarray] = {}
+
+    def get(self, name, dtype, shape):
+        size = int(np.prod(shape))
+        key = (name, np.dtype(dtype))
+        buf = self.buffers.get(key)
+        if buf is None or buf.size < size:
+            buf = np.empty(size, dtype=dtype)
+            self.buffers[key] = buf
+        return buf[:size].reshape(shape)
+
+
+def iter_slabs(shape, chunk_size):
+    """
+    Yields index tuples that cover an array of `shape` in C order with
+    at most chunk_size elements each (unless a single row is larger).
+    The slabs are taken along the first axis whose trailing size fits.
+    """
+    if not shape:
+        yield ()
+        return
+    axis = 0
+    inner = int(np.prod(shape[1:]))
+    while axis < len(shape) - 1 and inner * shape[axis] > chunk_size:
+        axis += 1
+        inner //= shape[axis]
+    step = max(1, chunk_size // max(inner, 1))
+    for lead in np.ndindex(*shape[:axis]):
+        for start in range(0, shape[axis], step):
+            yield lead + (slice(start, min(start + step, shape[axis])),)
+
+
+def first_examples(slab, sig_elements, og_vals, test_vals, sig_diffs, num, origin=()):
+    """
+    Returns (coords, ref, test, diff) for the first num significant elements
+    of slab, with coords given as 1-based indices into the full variable.
+    origin is the position of the compared part in the reference variable.
+    """
+    lead = tuple(s for s in slab if not isinstance(s, slice))
+    start = [s.start for s in slab if isinstance(s, slice)]
+    flat = np.flatnonzero(sig_elements)[:num]
+    shape = sig_elements.shape
+    local = np.unravel_index(flat, shape) if shape else ()
+    examples = []
+    for i in range(len(flat)):
+        idx = [int(axis[i]) for axis in local]
+        if start:
+            idx[0] += start[0]
+        coords = lead + tuple(idx)
+        if origin:
+            coords = tuple(x + o for x, o in zip(coords, origin))
+        coords = tuple(int(x) + 1 for x in coords)
+        examples.append((coords, og_vals[i], test_vals[i], sig_diffs[i]))
+    return examples
+
+
+def fortran_bounds(variable):
+    """
+    Returns the lbounds and ubounds attributes of variable (written for
+    every array by write_elmtypes) in the order of its dimensions, or None
+    """
+    lbounds, ubounds = variable.attrs.get("lbounds"), variable.attrs.get("ubounds")
+    if lbounds is None or ubounds is None:
+        return None
+    # Fortran order is the reverse of the netcdf dimensions
+    lbounds = np.atleast_1d(lbounds)[::-1]
+    ubounds = np.atleast_1d(ubounds)[::-1]
+    if len(lbounds) != variable.ndim or len(ubounds) != variable.ndim:
+        return None
+    return lbounds, ubounds
+
+
+def reference_slab(ref_var, comp_var):
+    """
+    Index of the part of ref_var held by comp_var, from their array bounds.
+    With SPEL_PARALLEL_IO each rank writes its slab of the decomposed
+    arrays to fut-results-<rank>.nc, which is compared against the same
+    slab of the whole-domain reference.
+    Returns None if the bounds are missing or comp_var isn't inside ref_var.
+    """
+    ref_bounds = fortran_bounds(ref_var)
+    comp_bounds = fortran_bounds(comp_var)
+    if ref_bounds is None or comp_bounds is None or ref_var.ndim != comp_var.ndim:
+        return None
+    slab = []
+    for ref_lb, ref_ub, lb, ub in zip(*ref_bounds, *comp_bounds):
+        if lb < ref_lb or ub > ref_ub:
+            return None
+        slab.append(slice(int(lb - ref_lb), int(ub - ref_lb + 1)))
+    return tuple(slab)
+
+
+def rel_error(refdata, compdata, var, error_log, chunk_size=CHUNK_SIZE, scratch=None):
     """
     Function to find any differences between history files
         - refdata : xarray Dataset presumed to have the correct values
@@ -45,69 +149,100 @@ def rel_error(refdata, compdata, var, error_log):
         'time': 1, 'levdcmp': 15, 'lndgrid': 21
     it will be assumed that time is always the leftmost, and
     the gridcell is always the rightmost dimension.
+    If compdata holds a slab of the variable (a rank's results file), it is
+    compared against that slab of refdata (see reference_slab).
+
+    The variable is read in slabs of at most chunk_size elements so memory
+    use doesn't depend on the size of the file. Only the counts, sum of squares,
+    max and the first NUMLOGS offending elements are kept between slabs.
     """
     # Get relevant data
-    MAX_LOG_LENGTH = 10
-    original_vals = refdata[var].values
-    comp_vals = compdata[var].values
-    dims = refdata[var].dims
+    ref_var = refdata[var].variable
+    comp_var = compdata[var].variable
     dtype = refdata[var].dtype
-    sizes = refdata[var].sizes
-    if comp_vals.shape != original_vals.shape:
+    origin = ()
+    ref_slab = reference_slab(ref_var, comp_var)
+    if ref_slab is not None:
+        ref_var = ref_var[ref_slab]
+        origin = tuple(s.start for s in ref_slab)
+    if comp_var.shape != ref_var.shape:
         print(f"Error {var} dimensions do not match between files")
-        print(f"OG : {original_vals.shape}\n TEST : {comp_vals.shape}")
+        print(f"OG : {ref_var.shape}\n TEST : {comp_var.shape}")
         sys.exit(1)
 
+    if scratch is None:
+        scratch = ScratchBuffers()
+
     # Set parameters and initialize diff log
     EPSILON = 1.0e-50
     ERROR = 0.0e-25  # Threshold to report
     NUMLOGS = 8  # total number of examples to report
-    diff_vals = original_vals - comp_vals
-    diff_vals = np.abs(diff_vals)
+    num_sig = 0
+    sum_sq = 0.0
+    max_err = None
+    examples = []
 
-    # Find ref values that are non-zero
-    nonzero_elements = np.full(diff_vals.shape, True)
+    for slab in iter_slabs(ref_var.shape, chunk_size):
+        original_vals = np.asarray(ref_var[slab].values)
+        comp_vals = np.asarray(comp_var[slab].values)
+        shape = original_vals.shape
 
-    nonzero_elements[np.abs(original_vals) == 0.0] = False
-    zero_elements = np.invert(nonzero_elements)
+        diff_vals = scratch.get("diff", np.result_type(original_vals, comp_vals), shape)
+        np.subtract(original_vals, comp_vals, out=diff_vals)
+        np.abs(diff_vals, out=diff_vals)
 
-    # Calculated relative error at each position:
-    relerror = np.zeros(diff_vals.shape, dtype=dtype)
-    relerror[nonzero_elements] = diff_vals[nonzero_elements] / np.abs(
-        original_vals[nonzero_elements]
-    )
-    relerror[zero_elements] = diff_vals[zero_elements] / EPSILON
-
-    # Generate mask for significant errors greater than threshold ERROR.
-    # Then use mask to retrieve corresponding elements from data arrays
-    sig_elements = np.full(diff_vals.shape, False)
-    sig_elements[relerror > ERROR] = True
-
-    indices = np.argwhere(relerror > ERROR)
-    sig_diffs = relerror[sig_elements]
-    og_vals = original_vals[sig_elements]
-    test_vals = comp_vals[sig_elements]
-    if len(sig_diffs) > 0:
-        dims_str = [k for k in sizes.keys()]
-        dims_str = ",".join(dims_str)
+        # Find ref values that are non-zero
+        abs_vals = scratch.get("abs", original_vals.dtype, shape)
+        np.abs(original_vals, out=abs_vals)
+        nonzero_elements = scratch.get("nonzero", bool, shape)
+        np.not_equal(abs_vals, 0.0, out=nonzero_elements)
+
+        # Calculated relative error at each position:
+        relerror = scratch.get("relerror", dtype, shape)
+        np.divide(
+            diff_vals, abs_vals, out=relerror, where=nonzero_elements, casting="unsafe"
+        )
+        np.logical_not(nonzero_elements, out=nonzero_elements)
+        np.divide(
+            diff_vals, EPSILON, out=relerror, where=nonzero_elements, casting="unsafe"
+        )
+
+        # Generate mask for significant errors greater than threshold ERROR.
+        sig_elements = scratch.get("sig", bool, shape)
+        np.greater(relerror, ERROR, out=sig_elements)
+        count = int(np.count_nonzero(sig_elements))
+        if count == 0:
+            continue
+
+        sig_diffs = relerror[sig_elements]
+        og_vals = original_vals[sig_elements]
+        test_vals = comp_vals[sig_elements]
+        num_sig += count
+        sum_sq += float(np.sum((og_vals - test_vals) ** 2, dtype=np.float64))
+        slab_max = np.max(sig_diffs)
+        max_err = slab_max if max_err is None else max(max_err, slab_max)
+
+        if len(examples) <= NUMLOGS:
+            num = NUMLOGS + 1 - len(examples)
+            examples.extend(
+                first_examples(
+                    slab, sig_elements, og_vals, test_vals, sig_diffs, num, origin
+                )
+            )
+
+    if num_sig > 0:
         newvar_header = [f"{var}", "Ref", "Test", "Diff"]
 
         # Calculate RMSE:
-        rmse = np.sqrt(((og_vals - test_vals) ** 2).mean()) / np.sqrt(len(og_vals))
+        rmse = np.sqrt(sum_sq / num_sig) / np.sqrt(num_sig)
         summary = Tally(
             "Summary",
-            f"#{len(sig_diffs)}",
+            f"#{num_sig}",
             f"rmse: {rmse}",
-            f"max: {np.max(sig_diffs)}",
+            f"max: {max_err}",
         )
         error_log.append(tuple(newvar_header))
-        for i, diff in enumerate(sig_diffs):
-            indices[i] += 1
-            coords = tuple(int(x) for x in indices[i])
-            og_val = og_vals[i]
-            t_val = test_vals[i]
-            if i <= NUMLOGS:
-                error_log.append(tuple([coords, og_val, t_val, diff]))
+        error_log.extend(examples)
         error_log.append(summary)
     else:
         summary = None
@@ -121,29 +256,114 @@ def is_numeric(dtype):
     return np.issubdtype(dtype, np.number)
 
 
-def find_diffs(refn: str, compfn: str, var: str = "", ostream=sys.stdout):
+def open_datasets(refn: str, compfn: str):
+    # cache=False so slabs aren't kept in memory after they're compared
+    refdata = xarray.open_dataset(refn, cache=False)
+    compdata = xarray.open_dataset(compfn, cache=False)
+    return refdata, compdata
+
+
+# Per-process state for parallel diffs. Each worker opens the files itself
+# so only variable names and result rows cross process boundaries.
+_worker_state = {}
+
+
+def _init_worker(refn: str, compfn: str, chunk_size: int):
+    refdata, compdata = open_datasets(refn, compfn)
+    _worker_state.update(
+        refdata=refdata,
+        compdata=compdata,
+        chunk_size=chunk_size,
+        scratch=ScratchBuffers(),
+    )
+
+
+def _diff_var(var: str) -> list:
+    error_log, _ = rel_error(
+        _worker_state["refdata"],
+        _worker_state["compdata"],
+        var,
+        [],
+        _worker_state["chunk_size"],
+        _worker_state["scratch"],
+    )
+    return error_log
+
+
+def split_variables(refdata, compdata) -> tuple[list[str], list[str], list[str]]:
+    """
+    Returns the variables in both datasets (in reference order) and the
+    ones only in the reference or only in the comparison dataset.
+    """
+    ref_names = [str(var) for var in refdata.keys()]
+    comp_names = {str(var) for var in compdata.keys()}
+    common = [var for var in ref_names if var in comp_names]
+    ref_only = [var for var in ref_names if var not in comp_names]
+    test_only = sorted(comp_names - set(ref_names))
+    return common, ref_only, test_only
+
+
+def find_diffs(
+    refn: str,
+    compfn: str,
+    var: str = "",
+    ostream=sys.stdout,
+    chunk_size: int = CHUNK_SIZE,
+    jobs: int = 1,
+):
     """
     Function to compare two netcdf files and report any significant diffs
+    Variables are streamed in slabs of at most chunk_size elements.
+    With jobs > 1, variables are distributed over a process pool and the
+    results are reported in the same order as the serial comparison.
+
+    Only the variables in both files are compared: the unit test only
+    writes the fields it modifies (see split_state_vars), so a reference
+    holding the full state has more variables than the test file.
     """
     findall = True if not var else False
     print("Reference File is:", refn)
     print("Comparison File is:", compfn)
     print("Findall is:", findall)
 
-    refdata = xarray.open_dataset(refn)
-    compdata = xarray.open_dataset(compfn)
+    refdata, compdata = open_datasets(refn, compfn)
+    scratch = ScratchBuffers()
 
     if findall:
-        var_names = [var for var in refdata.keys()]
-        current_var = var_names[0]
+        common, ref_only, test_only = split_variables(refdata, compdata)
+        if ref_only:
+            print(f"Skipping {len(ref_only)} variables not in the comparison file")
+        if test_only:
+            print(f"Skipping {len(test_only)} variables not in the reference file:")
+            print("  " + " ".join(test_only))
+
+    if findall and jobs > 1:
+        var_names = [var for var in common if is_numeric(refdata[var].dtype)]
+        error_log = []
+        if var_names:
+            chunksize = max(1, len(var_names) // (jobs * 8))
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(refn, compfn, chunk_size),
+            ) as executor:
+                results = executor.map(_diff_var, var_names, chunksize=chunksize)
+                for _, var_log in zip(progressbar(var_names, "VAR:", 40), results):
+                    error_log.extend(var_log)
+    elif findall:
+        var_names = common
         error_log = []
         for var in progressbar(var_names, "VAR:", 40):
             dtype = refdata[var].dtype
             if is_numeric(dtype):
-                error_log, summary = rel_error(refdata, compdata, var, error_log)
+                error_log, summary = rel_error(
+                    refdata, compdata, var, error_log, chunk_size, scratch
+                )
     else:
         error_log = []
-        error_log, summary = rel_error(refdata, compdata, var, error_log)
+        error_log, summary = rel_error(
+            refdata, compdata, var, error_log, chunk_size, scratch
+        )
     ostream.write(tabulate(error_log, tablefmt="psql"))
     ostream.write("\n")
     ostream.close()
@@ -0,0 +1,424 @@
+"""
+One-pass index of the Fortran source tree.
+
+Replaces the `grep -rin` lookups over ELM_SRC/SHR_SRC with a single scan
+that records, per file:
+    * module declarations and the end of each module head
+    * subroutine/function start and end lines
+    * named interfaces and their module procedures
+    * `type(<type_name>) :: inst` declarations
+    * whether the file needs to be preprocessed
+
+The index is pickled to `spel_output_dir` and reused across runs. Files are
+only re-scanned when their mtime/size changed AND their content hash differs.
+All line numbers are 1-based to match the grep output they replace.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import re
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+import scripts.mod_config as mod_config
+
+INDEX_VERSION = 2
+
+# Suffixes of files to scan. grep scanned everything, but only Fortran
+# sources ever produced a match.
+FORTRAN_SUFFIXES = (".f90", ".f", ".inc")
+EXCLUDE_DIRS = {"external_models"}
+
+_prefix = r"(?:(?:pure|impure|elemental|recursive)\s+)*"
+_type_spec = (
+    r"(?:(?:integer|real|logical|character|complex|double\s+precision|type|class)"
+    r"\b\s*(?:\([^)]*\))?\s*)?"
+)
+regex_module = re.compile(r"^\s*module\s+(\w+)", re.IGNORECASE)
+regex_sub = re.compile(rf"^\s*{_prefix}subroutine\s+(\w+)", re.IGNORECASE)
+regex_end_sub = re.compile(r"^\s*end\s*subroutine\b\s*(\w*)", re.IGNORECASE)
+regex_func = re.compile(
+    rf"^\s*{_prefix}{_type_spec}{_prefix}function\s+(\w+)", re.IGNORECASE
+)
+regex_end_func = re.compile(r"^\s*end\s*function\b\s*(\w*)", re.IGNORECASE)
+regex_interface = re.compile(r"^\s*(abstract\s+)?interface\b\s*(\S*)", re.IGNORECASE)
+regex_end_interface = re.compile(r"^\s*end\s*interface\b", re.IGNORECASE)
+regex_mod_proc = re.compile(r"^\s*module\s+procedure\s+(.+)", re.IGNORECASE)
+regex_type_inst = re.compile(r"type\s*\(\s*(\w+)\s*\)", re.IGNORECASE)
+regex_type_start = re.compile(r"^type\b(?!\s*\()", re.IGNORECASE)
+regex_type_end = re.compile(r"\bend\s+type\b", re.IGNORECASE)
+regex_contains = re.compile(r"\bcontains\b", re.IGNORECASE)
+
+
+class ProcInfo(NamedTuple):
+    """
+    Location of a subroutine or function
+        name: str
+        fpath: str
+        start_ln: int
+        end_ln: int   (0 if the end statement wasn't found)
+    """
+
+    name: str
+    fpath: str
+    start_ln: int
+    end_ln: int
+
+
+class InterfaceInfo(NamedTuple):
+    name: str
+    fpath: str
+    ln: int
+    procedures: tuple[str, ...]
+
+
+class TypeInstDecl(NamedTuple):
+    """
+    A line declaring a variable of a user type:
+        type_name: str
+        fpath: str
+        ln: int
+        line: str (raw text of the declaration)
+    """
+
+    type_name: str
+    fpath: str
+    ln: int
+    line: str
+
+
+@dataclass
+class FileIndex:
+    """
+    Everything recorded for a single source file
+    """
+
+    fpath: str
+    mtime_ns: int
+    size: int
+    digest: str
+    needs_cpp: bool = False
+    modules: list[tuple[str, int]] = field(default_factory=list)
+    head_end_ln: int = -1
+    subroutines: list[ProcInfo] = field(default_factory=list)
+    functions: list[ProcInfo] = field(default_factory=list)
+    interfaces: list[InterfaceInfo] = field(default_factory=list)
+    type_decls: list[TypeInstDecl] = field(default_factory=list)
+
+
+def hash_file(fpath: str) -> str:
+    with open(fpath, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def scan_file(fpath: str) -> FileIndex:
+    """
+    Tokenize a single file line-by-line and record its declarations.
+    """
+    st = os.stat(fpath)
+    with open(fpath, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    lines = raw.decode("utf-8", errors="replace").splitlines()
+
+    findex = FileIndex(fpath=fpath, mtime_ns=st.st_mtime_ns, size=st.st_size, digest=digest)
+
+    open_subs: list[tuple[str, int]] = []
+    open_funcs: list[tuple[str, int]] = []
+    # Bare and abstract interface blocks are tracked with name=None so the
+    # procedure signatures inside them aren't mistaken for definitions.
+    iface: Optional[tuple[Optional[str], int, list[str]]] = None
+    in_type = False
+    head_done = False
+
+    for ln, line in enumerate(lines, start=1):
+        if ("ifdef" in line or "ifndef" in line) and "_OPENACC" not in line:
+            findex.needs_cpp = True
+        code = line.split("!")[0]
+        stripped = code.strip()
+        if not stripped:
+            if not head_done:
+                findex.head_end_ln = ln
+            continue
+        lower = stripped.lower()
+
+        if not head_done:
+            findex.head_end_ln = ln
+            if regex_type_start.search(lower):
+                in_type = True
+            if in_type and regex_type_end.search(lower):
+                in_type = False
+            if not in_type and regex_contains.search(lower):
+                head_done = True
+
+        if "::" in code and "intent" not in lower:
+            for m in regex_type_inst.finditer(code):
+                findex.type_decls.append(
+                    TypeInstDecl(m.group(1).lower(), fpath, ln, line.rstrip("\n"))
+                )
+
+        first = lower.split(None, 1)[0]
+        if iface is not None:
+            if regex_end_interface.match(lower):
+                name, iln, procs = iface
+                if name:
+                    findex.interfaces.append(InterfaceInfo(name, fpath, iln, tuple(procs)))
+                iface = None
+                continue
+            m = regex_mod_proc.match(lower)
+            if m:
+                names = m.group(1).replace("&", "").split(",")
+                iface[2].extend(n.strip() for n in names if n.strip())
+            continue
+
+        if first == "module":
+            m = regex_module.match(lower)
+            if m and m.group(1) != "procedure":
+                findex.modules.append((m.group(1), ln))
+            continue
+        if first in ("interface", "abstract"):
+            m = regex_interface.match(lower)
+            if m:
+                name = None if m.group(1) else m.group(2) or None
+                iface = (name, ln, [])
+                continue
+        if first.startswith("end"):
+            m = regex_end_sub.match(lower)
+            if m and open_subs:
+                name, start = open_subs.pop()
+                findex.subroutines.append(ProcInfo(name, fpath, start, ln))
+                continue
+            m = regex_end_func.match(lower)
+            if m and open_funcs:
+                name, start = open_funcs.pop()
+                findex.functions.append(ProcInfo(name, fpath, start, ln))
+            continue
+        if "subroutine" in lower:
+            m = regex_sub.match(lower)
+            if m:
+                open_subs.append((m.group(1), ln))
+                continue
+        if "function" in lower:
+            m = regex_func.match(lower)
+            if m:
+                open_funcs.append((m.group(1), ln))
+
+    # Unterminated procedures are still recorded so lookups don't fail
+    for name, start in open_subs:
+        findex.subroutines.append(ProcInfo(name, fpath, start, 0))
+    for name, start in open_funcs:
+        findex.functions.append(ProcInfo(name, fpath, start, 0))
+
+    return findex
+
+
+def walk_sources(root: str) -> list[str]:
+    """
+    Return all Fortran files under root in a deterministic order.
+    Paths are built the same way grep -r reports them so they can
+    be compared with paths produced elsewhere in SPEL.
+    """
+    fpaths: list[str] = []
+    if not os.path.isdir(root):
+        return fpaths
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDE_DIRS)
+        for fname in sorted(filenames):
+            if fname.lower().endswith(FORTRAN_SUFFIXES):
+                fpaths.append(os.path.join(dirpath, fname))
+    return fpaths
+
+
+class SourceIndex:
+    """
+    Index of all Fortran sources under `roots`. Earlier roots take
+    precedence when names are defined more than once (ELM before share).
+    """
+
+    def __init__(self, roots: list[str], cache_file: Optional[str] = None):
+        self.roots: list[str] = roots
+        self.cache_file: Optional[str] = cache_file
+        self.files: dict[str, FileIndex] = {}
+        self.outside_files: set[str] = set()  # files read through get_file only
+        self.num_scanned: int = 0
+
+        self.module_to_file: dict[str, str] = {}
+        self.subroutines: dict[str, ProcInfo] = {}
+        self.functions: dict[str, ProcInfo] = {}
+        self.interfaces: dict[str, InterfaceInfo] = {}
+        self.type_decls: dict[str, list[TypeInstDecl]] = {}
+        self.basename_to_files: dict[str, list[str]] = {}
+
+    def __repr__(self):
+        return f"SourceIndex(roots={self.roots}, files={len(self.files)})"
+
+    def load(self) -> None:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "rb") as f:
+                version, roots, files = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return
+        if version == INDEX_VERSION and roots == self.roots:
+            self.files = files
+
+    def save(self) -> None:
+        if not self.cache_file:
+            return
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((INDEX_VERSION, self.roots, self.files), f)
+        os.replace(tmp, self.cache_file)
+
+    def refresh(self) -> None:
+        """
+        Bring the index up to date with the files on disk.
+        """
+        current: dict[str, FileIndex] = {}
+        self.num_scanned = 0
+        for root in self.roots:
+            for fpath in walk_sources(root):
+                if fpath in current:
+                    continue
+                current[fpath] = self._check_file(fpath)
+
+        changed = self.num_scanned > 0 or current.keys() != self.files.keys()
+        self.files = current
+        self.outside_files.clear()
+        self._build_lookups()
+        if changed:
+            self.save()
+
+    def _check_file(self, fpath: str) -> FileIndex:
+        old = self.files.get(fpath)
+        st = os.stat(fpath)
+        if old and old.mtime_ns == st.st_mtime_ns and old.size == st.st_size:
+            return old
+        if old and old.size == st.st_size and old.digest == hash_file(fpath):
+            old.mtime_ns = st.st_mtime_ns
+            self.num_scanned += 1  # force save of new mtime
+            return old
+        self.num_scanned += 1
+        return scan_file(fpath)
+
+    def _build_lookups(self) -> None:
+        self.module_to_file = {}
+        self.subroutines = {}
+        self.functions = {}
+        self.interfaces = {}
+        self.type_decls = {}
+        self.basename_to_files = {}
+        for fpath, findex in self.files.items():
+            self._add_to_lookups(fpath, findex)
+
+    def _add_to_lookups(self, fpath: str, findex: FileIndex) -> None:
+        for name, _ in findex.modules:
+            self.module_to_file.setdefault(name, fpath)
+        for proc in findex.subroutines:
+            self.subroutines.setdefault(proc.name, proc)
+        for proc in findex.functions:
+            self.functions.setdefault(proc.name, proc)
+        for iface in findex.interfaces:
+            self.interfaces.setdefault(iface.name, iface)
+        for decl in findex.type_decls:
+            self.type_decls.setdefault(decl.type_name, []).append(decl)
+        self.basename_to_files.setdefault(os.path.basename(fpath), []).append(fpath)
+
+    def get_file(self, fpath: str) -> FileIndex:
+        """
+        Return the record for fpath. Files outside the indexed roots aren't
+        covered by refresh, so they are re-checked (mtime/size) on every call.
+        """
+        findex = self.files.get(fpath)
+        if findex is None or fpath in self.outside_files:
+            findex = self._check_file(fpath)
+            self.files[fpath] = findex
+            self.outside_files.add(fpath)
+        return findex
+
+    def module_of_file(self, fpath: str) -> Optional[tuple[int, str]]:
+        """
+        First module declared in fpath as (line number, name)
+        """
+        findex = self.get_file(fpath)
+        if not findex.modules:
+            return None
+        name, ln = findex.modules[0]
+        return ln, name
+
+    def file_of_module(self, module_name: str) -> Optional[str]:
+        return self.module_to_file.get(module_name.lower())
+
+    def needs_cpp(self, fpath: str) -> bool:
+        """
+        True if fpath has ifdef/ifndef directives other than for _OPENACC
+        """
+        return self.get_file(fpath).needs_cpp
+
+    def module_head_end(self, fpath: str) -> int:
+        return self.get_file(fpath).head_end_ln
+
+    def find_subroutine(self, name: str, fpath: str = "") -> Optional[ProcInfo]:
+        name = name.lower()
+        if not fpath:
+            return self.subroutines.get(name)
+        for proc in self.get_file(fpath).subroutines:
+            if proc.name == name:
+                return proc
+        return None
+
+    def find_function(self, name: str, fpath: str = "") -> Optional[ProcInfo]:
+        name = name.lower()
+        if not fpath:
+            return self.functions.get(name)
+        for proc in self.get_file(fpath).functions:
+            if proc.name == name:
+                return proc
+        return None
+
+    def find_interface(self, name: str, fpath: str = "") -> Optional[InterfaceInfo]:
+        name = name.lower()
+        if not fpath:
+            return self.interfaces.get(name)
+        for iface in self.get_file(fpath).interfaces:
+            if iface.name == name:
+                return iface
+        return None
+
+    def interface_names(self) -> list[str]:
+        return list(self.interfaces.keys())
+
+    def type_instance_decls(self, type_name: str) -> list[TypeInstDecl]:
+        return self.type_decls.get(type_name.lower(), [])
+
+    def files_named(self, basename: str) -> list[str]:
+        return self.basename_to_files.get(basename, [])
+
+
+_source_index: Optional[SourceIndex] = None
+
+
+def default_cache_file(roots: list[str]) -> str:
+    key = hashlib.sha1("\n".join(roots).encode()).hexdigest()[:10]
+    return os.path.join(mod_config.spel_output_dir, f"source_index-{key}.pkl")
+
+
+def get_source_index(refresh: bool = False) -> SourceIndex:
+    """
+    Return the process-wide index of ELM_SRC and SHR_SRC, loading it from disk
+    and re-scanning modified files on first use.
+    """
+    global _source_index
+    roots = [mod_config.ELM_SRC, mod_config.SHR_SRC]
+    if _source_index is None or _source_index.roots != roots:
+        _source_index = SourceIndex(roots, cache_file=default_cache_file(roots))
+        _source_index.load()
+        _source_index.refresh()
+    elif refresh:
+        _source_index.refresh()
+    return _source_index
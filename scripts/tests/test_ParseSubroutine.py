@@ -269,3 +269,233 @@ def test_arg_intent():
         print("Sorted mods:\n", [get_module_name_from_file(m) for m in file_list])
 
         assert 1 == 1
+
+
+
+def parse_test_subs(roots: list[str]):
+    """
+    Parse the test files for the unit test functions roots, and collect the
+    variables and calls of every subroutine they call (as
+    process_subroutines_for_unit_test does). Call with mod_config patched.
+    """
+    import scripts.dynamic_globals as dg
+    from scripts.analyze_subroutines import Subroutine
+    from scripts.DerivedType import DerivedType
+    from scripts.edit_files import process_for_unit_test
+    from scripts.fortran_modules import FortranModule
+    from scripts.helper_functions import construct_call_tree
+    from scripts.utilityFunctions import Variable
+    from scripts.variable_analysis import determine_global_variable_status
+
+    dg.populate_interface_list()
+    mod_dict: dict[str, FortranModule] = {}
+    sub_dict: dict[str, Subroutine] = {}
+    process_for_unit_test(
+        case_dir=test_dir,
+        mod_dict=mod_dict,
+        mods=[],
+        required_mods=[],
+        sub_dict=sub_dict,
+        sub_name_list=roots,
+        overwrite=False,
+        verbose=False,
+    )
+    type_dict: dict[str, DerivedType] = {}
+    for mod in mod_dict.values():
+        type_dict.update(mod.defined_types)
+    for dtype in type_dict.values():
+        dtype.find_instances(mod_dict)
+    type_dict["bounds_type"].instances["bounds"] = Variable(
+        type="bounds_type", name="bounds", dim=0, subgrid="?", ln=-1
+    )
+    for sub in sub_dict.values():
+        determine_global_variable_status(mod_dict, sub)
+    for name in roots:
+        sub_dict[name].unit_test_function = True
+        sub_dict[name].collect_var_and_call_info(
+            dtype_dict=type_dict, sub_dict=sub_dict, verbose=False
+        )
+        construct_call_tree(sub_dict[name], sub_dict, type_dict, nested=0)
+    return mod_dict, sub_dict, type_dict
+
+
+def test_call_tree_memo():
+    """
+    Test that call trees built with a shared memo are the same as the
+    ones built one root at a time, for two roots calling the same subroutines
+    """
+    with patch("scripts.mod_config.ELM_SRC", test_dir), patch(
+        "scripts.mod_config.SHR_SRC", test_dir
+    ):
+        from scripts.helper_functions import construct_call_tree
+
+        # call_sub calls trace_dtype_example, and both call add
+        roots = ["trace_dtype_example", "call_sub"]
+        _, sub_dict, type_dict = parse_test_subs(roots)
+
+        def call_trees():
+            return {
+                name: [tree.node for tree in sub.abstract_call_tree.traverse_preorder()]
+                for name, sub in sub_dict.items()
+                if sub.abstract_call_tree
+            }
+
+        expected = call_trees()
+        assert "add" in {call.subname for call in expected["trace_dtype_example"]}
+
+        for sub in sub_dict.values():
+            sub.abstract_call_tree = None
+        memo = {}
+        for name in roots:
+            construct_call_tree(sub_dict[name], sub_dict, type_dict, nested=0, memo=memo)
+        assert call_trees() == expected
+
+
+def test_summary_cache(tmp_path):
+    """
+    Test that read/write summaries loaded from the cache are the ones
+    computed without it, and that changing the active global variables
+    of a subroutine invalidates its summary
+    """
+    with patch("scripts.mod_config.ELM_SRC", test_dir), patch(
+        "scripts.mod_config.SHR_SRC", test_dir
+    ):
+        from scripts.dataflow import analyze_call_graph
+        from scripts.parse_cache import ParseCache
+
+        roots = ["call_sub"]
+        _, sub_dict, type_dict = parse_test_subs(roots)
+        cache = ParseCache(cache_dir=str(tmp_path))
+
+        def analyze(**kwargs):
+            for sub in sub_dict.values():
+                sub.arguments_read_write = {}
+                sub.arg_access_by_ln = {}
+                sub.elmtype_access_by_ln = {}
+                sub.args_analyzed = sub.global_analyzed = False
+            counts = analyze_call_graph(
+                [sub_dict[name] for name in roots], sub_dict, type_dict, cache=cache, **kwargs
+            )
+            summaries = {
+                name: (sub.arguments_read_write, sub.arg_access_by_ln, sub.elmtype_access_by_ln)
+                for name, sub in sub_dict.items()
+                if sub.args_analyzed
+            }
+            return counts, summaries
+
+        (num_subs, _), expected = analyze(use_cache=False)
+        assert expected["call_sub"][0]
+        assert analyze() == ((num_subs, 0), expected)
+        assert analyze() == ((0, num_subs), expected)
+
+        # add and test_parsing_sub, trace_dtype_example and call_sub that call
+        # it are re-analyzed
+        add = sub_dict["add"]
+        add.active_global_vars = {"x": add.Arguments["x"]}
+        counts, _ = analyze()
+        assert counts == (4, num_subs - 4)
+
+
+def test_parse_cache(tmp_path):
+    """
+    Test that parsing unchanged files again is served from the parse cache,
+    and that editing an included header invalidates the entries
+    """
+    with patch("scripts.mod_config.ELM_SRC", test_dir), patch(
+        "scripts.mod_config.SHR_SRC", test_dir
+    ):
+        from scripts.edit_files import (create_pass_manager, modify_file,
+                                        parse_module_head)
+        from scripts.parse_cache import ParseCache
+
+        header = tmp_path / "consts.inc"
+        header.write_text("integer, parameter :: n = 1\n")
+        fn = tmp_path / "inc_mod.F90"
+        fn.write_text(
+            "module inc_mod\n"
+            "  implicit none\n"
+            '  include "consts.inc"\n'
+            "  real :: total\n"
+            "contains\n"
+            "  subroutine inc_sub(x)\n"
+            "    real, intent(inout) :: x\n"
+            "    x = x + n\n"
+            "  end subroutine inc_sub\n"
+            "end module inc_mod\n"
+        )
+        with open(fn) as ifile:
+            lines = ifile.readlines()
+
+        cache = ParseCache(cache_dir=str(tmp_path / "parse_cache"))
+        with patch("scripts.edit_files.parse_cache", cache):
+
+            def parse():
+                fort_mod, _ = parse_module_head(str(fn), "inc_mod", 1)
+                sub_init_dict, _ = modify_file(
+                    lines, str(fn), "inc_mod", create_pass_manager(), str(tmp_path), False
+                )
+                return sorted(fort_mod.global_vars), sorted(sub_init_dict)
+
+            expected = parse()
+            assert expected == (["total"], ["inc_sub"])
+            assert (cache.hits, cache.misses) == (0, 2)
+            assert parse() == expected
+            assert (cache.hits, cache.misses) == (2, 2)
+
+            header.write_text("integer, parameter :: n = 2\n")
+            assert parse() == expected
+            assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_process_for_unit_test_jobs(tmp_path):
+    """
+    Test that modifying the module files over a process pool gives the same
+    modules, subroutines and bad_subroutines as the serial path
+    """
+    with patch("scripts.mod_config.ELM_SRC", test_dir), patch(
+        "scripts.mod_config.SHR_SRC", test_dir
+    ):
+        import scripts.dynamic_globals as dg
+        import scripts.edit_files as ef
+        from scripts.parse_cache import ParseCache
+
+        dg.populate_interface_list()
+        base_bad_subs = list(ef.bad_subroutines)
+
+        def process(jobs: int):
+            ef.bad_subroutines[:] = base_bad_subs
+            mod_dict = {}
+            sub_dict = {}
+            ordered_mods = ef.process_for_unit_test(
+                case_dir=str(tmp_path),
+                mod_dict=mod_dict,
+                mods=[],
+                required_mods=[],
+                sub_dict=sub_dict,
+                sub_name_list=["call_sub", "trace_dtype_example"],
+                overwrite=False,
+                verbose=False,
+                jobs=jobs,
+            )
+            mods = {
+                name: (sorted(mod.subroutines), mod.module_lines)
+                for name, mod in mod_dict.items()
+            }
+            subs = {
+                name: (sub.module, sub.filepath, sub.startline, sub.endline, sub.func)
+                for name, sub in sub_dict.items()
+            }
+            return ordered_mods, mods, subs, list(ef.bad_subroutines)
+
+        # Without the parse cache, so the workers parse every file
+        with patch("scripts.edit_files.parse_cache", ParseCache(enabled=False)):
+            serial = process(jobs=1)
+            with patch(
+                "scripts.edit_files.modify_files_parallel", wraps=ef.modify_files_parallel
+            ) as pool:
+                parallel = process(jobs=2)
+        ef.bad_subroutines[:] = base_bad_subs
+
+        assert pool.called
+        assert len(serial[0]) > 1 and serial[2]
+        assert parallel == serial
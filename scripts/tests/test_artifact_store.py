@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from scripts.analyze_subroutines import Subroutine
+from scripts.artifact_store import (MOD, SUB, TYPE, ArtifactStore,
+                                    MissingArtifactError)
+from scripts.DerivedType import DerivedType
+from scripts.fortran_modules import FortranModule
+
+
+def make_obj(cls, **attrs):
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attrs)
+    return obj
+
+
+def test_artifact_store_roundtrip(tmp_path):
+    mod = make_obj(FortranModule, name="mod_a", filepath="mod_a.F90")
+    dtype = make_obj(DerivedType, type_name="type_a", declaration="mod_a", instances={})
+    parent = make_obj(Subroutine, name="parent", module="mod_a", dtype=dtype)
+    child = make_obj(Subroutine, name="child", module="mod_a", parent=parent)
+    parent.child_subroutines = {"child": child}
+
+    store = ArtifactStore("test", store_dir=str(tmp_path))
+    store.put_objects({"mod_a": mod}, {"parent": parent, "child": child}, {"type_a": dtype})
+    # A second run for the same commit replaces/merges records
+    other = make_obj(Subroutine, name="other", module="mod_b")
+    store.put_objects({}, {"other": other, "child": child}, {})
+    store.close()
+
+    store = ArtifactStore("test", store_dir=str(tmp_path))
+    assert sorted(store.index(SUB)) == [("child", "mod_a"), ("other", "mod_b"), ("parent", "mod_a")]
+
+    sub = store.get(SUB, "parent")
+    assert sub.child_subroutines["child"].parent is sub
+    assert sub.dtype is store.get(TYPE, "type_a")
+    assert store.get(SUB, "missing") is None
+
+    mods = store.load_all(MOD)
+    assert mods["mod_a"].filepath.endswith("mod_a.F90")
+    assert len(store.load_all(SUB)) == 3
+    store.close()
+
+
+def test_artifact_store_reachable_objects(tmp_path):
+    """
+    Objects only referenced from the stored dicts get their own record
+    """
+    dtype = make_obj(DerivedType, type_name="type_b", declaration="mod_b", instances={})
+    callee = make_obj(Subroutine, name="callee", module="mod_b", dtype=dtype)
+    caller = make_obj(Subroutine, name="caller", module="mod_a", child_subroutines={"callee": callee})
+
+    store = ArtifactStore("test", store_dir=str(tmp_path))
+    store.put_objects({}, {"caller": caller}, {})
+    store.close()
+
+    store = ArtifactStore("test", store_dir=str(tmp_path))
+    assert sorted(store.names(SUB)) == ["callee", "caller"]
+    sub = store.get(SUB, "caller")
+    assert sub.child_subroutines["callee"].dtype is store.get(TYPE, "type_b")
+
+    # A record removed behind the store's back is reported, not fatal
+    with sqlite3.connect(store.path) as conn:
+        conn.execute("DELETE FROM objects WHERE name='callee'")
+    store = ArtifactStore("test", store_dir=str(tmp_path))
+    with pytest.raises(MissingArtifactError):
+        store.get(SUB, "caller")
+    store.close()
@@ -0,0 +1,30 @@
+from scripts.analyze_subroutines import Subroutine
+from scripts.dataflow import call_graph_sccs
+
+
+def make_sub(name, library=False):
+    sub = Subroutine.__new__(Subroutine)
+    sub.__dict__.update(name=name, library=library, child_subroutines={})
+    return sub
+
+
+def test_call_graph_sccs():
+    subs = {name: make_sub(name) for name in ("main", "a", "b", "c", "leaf")}
+    subs["lib"] = make_sub("lib", library=True)
+    calls = {
+        "main": ["a", "leaf", "lib"],
+        "a": ["b"],
+        "b": ["c", "a"],  # a <-> b are mutually recursive
+        "c": ["c", "leaf"],  # c calls itself
+    }
+    for parent, children in calls.items():
+        subs[parent].child_subroutines = {child: subs[child] for child in children}
+
+    sccs = [sorted(sub.name for sub in scc) for scc in call_graph_sccs([subs["main"], subs["c"]])]
+    assert sorted(map(tuple, sccs)) == [("a", "b"), ("c",), ("leaf",), ("main",)]
+    # Callees come before their callers
+    position = {name: i for i, scc in enumerate(sccs) for name in scc}
+    for parent, children in calls.items():
+        for child in children:
+            if child in position and position[child] != position[parent]:
+                assert position[child] < position[parent]
@@ -0,0 +1,38 @@
+import subprocess as sp
+
+from scripts.gitutils import changed_modules
+from scripts.source_index import SourceIndex
+
+
+def git(repo, *args):
+    sp.run(
+        ["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@test", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_changed_modules_includes(tmp_path):
+    """
+    Test that changing a header marks the modules including it (directly
+    or through another header) as changed
+    """
+    (tmp_path / "mod_a.F90").write_text(
+        'module mod_a\n#include "consts.inc"\nend module mod_a\n'
+    )
+    (tmp_path / "mod_b.F90").write_text(
+        "module mod_b\n  include 'wrapper.inc'\nend module mod_b\n"
+    )
+    (tmp_path / "mod_c.F90").write_text("module mod_c\nend module mod_c\n")
+    (tmp_path / "wrapper.inc").write_text('#include "consts.inc"\n')
+    (tmp_path / "consts.inc").write_text("integer, parameter :: n = 1\n")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "old")
+
+    (tmp_path / "consts.inc").write_text("integer, parameter :: n = 2\n")
+    git(tmp_path, "commit", "-q", "-am", "new")
+
+    index = SourceIndex([str(tmp_path)])
+    index.refresh()
+    assert changed_modules("HEAD~1", "HEAD", str(tmp_path), index) == {"mod_a", "mod_b"}
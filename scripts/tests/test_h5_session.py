@@ -0,0 +1,60 @@
+import shutil
+import subprocess as sp
+
+import numpy as np
+import pytest
+
+from scripts.mod_config import spel_dir
+
+h5py = pytest.importorskip("h5py")
+
+source_dir = f"{spel_dir}SourceFiles"
+
+
+def build_driver(build_dir) -> str:
+    """
+    Compiles SourceFiles/tests/TestH5Session.F90 against the session API
+    (H5InterfaceMod.F90, hdf5_wrapper.c) in build_dir
+    """
+    exe = str(build_dir / "test_h5_session")
+    cmds = [
+        ["h5cc", "-c", f"{source_dir}/hdf5_wrapper.c", "-o", "hdf5_wrapper.o"],
+        ["h5fc", "-c", f"{source_dir}/H5InterfaceMod.F90", f"{source_dir}/tests/TestH5Session.F90"],
+        ["h5fc", "-o", exe, "hdf5_wrapper.o", "H5InterfaceMod.o", "TestH5Session.o"],
+    ]
+    for cmd in cmds:
+        sp.run(cmd, cwd=build_dir, check=True, capture_output=True)
+    return exe
+
+
+@pytest.mark.skipif(
+    shutil.which("h5fc") is None or shutil.which("h5cc") is None,
+    reason="requires the HDF5 compiler wrappers",
+)
+def test_h5_session_round_trip(tmp_path):
+    exe = build_driver(tmp_path)
+    fn = tmp_path / "session.h5"
+    result = sp.run([exe, str(fn), "40"], capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    # Layout of the file: groups per instance, arrays in Fortran order with
+    # their lower bounds, chunks and filters of the session
+    with h5py.File(fn, "r") as f:
+        assert set(f) == {"nsets", "dtime", "case_name", "col_pp", "col_ws"}
+        assert f["nsets"][()] == 4
+        assert f["case_name"][()].decode().strip() == "fates_test"
+
+        h2osoi = f["col_ws/h2osoi"]
+        cols = np.arange(3, 43)
+        levs = np.arange(-4, 11)
+        assert h2osoi.shape == (15, 40)
+        np.testing.assert_array_equal(h2osoi[()], cols[None, :] + 0.01 * levs[:, None])
+        assert list(h2osoi.attrs["lbounds"]) == [3, -4]
+        assert h2osoi.chunks == (15, 16)
+        assert h2osoi.compression == "gzip" and h2osoi.compression_opts == 4
+        assert h2osoi.shuffle
+
+        # Filters are set per session: the appended copy is contiguous
+        assert f["col_ws/h2osoi_copy"].chunks is None
+        np.testing.assert_array_equal(f["col_ws/h2osoi_copy"][()], h2osoi[()])
+        assert list(f["col_pp/active"][()]) == [int(c % 3 != 0) for c in cols]
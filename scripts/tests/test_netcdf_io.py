@@ -0,0 +1,151 @@
+from scripts.aggregate import state_field_sets
+from scripts.analyze_subroutines import Subroutine
+from scripts.DerivedType import DerivedType
+from scripts.helper_functions import make_call_tree
+from scripts.io.netcdf_io import (NcStorage, StateFields,
+                                  generate_elmtypes_io_netcdf,
+                                  get_storage_args, split_state_vars)
+from scripts.types import CallTuple
+from scripts.utilityFunctions import Variable
+
+
+def make_var(name, type="real", dim=1, bounds="begc:endc"):
+    return Variable(
+        type=type, name=name, subgrid="?", ln=-1, dim=dim, bounds=bounds if dim else "", active=True
+    )
+
+
+def make_sub(name, access, unit_test_function=False):
+    sub = Subroutine.__new__(Subroutine)
+    sub.__dict__.update(
+        name=name,
+        elmtype_access_sum=access,
+        unit_test_function=unit_test_function,
+        abstract_call_tree=None,
+    )
+    return sub
+
+
+def test_state_field_sets():
+    sub_dict = {
+        "root": make_sub("root", {"col_pp%snl": "r", "bounds": "r"}, unit_test_function=True),
+        "child": make_sub("child", {"col_ws(c)%h2osoi": "rw", "col_es%t_soisno": "w"}),
+        "not_called": make_sub("not_called", {"col_pp%dz": "w"}),
+    }
+    sub_dict["root"].abstract_call_tree = make_call_tree(
+        [CallTuple(0, "root"), CallTuple(1, "child")]
+    )
+    fields = state_field_sets(sub_dict)
+    assert fields.inputs == {"col_pp%snl", "col_ws%h2osoi"}
+    assert fields.outputs == {"col_ws%h2osoi", "col_es%t_soisno"}
+
+
+def test_split_state_vars():
+    dtype_vars = {
+        name: make_var(name)
+        for name in ("col_pp%snl", "col_ws%h2osoi", "col_es%t_soisno", "col_pp%gridcell")
+    }
+    dtype_vars["col_ef%active"] = make_var("col_ef%active", type="logical")
+    fields = StateFields(
+        inputs={"col_pp%snl", "col_ws%h2osoi"},
+        outputs={"col_ws%h2osoi", "col_es%t_soisno", "col_pp%gridcell", "col_ef%active"},
+    )
+    input_vars, alloc_only, verify_vars = split_state_vars(dtype_vars, fields)
+    # Written before being read: only allocated. Logical and gridcell index arrays are read.
+    assert set(alloc_only) == {"col_es%t_soisno"}
+    assert set(input_vars) == set(dtype_vars) - {"col_es%t_soisno"}
+    assert set(verify_vars) == fields.outputs
+
+    assert split_state_vars(dtype_vars) == (dtype_vars, {}, dtype_vars)
+
+
+def test_get_storage_args():
+    var = make_var("col_ws%h2osoi", dim=2, bounds="begc:endc,1:nlevgrnd")
+    assert get_storage_args(var, None) == ""
+    storage = NcStorage(chunks={"column": 64}, deflate=4, shuffle=True)
+    assert get_storage_args(var, storage) == (
+        ", chunks=[64,size(col_ws%h2osoi,2)], deflate_level=4, shuffle=.true."
+    )
+
+
+def make_dtype(type_name, inst_name, components):
+    dtype = DerivedType(type_name, "elm_types", fpath="elm_types.F90")
+    dtype.components = components
+    dtype.instances = {
+        inst_name: Variable(
+            type=type_name,
+            name=inst_name,
+            subgrid="?",
+            ln=-1,
+            dim=0,
+            declaration="elm_types",
+            active=True,
+        )
+    }
+    return dtype
+
+
+def generate_read_write_mod(tmp_path, **kwargs) -> dict[str, list[str]]:
+    """
+    Generates ReadWriteMod for col_pp (snl read, dz only written) and
+    grc_pp, and returns the lines of each subroutine
+    """
+    col_pp = make_dtype(
+        "column_physical_properties",
+        "col_pp",
+        {
+            "snl": make_var("snl", type="integer"),
+            "dz": make_var("dz"),
+            "gridcell": make_var("gridcell", type="integer"),
+        },
+    )
+    grc_pp = make_dtype(
+        "gridcell_physical_properties", "grc_pp", {"area": make_var("area", bounds="begg:endg")}
+    )
+    generate_elmtypes_io_netcdf(
+        {dtype.type_name: dtype for dtype in (col_pp, grc_pp)},
+        {"col_pp": col_pp.type_name, "grc_pp": grc_pp.type_name},
+        str(tmp_path),
+        **kwargs,
+    )
+    subs: dict[str, list[str]] = {}
+    with open(tmp_path / "ReadWriteMod.F90") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("subroutine "):
+                name = line.split()[1].split("(")[0]
+                subs[name] = []
+            elif subs and not line.startswith("end subroutine"):
+                subs[list(subs)[-1]].append(line)
+    return subs
+
+
+def test_generate_elmtypes_io(tmp_path):
+    """
+    Every field is read and written unless the fields are split
+    """
+    subs = generate_read_write_mod(tmp_path)
+    write = subs["write_elmtypes"]
+    assert "call define_vars(ncid,bounds)" in write
+    assert "call nc_write_var_array(ncid, col_pp%snl, 'col_pp__snl')" in write
+    assert "call nc_write_var_array(ncid, col_pp%dz, 'col_pp__dz')" in write
+    assert "call nc_read_var(ncid,'col_pp__dz', 1, col_pp%dz)" in subs["read_elmtypes"]
+    assert "define_verify_vars" not in subs
+
+    fields = StateFields(inputs={"col_pp%snl", "grc_pp%area"}, outputs={"col_pp%dz"})
+    subs = generate_read_write_mod(tmp_path, fields=fields)
+    write = subs["write_elmtypes"]
+    assert "call define_verify_vars(ncid,bounds)" in write
+    assert "call nc_write_var_array(ncid, col_pp%dz, 'col_pp__dz')" in write
+    assert not any("col_pp%snl" in line for line in write)
+    read = subs["read_elmtypes"]
+    assert "col_pp%dz = fill_double" in read
+    assert not any("nc_read_var(ncid,'col_pp__dz'" in line for line in read)
+    assert "call nc_write_var_array(ncid, col_pp%snl, 'col_pp__snl')" in subs[
+        "write_elmtypes_inputs"
+    ]
+
+    subs = generate_read_write_mod(tmp_path, parallel=True)
+    read = subs["read_elmtypes"]
+    assert "ncid = nc_create_or_open_file_par(trim(fn), open_file, comm)" in read
+    assert "call nc_read_var(ncid,'col_pp__dz', 1, col_pp%dz, lb1=bounds%begc)" in read
@@ -0,0 +1,43 @@
+import re
+
+from scripts.logging_configs import get_logger
+from scripts.types import PassManager, compile_pass_engine
+
+
+def test_combined_engine_matches_sequential():
+    patterns = [
+        (re.compile(r"^\s*(subroutine)\s+", re.IGNORECASE), None),
+        (re.compile(r"\s*(end\s*function)\b", re.IGNORECASE), "function"),
+        (re.compile(r"\bfunction\s+\w+\s*\(", re.IGNORECASE), "function"),
+        (re.compile(r"^\s*(call)\s+foo|bar\b"), None),
+        (re.compile(r"\s*(call)[\s]+(endrun|foo)\b", re.IGNORECASE), "call"),
+        (re.compile(r"^(#include)\s+[\"\'](shr_assert.h)[\'\"]"), None),
+    ]
+    lines = [
+        "subroutine foo(a)",
+        "   END FUNCTION foo",
+        "real function f(x) result(y)",
+        "call endrun(msg=errmsg(__FILE__, __LINE__))",
+        "   x = bar",
+        "call foo(a)",
+        '#include "shr_assert.h"',
+        "x = y + z",
+        "  ! subroutine in a comment",
+    ]
+    sequential = PassManager(logger=get_logger("PassManager"), combined=False)
+    combined = PassManager(logger=get_logger("PassManager"))
+    for i, (pattern, keyword) in enumerate(patterns):
+        sequential.add_pass(pattern=pattern, fn=lambda state, logger: None, name=f"pass{i}")
+        combined.add_pass(pattern=pattern, fn=lambda state, logger: None, name=f"pass{i}", keyword=keyword)
+
+    assert combined.get_engine() is not None
+    for line in lines:
+        expected = sequential.match(line)
+        actual = combined.match(line)
+        assert (actual and actual.name) == (expected and expected.name), line
+
+
+def test_engine_searches_unmergeable_patterns():
+    engine = compile_pass_engine(((r"^\s*(\w+)\s+\1", 0, None), (r"^\s*call\b", re.IGNORECASE, None)))
+    assert engine.searched == (0,)
+    assert engine.first_anchored("CALL foo") == 1
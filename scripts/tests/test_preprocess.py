@@ -0,0 +1,76 @@
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from scripts.parse_cache import hash_includes
+from scripts.preprocess import (get_cpp_lines, preprocess_files, run_cpp,
+                                 split_cpp_output)
+
+
+def test_split_cpp_output():
+    output = (
+        '# 1 "a.F90"\n# 1 "<built-in>"\n# 1 "<command-line>"\n# 1 "a.F90"\nmodule a\n'
+        '# 1 "b.F90"\n# 1 "<built-in>"\n# 1 "<command-line>"\n# 1 "b.F90"\nmodule b\n'
+    )
+    outputs = split_cpp_output(output, ["a.F90", "b.F90"])
+    assert outputs
+    assert outputs["a.F90"].endswith("module a\n")
+    assert outputs["b.F90"].startswith('# 1 "b.F90"\n')
+    assert outputs["b.F90"].endswith("module b\n")
+
+    # Missing translation unit can't be split
+    assert split_cpp_output(output, ["a.F90", "c.F90"]) is None
+
+
+@pytest.mark.skipif(shutil.which("gfortran") is None, reason="requires gfortran")
+def test_batched_cpp_matches_single(tmp_path):
+    fpaths = []
+    for name, macro in [("x", "FOO"), ("y", "BAR")]:
+        fn = tmp_path / f"{name}.F90"
+        fn.write_text(
+            f"module {name}\n#ifdef {macro}\ninteger :: i\n#else\nreal :: r\n#endif\nend module {name}\n"
+        )
+        fpaths.append(str(fn))
+
+    batched = run_cpp(fpaths, ["FOO"])
+    for fn in fpaths:
+        assert batched[fn] == run_cpp([fn], ["FOO"])[fn]
+    assert "integer :: i" in batched[fpaths[0]]
+    assert "real :: r" in batched[fpaths[1]]
+
+
+@pytest.mark.skipif(shutil.which("gfortran") is None, reason="requires gfortran")
+def test_failed_cpp_not_cached(tmp_path):
+    """
+    Test that files gfortran fails on leave no entry in the CPP output store
+    """
+    good = tmp_path / "good.F90"
+    good.write_text("module good\n#ifdef FOO\ninteger :: i\n#endif\nend module good\n")
+    bad = tmp_path / "bad.F90"
+    bad.write_text('module bad\n#ifdef FOO\n#include "missing.h"\n#endif\nend module bad\n')
+
+    cache_dir = tmp_path / "cpp_cache"
+    with patch("scripts.preprocess.cpp_cache_dir", f"{cache_dir}/"):
+        preprocess_files([str(good), str(bad)], ["FOO"])
+        cached = os.listdir(cache_dir)
+        assert len(cached) == 1 and cached[0].startswith("good.F90-")
+
+        with pytest.raises(SystemExit):
+            get_cpp_lines(str(bad), ["FOO"])
+        assert os.listdir(cache_dir) == cached
+
+
+def test_hash_includes_follows_headers(tmp_path):
+    (tmp_path / "inner.inc").write_text("integer :: j\n")
+    (tmp_path / "outer.h").write_text('#include "inner.inc"\n')
+    fn = tmp_path / "x.F90"
+    lines = ["module x\n", '#include "outer.h"\n', "end module x\n"]
+    fn.write_text("".join(lines))
+
+    before = hash_includes(str(fn), lines)
+    assert before == hash_includes(str(fn), lines)
+    # Editing a nested header changes the key of the including file
+    (tmp_path / "inner.inc").write_text("integer :: k\n")
+    assert hash_includes(str(fn), lines) != before
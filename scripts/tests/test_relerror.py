@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+xarray = pytest.importorskip("xarray")
+
+from scripts.relerror import find_diffs, iter_slabs
+
+
+def test_iter_slabs_covers_array():
+    shape = (3, 7, 5)
+    seen = np.zeros(shape, dtype=int)
+    for slab in iter_slabs(shape, chunk_size=12):
+        assert seen[slab].size <= 12
+        seen[slab] += 1
+    assert (seen == 1).all()
+
+
+def test_find_diffs_streaming(tmp_path):
+    ref = np.arange(2 * 6 * 5, dtype=np.float64).reshape(2, 6, 5)
+    test = ref.copy()
+    test[0, 1, 2] += 1.0
+    test[1, 5, 4] += 2.0
+    dims = ("time", "lev", "grid")
+    xarray.Dataset({"var1": (dims, ref)}).to_netcdf(tmp_path / "ref.nc")
+    xarray.Dataset({"var1": (dims, test)}).to_netcdf(tmp_path / "test.nc")
+
+    outputs = []
+    for chunk_size in (4, 2**22):
+        ofn = tmp_path / f"diff-{chunk_size}.txt"
+        find_diffs(
+            str(tmp_path / "ref.nc"),
+            str(tmp_path / "test.nc"),
+            var="var1",
+            ostream=open(ofn, "w"),
+            chunk_size=chunk_size,
+        )
+        outputs.append(ofn.read_text())
+
+    assert outputs[0] == outputs[1]
+    assert "(1, 2, 3)" in outputs[0]
+    assert "(2, 6, 5)" in outputs[0]
+    assert "#2" in outputs[0]
+
+
+def test_find_diffs_parallel(tmp_path):
+    rng = np.random.default_rng(0)
+    ref_vars, test_vars = {}, {}
+    for n in range(6):
+        ref = rng.random((3, 4))
+        test = ref.copy()
+        test[n % 3, n % 4] += 1.0
+        ref_vars[f"var{n}"] = (("lev", "grid"), ref)
+        test_vars[f"var{n}"] = (("lev", "grid"), test)
+    xarray.Dataset(ref_vars).to_netcdf(tmp_path / "ref.nc")
+    xarray.Dataset(test_vars).to_netcdf(tmp_path / "test.nc")
+
+    outputs = []
+    for jobs in (1, 2):
+        ofn = tmp_path / f"diff-{jobs}.txt"
+        find_diffs(
+            str(tmp_path / "ref.nc"),
+            str(tmp_path / "test.nc"),
+            ostream=open(ofn, "w"),
+            jobs=jobs,
+        )
+        outputs.append(ofn.read_text())
+
+    assert outputs[0] == outputs[1]
+    assert outputs[0].count("Summary") == 6
+
+
+def test_find_diffs_verification_subset(tmp_path):
+    # The reference holds the full state, the unit test only its outputs
+    ref = np.arange(12, dtype=np.float64).reshape(3, 4)
+    dims = ("lev", "grid")
+    xarray.Dataset(
+        {"input_only": (dims, ref), "output": (dims, ref), "flag": (dims, ref > 5)}
+    ).to_netcdf(tmp_path / "ref.nc")
+    test = ref.copy()
+    test[2, 3] += 1.0
+    xarray.Dataset({"output": (dims, test)}).to_netcdf(tmp_path / "test.nc")
+
+    for jobs in (1, 2):
+        ofn = tmp_path / f"diff-{jobs}.txt"
+        find_diffs(
+            str(tmp_path / "ref.nc"),
+            str(tmp_path / "test.nc"),
+            ostream=open(ofn, "w"),
+            jobs=jobs,
+        )
+        output = ofn.read_text()
+        assert "output" in output
+        assert "input_only" not in output
+        assert output.count("Summary") == 1
+
+
+def test_find_diffs_rank_slab(tmp_path):
+    # A rank's results hold columns 4:6 of the whole-domain reference
+    ref = np.arange(2 * 6, dtype=np.float64).reshape(2, 6)
+    dims = ("lev", "column")
+    bounds = {"lbounds": np.array([1, 1]), "ubounds": np.array([6, 2])}
+    xarray.Dataset(
+        {"var1": (dims, ref, bounds), "scalar": ((), 1.0)}
+    ).to_netcdf(tmp_path / "ref.nc")
+    test = ref[:, 3:].copy()
+    test[1, 2] += 1.0
+    bounds = {"lbounds": np.array([4, 1]), "ubounds": np.array([6, 2])}
+    xarray.Dataset(
+        {"var1": (dims, test, bounds), "scalar": ((), 1.0)}
+    ).to_netcdf(tmp_path / "test-0.nc")
+
+    ofn = tmp_path / "diff.txt"
+    find_diffs(str(tmp_path / "ref.nc"), str(tmp_path / "test-0.nc"), ostream=open(ofn, "w"))
+    output = ofn.read_text()
+    assert output.count("Summary") == 1
+    # Coordinates are the ones of the reference
+    assert "(2, 6)" in output
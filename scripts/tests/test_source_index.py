@@ -0,0 +1,65 @@
+import os
+
+from scripts.source_index import SourceIndex
+
+test_dir = os.path.dirname(__file__) + "/"
+
+
+def test_source_index(tmp_path):
+    """
+    Test that the index records the same info the grep commands returned
+    and that an unchanged tree is reused from the on-disk cache
+    """
+    cache_file = str(tmp_path / "source_index.pkl")
+    src_index = SourceIndex([test_dir], cache_file=cache_file)
+    src_index.load()
+    src_index.refresh()
+
+    fn = f"{test_dir}example_functions.F90"
+    assert src_index.module_of_file(fn) == (1, "test_sub_parse")
+    assert src_index.file_of_module("test_sub_parse") == fn
+    assert src_index.file_of_module("shr_const_mod") == f"{test_dir}shr_const_mod.F90"
+
+    proc = src_index.find_subroutine("test_parsing_sub")
+    assert proc and (proc.fpath, proc.start_ln, proc.end_ln) == (fn, 156, 176)
+    proc = src_index.find_function("weight_constructor")
+    assert proc and (proc.start_ln, proc.end_ln) == (300, 317)
+    proc = src_index.find_function("get_beg", fpath=fn)
+    assert proc and (proc.start_ln, proc.end_ln) == (348, 388)
+
+    assert "tridiagonal" in src_index.interface_names()
+    iface = src_index.find_interface("Tridiagonal")
+    assert iface and iface.ln == 92
+    assert iface.procedures == ("tridiagonal_sr", "tridiagonal_mr")
+    # Interface procedures are still subroutines
+    assert src_index.find_subroutine("tridiagonal_sr")
+
+    decls = src_index.type_instance_decls("test_type")
+    assert [(d.fpath, d.ln) for d in decls] == [(fn, 88)]
+    assert src_index.module_head_end(fn) == 97
+
+    # Second index should be loaded from disk without re-scanning any file
+    cached = SourceIndex([test_dir], cache_file=cache_file)
+    cached.load()
+    cached.refresh()
+    assert cached.num_scanned == 0
+    assert cached.find_subroutine("test_parsing_sub") == src_index.find_subroutine(
+        "test_parsing_sub"
+    )
+
+
+def test_source_index_outside_file(tmp_path):
+    """
+    Test that a file outside the indexed roots is re-scanned once edited
+    """
+    src_index = SourceIndex([test_dir])
+    src_index.refresh()
+
+    fpath = tmp_path / "outside_mod.F90"
+    fpath.write_text("module outside_mod\nend module outside_mod\n")
+    assert src_index.module_of_file(str(fpath)) == (1, "outside_mod")
+
+    fpath.write_text("\nmodule renamed_mod\nend module renamed_mod\n")
+    st = os.stat(fpath)
+    os.utime(fpath, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert src_index.module_of_file(str(fpath)) == (2, "renamed_mod")
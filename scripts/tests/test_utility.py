@@ -2,7 +2,9 @@ import re
 import textwrap
 
 from scripts.edit_files import apply_comments
-from scripts.types import LineTuple, LogicalLineIterator
+from scripts.logging_configs import get_logger
+from scripts.types import LineTuple, LogicalLineIterator, LogicalLineTable
+from scripts.utilityFunctions import line_unwrapper, unwrap_section
 
 
 def test_line_iterator():
@@ -26,14 +28,61 @@ def test_line_iterator():
     ]
 
     regex_sub = re.compile(r"^\s*(subroutine)\s+")
-    it = LogicalLineIterator(test_lines)
+    it = LogicalLineIterator(test_lines, logger=get_logger("LineIter"))
     for unwrap, new_ln in it:
         start = new_ln
         if regex_sub.search(unwrap):
-            _, _ = it.consume_until(re.compile(r"^(end\s+subroutine)"))
+            _, _ = it.consume_until(re.compile(r"^(end\s+subroutine)"), start_pattern=None)
             it.comment_cont_block(start)
 
     print(test_lines)
+    assert [lt.commented for lt in test_lines] == [False] + [True] * 10
     test_lines = apply_comments(test_lines)
     for l in test_lines:
         print(l.line)
+
+
+def test_logical_line_table():
+    lines = [
+        "call foo(a, & ! comment\n",
+        "  ! only a comment\n",
+        "\n",
+        "   & B, 'x!y', &\n",
+        "c) ; x = 1\n",
+        "write(*,*) 'It''s ! not a comment' ! comment\n",
+    ]
+    table = LogicalLineTable(lines)
+    assert table.text == [
+        "call foo(a, b, 'x!y', c) ; x = 1",
+        "write(*,*) 'it''s ! not a comment'",
+    ]
+    assert table.starts == [0, 5]
+    assert table.ends == [4, 5]
+    assert line_unwrapper(lines, 0) == (table.text[0], 4)
+
+    it = LogicalLineIterator([LineTuple(line=line, ln=i) for i, line in enumerate(lines)], None)
+    assert list(it) == [(table.text[0], 4), (table.text[1], 5)]
+
+    assert [(lt.line, lt.ln) for lt in unwrap_section(lines, startln=10)] == [
+        ("call foo(a, b, 'x!y', c)", 10),
+        ("x = 1", 10),
+        ("write(*,*) 'it''s ! not a comment'", 15),
+    ]
+
+
+def test_var_matcher():
+    from scripts.helper_functions import VarMatcher
+
+    lines = [
+        "t_soisno(c,j) = T_SOISNO(c,j-1) + tsoi_old(c) * dtime",
+        "if (col_es%t_soisno(c) > tfrz) h2osoi_liq2 = h2osoi_liq",
+        "call sub(bounds, num_soilc, filter_soilc, 1.e-3_r8)",
+        "write(iulog,*) 'h2osoi_liq =', h2osoi_liq",
+    ]
+    for names in (["t_soisno", "h2osoi_liq", "tfrz", "r8", "e"], ["col_es%t_soisno", "c"]):
+        regex = re.compile(r"\b({})\b".format("|".join(names)), re.IGNORECASE)
+        var_matcher = VarMatcher(names)
+        for line in lines:
+            assert var_matcher.findall(line) == regex.findall(line)
+            match = regex.search(line)
+            assert var_matcher.search(line) == (match.group(1) if match else None)
@@ -4,6 +4,7 @@ import logging
 import re
 from dataclasses import asdict, dataclass
 from enum import Enum, auto
+from functools import lru_cache
 from logging import Logger
 from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional
 
@@ -270,6 +271,23 @@ class PreProcTuple(NamedTuple):
     cpp_ln: Optional[int]
 
 
+class ModifiedFile(NamedTuple):
+    """
+    Cached outputs of edit_files.modify_file for a single file
+        sub_init_dict: dict[str, SubInit]
+        parsed_lines: list[str]
+        commented: list[bool] (comment mask of the original lines)
+        cpp_file: bool
+        new_bad_subs: list[str] (names appended to bad_subroutines)
+    """
+
+    sub_init_dict: dict[str, SubInit]
+    parsed_lines: list[str]
+    commented: list[bool]
+    cpp_file: bool
+    new_bad_subs: list[str]
+
+
 @dataclass
 class ModUsage:
     all: bool
@@ -387,12 +405,98 @@ class CallTree:
             child.print_tree(level + 1)
 
 
+_regex_quote_or_comment = re.compile(r"[!'\"]")
+
+
+def strip_comment(line: str) -> str:
+    """
+    Removes a trailing comment from line, ignoring `!` inside string literals
+    """
+    if "!" not in line:
+        return line
+    in_string = None  # None, "'", or '"'
+    for m in _regex_quote_or_comment.finditer(line):
+        c = m.group()
+        if c == "!":
+            if in_string is None:
+                return line[: m.start()]
+        elif in_string is None:
+            in_string = c
+        elif in_string == c:
+            # an escaped quote closes and reopens the string
+            in_string = None
+    return line
+
+
+def join_continuation(code: Callable[[int], str], start: int, num_lines: int) -> tuple[str, int]:
+    """
+    Joins the line continuations of the logical line beginning at `start`.
+    code(i) returns physical line i stripped of comments and whitespace.
+    Blank/comment-only lines inside a continuation are skipped.
+    Returns the (un-lowered) logical line and the index of its last physical line.
+    """
+    line = code(start)
+    end = start
+    parts = []
+    while line.endswith("&"):
+        parts.append(line[:-1])
+        line = ""
+        while not line and end + 1 < num_lines:
+            end += 1
+            line = code(end)
+            if line.startswith("&"):
+                line = line[1:].lstrip()
+    parts.append(line)
+    return "".join(parts), end
+
+
+class LogicalLineTable:
+    """
+    Logical lines of a file (continuations joined, comments removed, lowercased).
+    Built once and indexed by LogicalLineIterator and unwrap_section.
+
+    starts[k], ends[k]: first and last physical line of logical line k
+    text[k]: logical line k
+    """
+
+    def __init__(self, lines: list[str]):
+        self.code: list[str] = [strip_comment(line).strip() for line in lines]
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.text: list[str] = []
+        self._index: dict[int, int] = {}
+
+        num_lines = len(self.code)
+        i = 0
+        while i < num_lines:
+            full_line, end = join_continuation(self.code.__getitem__, i, num_lines)
+            self._index[i] = len(self.starts)
+            self.starts.append(i)
+            self.ends.append(end)
+            self.text.append(full_line.lower())
+            i = end + 1
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line_at(self, i: int) -> tuple[str, int]:
+        """
+        Returns the logical line starting at physical line i and its last physical line
+        """
+        k = self._index.get(i)
+        if k is not None:
+            return self.text[k], self.ends[k]
+        full_line, end = join_continuation(self.code.__getitem__, i, len(self.code))
+        return full_line.lower(), end
+
+
 class LogicalLineIterator:
     def __init__(self, lines: list[LineTuple], logger: Logger):
         self.lines = lines
         self.i = 0
         self.start_index = 0
         self.logger: Logger = get_logger("LineIter", level=logging.DEBUG)
+        self.table = LogicalLineTable([lt.line for lt in lines])
 
     def __iter__(self):
         return self
@@ -401,52 +505,13 @@ class LogicalLineIterator:
         self.i = 0
         self.start_index = 0
 
-    def strip_comment(self) -> str:
-        in_string = None  # None, "'", or '"'
-        line = self.lines[self.i].line
-        result = []
-        i = 0
-        while i < len(line):
-            c = line[i]
-            if c in ('"', "'"):
-                if in_string is None:
-                    in_string = c
-                elif in_string == c:
-                    # handle escaped quote inside string
-                    if i + 1 < len(line) and line[i + 1] == c:
-                        result.append(c)  # add one quote, skip next
-                        i += 1
-                    else:
-                        in_string = None  # close string
-                result.append(c)
-            elif c == "!" and in_string is None:
-                break  # comment starts here
-            else:
-                result.append(c)
-            i += 1
-        return "".join(result)
-
     def __next__(self):
         if self.i >= len(self.lines):
             raise StopIteration
         self.start_index = self.i
 
-        full_line = self.strip_comment()
-        full_line = full_line.rstrip("\n").strip()
-        while full_line.rstrip().endswith("&"):
-            full_line = full_line.rstrip()[:-1].strip()
-            self.i += 1
-            if self.i >= len(self.lines):
-                self.logger.error("Error-- line incomplete!")
-                raise StopIteration
-            new_line = self.lines[self.i].line.split("!")[0].strip()
-            # test if line is just a comment
-            if not new_line:
-                full_line += " &"  # re append & so loop goes to next line
-            else:
-                full_line += new_line.rstrip("\n").strip()
-
-        result = (full_line.lower(), self.i)
+        full_line, self.i = self.table.line_at(self.i)
+        result = (full_line, self.i)
         self.i += 1
         return result
 
@@ -505,27 +570,69 @@ class Pass:
     pattern: re.Pattern
     fn: Callable[[ParseState, logging.Logger], None]
     name: Optional[str] = None
+    keyword: Optional[str] = None  # lowercase literal in every line the pattern matches
 
 
 class PassManager:
     """
     Class for managing regex passes to modify_file
+
+    Patterns anchored at the start of the line are merged into a PassEngine
+    so they cost a single match per line. The remaining patterns are searched
+    in order, skipping those whose declared keyword isn't in the line and
+    stopping at the first anchored pass that matched, which keeps
+    "first pass added wins" semantics.
     """
 
-    def __init__(self, logger):
+    def __init__(self, logger, combined: bool = True):
         self.passes: list[Pass] = []
         self.logger: Logger = logger
+        self.combined: bool = combined  # False tests each pass in turn
+        self._engine: Optional[PassEngine] = None
 
     def add_pass(
         self,
         pattern: re.Pattern,
         fn: Callable[[ParseState, Logger], None],
         name: Optional[str] = None,
+        keyword: Optional[str] = None,
     ):
-        self.passes.append(Pass(pattern, fn, name))
+        self.passes.append(Pass(pattern, fn, name, keyword))
+        self._engine = None
 
     def remove_pass(self, name: str):
         self.passes = [p for p in self.passes if p.name != name]
+        self._engine = None
+
+    def get_engine(self) -> Optional[PassEngine]:
+        if not self.combined:
+            return None
+        if self._engine is None and self.passes:
+            patterns = tuple((p.pattern.pattern, p.pattern.flags, p.keyword) for p in self.passes)
+            self._engine = compile_pass_engine(patterns)
+        return self._engine
+
+    def match(self, line: str) -> Optional[Pass]:
+        """
+        Returns the first pass whose pattern matches line
+        """
+        engine = self.get_engine()
+        if engine is None:
+            for p in self.passes:
+                if p.pattern.search(line):
+                    return p
+            return None
+
+        index = engine.first_anchored(line)
+        lowered = line.lower()
+        for i, required in zip(engine.searched, engine.required):
+            if index is not None and i > index:
+                break
+            if required and required not in lowered:
+                continue
+            if self.passes[i].pattern.search(line):
+                return self.passes[i]
+        return self.passes[index] if index is not None else None
 
     def run(self, state: ParseState):
         self.logger.debug(f"Iterating over file with {len(state.line_it.lines)}")
@@ -538,8 +645,90 @@ class PassManager:
             if not full_line or status:
                 continue
             state.curr_line = LineTuple(line=full_line, ln=orig_ln)
-            for p in self.passes:
-                if p.pattern.search(full_line):
-                    self.logger.debug(f"Running pass: {p.name or p.fn.__name__}")
-                    p.fn(state, self.logger)
-                    break  # first match wins
+            p = self.match(full_line)
+            if p:
+                self.logger.debug(f"Running pass: {p.name or p.fn.__name__}")
+                p.fn(state, self.logger)
+
+
+_PASS_GROUP = "_pass"
+
+
+class PassEngine(NamedTuple):
+    """
+    Anchored pass patterns merged into one alternation with a named group per pass.
+    Merging patterns that are searched anywhere in the line doesn't pay off
+    with python's re, which tries every alternative at every position.
+    """
+
+    anchored: Optional[re.Pattern]
+    pass_index: dict[str, int]  # group name -> index into PassManager.passes
+    searched: tuple[int, ...]  # indices of the passes to search in turn
+    required: tuple[Optional[str], ...]  # keywords of the searched passes
+
+    def first_anchored(self, line: str) -> Optional[int]:
+        """
+        Returns the lowest index of the anchored passes that match line
+        """
+        if self.anchored:
+            m = self.anchored.match(line)
+            if m:
+                return self.pass_index[m.lastgroup]
+        return None
+
+
+def _has_top_level_branch(pattern: str) -> bool:
+    """
+    Checks for a `|` outside of groups and character classes
+    """
+    depth = 0
+    in_class = False
+    escaped = False
+    for c in pattern:
+        if escaped:
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+    return False
+
+
+@lru_cache(maxsize=64)
+def compile_pass_engine(patterns: tuple[tuple[str, int, Optional[str]], ...]) -> Optional[PassEngine]:
+    """
+    Merge the anchored pass patterns into a PassEngine. Patterns with flags
+    other than IGNORECASE or with backreferences are searched on their own.
+    Returns None if the merged pattern doesn't compile.
+    """
+    anchored = []
+    pass_index = {}
+    searched = []
+    required = []
+    for i, (pattern, flags, keyword) in enumerate(patterns):
+        mergeable = not (flags & ~(re.IGNORECASE | re.UNICODE) or re.search(r"\\\d", pattern))
+        if not (mergeable and pattern.startswith("^") and not _has_top_level_branch(pattern)):
+            searched.append(i)
+            required.append(keyword)
+            continue
+        body = pattern[1:]
+        scoped = f"(?i:{body})" if flags & re.IGNORECASE else f"(?:{body})"
+        anchored.append(f"(?P<{_PASS_GROUP}{i}>{scoped})")
+        pass_index[f"{_PASS_GROUP}{i}"] = i
+    try:
+        return PassEngine(
+            anchored=re.compile("^(?:" + "|".join(anchored) + ")") if anchored else None,
+            pass_index=pass_index,
+            searched=tuple(searched),
+            required=tuple(required),
+        )
+    except re.error:
+        return None
@@ -7,18 +7,19 @@ from __future__ import annotations
 
 import copy
 import re
-import subprocess as sp
 import sys
 from collections import namedtuple
 from typing import TYPE_CHECKING, List, Pattern, Tuple
 
-from scripts.types import LineTuple
+from scripts.types import (LineTuple, LogicalLineTable, join_continuation,
+                           strip_comment)
 
 if TYPE_CHECKING:
     from scripts.analyze_subroutines import Subroutine
 
 from scripts.fortran_parser.tracing import Trace
-from scripts.mod_config import ELM_SRC, _bc
+from scripts.mod_config import _bc
+from scripts.source_index import get_source_index
 
 # Regular Expressions
 find_type = re.compile(r"(?<=\()\s*\w+\s*(?=\))")  # Matches type(user-type) -> user-type
@@ -314,17 +315,13 @@ def unwrap_section(lines: list[str], startln: int)->list[LineTuple]:
     lines: list of fortran lines to adjust for lineconinuation
     startln: line number for first line in lines in the file.
     """
+    table = LogicalLineTable(lines)
     fline_list: list[LineTuple] = []
-    ln: int = 0
-    while ln < len(lines):
-        full_line, new_ln = line_unwrapper(lines, ln)
+    for full_line, ln in zip(table.text, table.starts):
         if(full_line):
             statements = full_line.split(";")
             for stmt in statements:
-                fline_list.append(LineTuple(line=stmt.strip(),ln=ln))
-        ln = new_ln + 1
-
-    fline_list = [ LineTuple(line=f.line,ln=f.ln+startln) for f in fline_list ]
+                fline_list.append(LineTuple(line=stmt.strip(),ln=ln+startln))
     return fline_list
 
 def find_end_subroutine(fn, startline):
@@ -361,65 +358,27 @@ def find_file_for_subroutine(name, fn="", ignore_interface=False, verbose=False)
     find file and start of interface block for interfaces
     """
     func_name = "find_file_for_subroutine"
-    if not fn:
-        search_file = f"{ELM_SRC}*"
-    else:
-        search_file = f"{fn}"
-
-    interface_list = get_interface_list()
-    if name not in interface_list or ignore_interface:
-        cmd = f'grep -rin -E "^[[:space:]]*(subroutine[[:space:]]* {name})\\b" {search_file} | head -1'
-        cmd_end = f'grep -rin -E "^[[:space:]]*(end subroutine[[:space:]]* {name})\\b" {search_file} | head -1'
-    else:
-        cmd = f'grep -rin -E "^[[:space:]]+(interface[[:space:]]* {name})" {search_file} | head -1'
-        cmd_end = ""
-
-    output = sp.getoutput(cmd)
-    if verbose:
-        print(f"{func_name}::output {output}")
-    if not fn:
-        file = output.split(":")[0]
-        # Need to separate the file name and path
-        # fpath = dir_regex.search(file).group()
-        # file = dir_regex.sub('',file)
-        output = output.split(":")
-        if len(output) < 2:
-            print(f"Error: Couldn't find info for {name}\n {output}")
-            sys.exit()
-        startline = int(output[1])
-        if cmd_end != "":
-            output = sp.getoutput(cmd_end)
-            if not output:
-                print(f"{func_name}::Didn't match end of subroutine\n output: {output}")
-                endline = find_end_subroutine(file, startline)
-                print(f"{func_name}::Endline found: {endline} for {name}")
-            else:
-                endline = int(output.split(":")[1])
-        else:
-            endline = 0
+    src_index = get_source_index()
+
+    is_interface = src_index.find_interface(name) is not None
+    if not is_interface or ignore_interface:
+        proc = src_index.find_subroutine(name, fpath=fn)
+        if proc is None:
+            print(f"{func_name}::Error: Couldn't find info for {name} {fn}")
+            sys.exit(1)
+        if verbose:
+            print(f"{func_name}::found {proc}")
+        file, startline, endline = proc.fpath, proc.start_ln, proc.end_ln
+        if not endline:
+            print(f"{func_name}::Didn't match end of subroutine {name}")
+            endline = find_end_subroutine(file, startline)
+            print(f"{func_name}::Endline found: {endline} for {name}")
     else:
-        file = fn
-        output = output.split(":")
-        if len(output) < 2:
-            sys.exit(
-                f"{func_name}::Didn't match subroutine\n cmd: {cmd}\n output: {output}"
-            )
-        startline = int(output[0])
-        if cmd_end != "":
-            output = sp.getoutput(cmd_end)
-            if not output:
-                print(f"{func_name}::Didn't match end of subroutine\n output: {output}")
-                endline = find_end_subroutine(file, startline)
-                print(f"{func_name}::Endline found: {endline} for {name}")
-            else:
-                output = output.split(":")
-                endline = int(output[0])
-        else:
-            endline = 0
-
-    if file == "grep":
-        print(f"ERROR FILE FOR {name} NOT PRESENT")
-        sys.exit(1)
+        iface = src_index.find_interface(name, fpath=fn)
+        if iface is None:
+            print(f"{func_name}::Error: Couldn't find interface {name} {fn}")
+            sys.exit(1)
+        file, startline, endline = iface.fpath, iface.ln, 0
 
     return file, startline, endline
 
@@ -427,21 +386,8 @@ def find_file_for_subroutine(name, fn="", ignore_interface=False, verbose=False)
 def get_interface_list():
     """
     returns a list of all interfaces
-
-    NOTE:  Should store it in mod_config so it's only run once per
-           Unit Test creation
     """
-
-    cmd = f'grep -rin --exclude-dir={ELM_SRC}external_models/ -E "^[[:space:]]+(interface)" {ELM_SRC}*'
-    output = sp.getoutput(cmd)
-    output = output.split("\n")
-    interface_list = []
-    for el in output:
-        el = el.split()
-        interface = el[2]
-        interface_list.append(interface.lower())
-
-    return interface_list
+    return get_source_index().interface_names()
 
 
 def getLocalVariables(sub: Subroutine, verbose=False, class_var=False):
@@ -1119,26 +1065,10 @@ def line_unwrapper(lines: list[str], ct: int, verbose: bool=False) -> Tuple[str,
     Function that takes code segment that has line continuations
     and returns it all on one line.
     """
-    beg_continuation = re.compile(r"^\s*(&)")
-    simple_l = lines[ct].split("!")[0]  # remove comments
-    # remove new line character
-    simple_l = simple_l.rstrip("\n").strip()
-    continuation = bool(simple_l.endswith("&"))
-    full_line = simple_l.lower()
-    newct = ct
-    while continuation:
-        newct += 1
-        simple_l = lines[newct].split("!")[0].strip()  # in case of inline comments
-        match_beg_cont = beg_continuation.search(simple_l)
-        if match_beg_cont:
-            simple_l = beg_continuation.sub("", simple_l)
-            simple_l = simple_l.strip()
-        simple_l = simple_l.rstrip("\n")
-        # Fortran allow empty lines in between line continuations
-        if simple_l.isspace() or not simple_l:
-            continue
-        full_line = full_line[:-1] + simple_l.strip().lower()
-        continuation = bool(full_line.endswith("&"))
+    full_line, newct = join_continuation(
+        lambda i: strip_comment(lines[i]).strip(), ct, len(lines)
+    )
+    full_line = full_line.lower()
 
     # Debug check:
     if verbose:
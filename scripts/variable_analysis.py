@@ -7,12 +7,13 @@ from logging import Logger
 from typing import TYPE_CHECKING, Dict
 
 from scripts.logging_configs import get_logger, set_logger_level
-from scripts.types import LineTuple, ModUsage
+from scripts.types import ModUsage
 
 if TYPE_CHECKING:
     from scripts.analyze_subroutines import Subroutine
 
 from scripts.fortran_modules import FortranModule
+from scripts.helper_functions import VarMatcher
 from scripts.utilityFunctions import Variable
 
 
@@ -72,10 +73,10 @@ def add_global_vars(
     return
 
 
-def check_global_vars(regex_variables, sub: Subroutine) -> set[str]:
+def check_global_vars(var_matcher: VarMatcher, sub: Subroutine) -> set[str]:
     """
     Function that checks sub for usage of any variables matched by
-    regex_variables.
+    var_matcher.
     """
     func_name = "check_global_vars"
     sub_lines = sub.sub_lines
@@ -83,17 +84,10 @@ def check_global_vars(regex_variables, sub: Subroutine) -> set[str]:
 
     lines = [lpair for lpair in sub_lines if lpair.ln >= fileinfo.startln]
 
-    matched_lines: list[LineTuple] = [
-        lpair for lpair in filter(lambda x: regex_variables.search(x.line), lines)
-    ]
-
     # Loop through subroutine line by line starting after the associate clause
     active_vars: set[str] = set()
-    for lpair in matched_lines:
-        match_var = regex_variables.findall(lpair.line)
-        for var in match_var:
-            if var not in active_vars:
-                active_vars.add(var)
+    for lpair in lines:
+        active_vars.update(var_matcher.findall(lpair.line))
     return active_vars
 
 
@@ -138,13 +132,9 @@ def determine_global_variable_status(
     )
     if not variables:
         return
-    # Create regex from the possible variables
-    var_string = "|".join(variables.keys())
-    regex_variables = re.compile(r"\b({})\b".format(var_string), re.IGNORECASE)
-
     # Loop through the subroutines and check for variables used within.
     # `check_global_vars` loops through each sub and looks for any matches
-    active_vars = check_global_vars(regex_variables, sub)
+    active_vars = check_global_vars(VarMatcher(variables), sub)
     if verbose:
         print(f"{func_name}::sub ", sub.name)
         print(f"{func_name}::test modules ", test_modules)
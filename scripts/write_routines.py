@@ -6,7 +6,7 @@ import subprocess as sp
 import sys
 import textwrap
 from collections import namedtuple
-from typing import TYPE_CHECKING, Dict, Iterable
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
 
 import scripts.io.helper as hio
 from scripts.analyze_subroutines import Subroutine
@@ -14,8 +14,9 @@ from scripts.edit_files import macros
 from scripts.fortran_modules import get_module_name_from_file
 # from scripts.io.hdf5_io import (generate_constants_io_hdf5,
 #                                 generate_elmtypes_io_hdf5)
-from scripts.io.netcdf_io import (generate_constants_io_netcdf,
-                                  generate_elmtypes_io_netcdf, generate_verify)
+from scripts.io.netcdf_io import (NcStorage, StateFields,
+                                  generate_constants_io_netcdf,
+                                  generate_elmtypes_io_netcdf)
 from scripts.logging_configs import get_logger
 from scripts.mod_config import (ELM_SRC, PHYSICAL_PROP_TYPE_LIST, _bc,
                                 spel_mods_dir, spel_output_dir,
@@ -94,13 +95,14 @@ def get_delta_from_dim(dim, delta):
 
     return newdim
 
-def generate_cmake(files: list[str], case_dir: str):
+def generate_cmake(files: list[str], case_dir: str, parallel_io: bool = False):
     """
     Generates a CMakeLists.txt file for compiling unit-test 
-    using cmake
+    using cmake. parallel_io builds the parallel netcdf reads (SPEL_PARALLEL_IO).
     """
     from scripts.edit_files import macros
     exe_name = "elmtest"
+    definitions = macros + ["SPEL_PARALLEL_IO"] if parallel_io else macros
 
     cmake_script = textwrap.dedent(f"""
     cmake_minimum_required(VERSION 3.20)
@@ -144,7 +146,7 @@ def generate_cmake(files: list[str], case_dir: str):
         target_link_libraries({exe_name} PRIVATE MPI::MPI_Fortran)
     endif()
 
-    target_compile_definitions({exe_name} PRIVATE {" ".join(macros)})
+    target_compile_definitions({exe_name} PRIVATE {" ".join(definitions)})
     message(STATUS "Final Fortran flags: ${{CMAKE_Fortran_FLAGS}}")
     """)
 
@@ -551,17 +553,30 @@ def prepare_unit_test_files(
     global_vars: dict[str,Variable],
     subroutines:SubDict,
     instance_to_type: InstToDTypeMap,
+    nc_storage: Optional[NcStorage] = None,
+    parallel_io: bool = False,
+    state_fields: Optional[StateFields] = None,
 ):
     """
     This function will prepare the use headers of main, initializeParameters,
     and readConstants.  It will also clean the variable initializations and
-    declarations in main and elm_instMod
+    declarations in main and elm_instMod.
+    nc_storage sets the chunking/compression of the elmtypes netcdf files.
+    parallel_io generates the parallel (per rank slab) read_elmtypes.
+    state_fields splits the elmtypes files into inputs and verified outputs.
     """
     non_param_vars = {v.name : v for v in global_vars.values() if not v.parameter }
     prepare_main(subroutines, type_dict, instance_to_type, case_dir)
     # Write DeepCopyMod for UnitTest
     create_deepcopy_module(type_dict, case_dir, "DeepCopyMod")
-    generate_elmtypes_io_netcdf(type_dict, instance_to_type, case_dir)
+    generate_elmtypes_io_netcdf(
+        type_dict,
+        instance_to_type,
+        case_dir,
+        storage=nc_storage,
+        parallel=parallel_io,
+        fields=state_fields,
+    )
     generate_constants_io_netcdf(vars=non_param_vars, casedir=case_dir)
 
     # generate_constants_io_hdf5(vars=non_param_vars,casedir=case_dir)
@@ -575,16 +590,6 @@ def prepare_unit_test_files(
     # clean_use_statements(mod_list=mod_list, file="update_accMod", case_dir=case_dir)
     prep_elm_init(type_dict, case_dir)
 
-    # create list of variables that should be used for verification.
-    verify_set: set[str] = {
-        key
-        for sub in subroutines.values()
-        for key, val in sub.elmtype_access_sum.items()
-        if val in ["w", "rw"]
-    }
-    generate_verify(verify_set, type_dict)
-
-
     return
 
 def prep_elm_init(type_dict: TypeDict,case_dir: str):
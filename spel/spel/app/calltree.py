@@ -1,14 +1,14 @@
 import json
+from collections import deque
 
 from django.conf import settings
 from django.db import connection
+from django.db.models import Q
 
-from .models import SubroutineActiveGlobalVars, SubroutineCalltree
+from .search_index import get_variable_index
 
 DB_NAME = settings.DATABASES["default"]["NAME"]
 
-modules = {}
-
 
 class Node:
     def __init__(self, name, dependency=None):
@@ -31,153 +31,303 @@ class Node:
     #         child.print_tree(level + 1)
 
 
-def modules_dfs(mod_id, node):
-    if mod_id == 0 or mod_id == 2:
-        return
-
-    visited = []
-    m = None
-    with connection.cursor() as cur:
-        cur.execute(
-            f"SELECT * FROM module_dependency WHERE module_id={mod_id} order by dependency_id"
-        )
-        m = cur.fetchall()
-    for i in m:
-        dep = i[2]
-        if dep not in visited:
-            n = Node(modules[dep])
-            node.children.append(n)
-            modules_dfs(dep, n)
-
-        visited.append(dep)
+# Dependencies on these aren't shown in the module tree
+HIDDEN_MODULES = ("shr_kind_mod", "NULL")
+# Modules (by id) whose dependencies aren't expanded
+LEAF_MODULE_IDS = (0, 2)
 
 
-def jsonify(node, d):
-    d["node"] = {"name": node.name, "children": []}
-    for child in node.children:
-        if child.name != "shr_kind_mod" and child.name != "NULL":
-            child_dict = {}
-            jsonify(child, child_dict)
-            d["node"]["children"].append(child_dict)
+class ModuleGraphCache:
+    """
+    In-process copy of the module_dependency rows of one commit as an
+    adjacency map with memoized JSON subtrees. Reloaded when the commit is
+    loaded again, or the row count or max id of modules or of the commit's
+    module_dependency changes.
+    """
 
+    def __init__(self, commit_id: int):
+        self.commit_id = commit_id
+        self.key = None
+        self.names: dict[int, str] = {}
+        self.ids: dict[str, int] = {}
+        # module_id -> unique dep_module_ids, in order of dependency_id
+        self.deps: dict[int, list[int]] = {}
+        self._subtrees: dict[int, dict] = {}
+        self._json: dict[int, str] = {}
+        self._depth: dict[int, int] = {}
+
+    @staticmethod
+    def fingerprint(commit_id: int):
+        from django.db.models import Count, Max
+
+        from app.models import ExportedCommits, ModuleDependency, Modules
+
+        deps = ModuleDependency.objects.filter(commit=commit_id).aggregate(
+            n=Count("pk"), last=Max("pk")
+        )
+        mods = Modules.objects.aggregate(n=Count("pk"), last=Max("pk"))
+        version = ExportedCommits.get_version(commit_id)
+        return (version, deps["n"], deps["last"], mods["n"], mods["last"])
+
+    def load(self, key):
+        from app.models import ModuleDependency, Modules
+
+        self.key = key
+        self.deps = {}
+        rows = (
+            ModuleDependency.objects.filter(commit=self.commit_id)
+            .order_by("dependency_id")
+            .values_list("module_id", "dep_module_id")
+        )
+        for mod_id, dep_id in rows:
+            deps = self.deps.setdefault(mod_id, [])
+            if dep_id not in deps:
+                deps.append(dep_id)
+        used = {dep_id for deps in self.deps.values() for dep_id in deps}
+        self.names = dict(
+            Modules.objects.filter(Q(commits=self.commit_id) | Q(pk__in=used | set(self.deps)))
+            .distinct()
+            .values_list("module_id", "module_name")
+        )
+        self.ids = {name: mod_id for mod_id, name in self.names.items()}
+        self._subtrees = {}
+        self._json = {}
+        self._depth = {}
+
+    def children(self, mod_id: int) -> list[int]:
+        if mod_id in LEAF_MODULE_IDS:
+            return []
+        return self.deps.get(mod_id, [])
+
+    def _post_order(self, mod_id: int):
+        """
+        Yields every module reachable from mod_id after its dependencies.
+        A dependency cycle is cut where it closes.
+        """
+        on_stack = {mod_id}
+        done = set()
+        stack = [(mod_id, iter(self.children(mod_id)))]
+        while stack:
+            node, deps = stack[-1]
+            for dep in deps:
+                if dep not in done and dep not in on_stack:
+                    on_stack.add(dep)
+                    stack.append((dep, iter(self.children(dep))))
+                    break
+            else:
+                stack.pop()
+                on_stack.discard(node)
+                done.add(node)
+                yield node
+
+    def subtree(self, mod_id: int) -> dict:
+        """
+        Dependency tree of mod_id as {"node": {"name":, "children": [...]}}.
+        Subtrees are shared between every module that uses them.
+        """
+        for node in self._post_order(mod_id):
+            if node in self._subtrees:
+                continue
+            children = [
+                self._subtrees.get(dep, {"node": {"name": self.names[dep], "children": []}})
+                for dep in self.children(node)
+                if self.names[dep] not in HIDDEN_MODULES
+            ]
+            self._subtrees[node] = {"node": {"name": self.names[node], "children": children}}
+        return self._subtrees[mod_id]
+
+    def tree_json(self, mod_id: int) -> str:
+        if mod_id not in self._json:
+            self._json[mod_id] = json.dumps(self.subtree(mod_id))
+        return self._json[mod_id]
+
+    def depth(self, mod_id: int) -> int:
+        """
+        Length of the longest chain of dependencies below mod_id
+        """
+        for node in self._post_order(mod_id):
+            if node not in self._depth:
+                self._depth[node] = 1 + max(
+                    (self._depth.get(dep, 0) for dep in self.children(node)),
+                    default=-1,
+                )
+        return self._depth[mod_id]
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Returns {module_name: {"fan_in":, "fan_out":, "depth":}}
+        """
+        fan_in = {mod_id: 0 for mod_id in self.names}
+        for deps in self.deps.values():
+            for dep in deps:
+                fan_in[dep] = fan_in.get(dep, 0) + 1
+        return {
+            name: {
+                "fan_in": fan_in[mod_id],
+                "fan_out": len(self.deps.get(mod_id, [])),
+                "depth": self.depth(mod_id),
+            }
+            for mod_id, name in self.names.items()
+        }
+
+
+module_graph_caches: dict[int, ModuleGraphCache] = {}
+
+
+def get_module_graph_cache(commit_id: int) -> ModuleGraphCache:
+    cache = module_graph_caches.setdefault(commit_id, ModuleGraphCache(commit_id))
+    key = ModuleGraphCache.fingerprint(commit_id)
+    if key != cache.key:
+        cache.load(key)
+    return cache
+
+
+def get_module_calltree(mod_name, commit_id: int):
+    cache = get_module_graph_cache(commit_id)
+    key = cache.ids.get(mod_name)
+    if key is None:
+        return "n/a"
+    return cache.tree_json(key)
 
-def module_calltree_helper():
-    root = Node("")
-    m = None
-    with connection.cursor() as cur:
-        cur.execute("SELECT * FROM modules")
-        m = cur.fetchall()
-    for i in m:
-        modules[i[0]] = i[1]
 
-    return root, modules
+def get_subroutine_details(instance, member, mode, commit_id: int):
+    """
+    Function that looks up the subroutines accessing instance%member
+    (partial match on member) in the variable search index of commit_id.
+    mode == "head" filters subroutines not in the call tree
+    """
+    index = get_variable_index(commit_id)
+    if instance == "" and member == "":
+        matches = range(len(index.rows))
+        excluded_subroutines = set()
+    else:
+        matches = index.find(instance, member)
+        excluded_subroutines = index.child_ids if mode == "head" else set()
+
+    results = []
+    for i in matches:
+        sub_id, sub_name, inst, m, status = index.rows[i]
+        if sub_id not in excluded_subroutines:
+            results.append({"sub": sub_name, "inst": inst, "m": m, "rw": status})
+    return results
 
 
-def get_module_calltree(mod_name):
-    root, modules = module_calltree_helper()
-    root.name = mod_name
-    key = None
-    try:
-        key = list(modules.keys())[list(modules.values()).index(mod_name)]
+class CalltreeCache:
+    """
+    In-process adjacency map of the SubroutineCalltree rows of one commit
+    (by subroutine name) with memoized descendant sets. The commit's version
+    and the tables' row count and max id are checked on each
+    get_calltree_cache() so that ingesting new data (e.g., by the update_*
+    commands in another process) invalidates it.
+    """
 
-    except ValueError as e:
-        return "n/a"
-    modules_dfs(key, root)
-    r = {}
-    jsonify(root, r)
-    return json.dumps(r)
+    def __init__(self, commit_id: int):
+        self.commit_id = commit_id
+        self.key = None
+        self.sub_names: set[str] = set()
+        self.children: dict[str, list[str]] = {}
+        self._descendants: dict[str, frozenset[str]] = {}
 
+    @staticmethod
+    def fingerprint(commit_id: int):
+        from django.db.models import Count, Max
 
-def get_subroutine_details(instance, member, mode):
-    from django.db.models import F
+        from app.models import ExportedCommits, SubroutineCalltree
 
-    """
-    Function that queries database
-    """
-    # Filter subroutines not in the call tree
-    if mode == "head":
-        excluded_subroutines = SubroutineCalltree.objects.values_list(
-            "child_subroutine", flat=True
+        edges = SubroutineCalltree.objects.filter(commit=commit_id).aggregate(
+            n=Count("pk"), last=Max("pk")
         )
-    else:
-        excluded_subroutines = []
-
-    if instance != "":
-        if member != "":
-            # Query the database with partial matches
-            results = (
-                SubroutineActiveGlobalVars.objects.filter(
-                    instance__instance_name=instance,
-                    member__member_name__contains=member,  # Partial match for member_name
-                )
-                .exclude(subroutine__in=list(excluded_subroutines))
-                .values(
-                    sub=F("subroutine__subroutine_name"),
-                    inst=F("instance__instance_name"),
-                    m=F("member__member_name"),
-                    rw=F("status"),
-                )
+        subs = ExportedCommits.subroutines.through.objects.filter(
+            exportedcommits=commit_id
+        ).aggregate(n=Count("pk"), last=Max("pk"))
+        version = ExportedCommits.get_version(commit_id)
+        return (version, edges["n"], edges["last"], subs["n"], subs["last"])
+
+    def load(self, key):
+        from app.models import SubroutineCalltree, Subroutines
+
+        self.key = key
+        self.sub_names = set(
+            Subroutines.objects.filter(commits=self.commit_id).values_list(
+                "subroutine_name", flat=True
             )
-        else:
-            results = (
-                SubroutineActiveGlobalVars.objects.filter(
-                    instance__instance_name__contains=instance,
-                )
-                .exclude(subroutine__in=list(excluded_subroutines))
-                .values(
-                    sub=F("subroutine__subroutine_name"),
-                    inst=F("instance__instance_name"),
-                    m=F("member__member_name"),
-                    rw=F("status"),
-                )
+        )
+        self.children = {}
+        edges = (
+            SubroutineCalltree.objects.filter(commit=self.commit_id)
+            .order_by("pk")
+            .values_list(
+                "parent_subroutine__subroutine_name", "child_subroutine__subroutine_name"
             )
-    elif instance == "" and member == "":
-        results = SubroutineActiveGlobalVars.objects.all().values(
-            sub=F("subroutine__subroutine_name"),
-            inst=F("instance__instance_name"),
-            m=F("member__member_name"),
-            rw=F("status"),
         )
-    return results
-
-
-def build_calltree(root_subroutine_name, active_subs=None):
+        for parent, child in edges:
+            self.children.setdefault(parent, []).append(child)
+        self._descendants = {}
+
+    def descendants(self, name: str) -> frozenset[str]:
+        """
+        Every subroutine reachable from name (excluding name unless recursive)
+        """
+        closure = self._descendants.get(name)
+        if closure is None:
+            seen = set()
+            stack = list(self.children.get(name, []))
+            while stack:
+                sub = stack.pop()
+                if sub not in seen:
+                    seen.add(sub)
+                    stack.extend(self.children.get(sub, []))
+            closure = self._descendants[name] = frozenset(seen)
+        return closure
+
+    def ancestors(self, name: str) -> set[str]:
+        return {
+            parent for parent in self.children if name in self.descendants(parent)
+        }
+
+
+calltree_caches: dict[int, CalltreeCache] = {}
+
+
+def get_calltree_cache(commit_id: int) -> CalltreeCache:
+    cache = calltree_caches.setdefault(commit_id, CalltreeCache(commit_id))
+    key = CalltreeCache.fingerprint(commit_id)
+    if key != cache.key:
+        cache.load(key)
+    return cache
+
+
+def build_calltree(root_subroutine_name, commit_id: int, active_subs=None, cache=None):
     """
-    Build a call tree starting from the subroutine with name root_subroutine_name.
+    Build the call tree of commit_id starting from the subroutine with name
+    root_subroutine_name.
     If active_subs is provided (a set or list of subroutine names),
     only include children whose names are in active_subs.
     """
-    from app.models import SubroutineCalltree, Subroutines
-
-    try:
-        root_sub = Subroutines.objects.get(subroutine_name=root_subroutine_name)
-    except Subroutines.DoesNotExist:
+    if cache is None:
+        cache = get_calltree_cache(commit_id)
+    if root_subroutine_name not in cache.sub_names:
         return None
 
-    # Create a mapping: parent_subroutine_id -> list of child Subroutines
-    # Instead of doing many queries, we fetch all edges in one go.
-    edges = SubroutineCalltree.objects.select_related(
-        "parent_subroutine", "child_subroutine"
-    ).all()
-    calltree_map = {}
-    for edge in edges:
-        parent_id = edge.parent_subroutine.subroutine_name
-        calltree_map.setdefault(parent_id, []).append(edge.child_subroutine)
+    root_node = Node(root_subroutine_name)
+    if active_subs is not None:
+        active_subs = set(active_subs)
+        # Nothing below the root is active so every child would be pruned
+        if active_subs.isdisjoint(cache.descendants(root_subroutine_name)):
+            return root_node
 
     # Build the tree using a queue (BFS) to avoid recursion.
-    root_node = Node(root_sub.subroutine_name)
-    queue = [(root_sub, root_node)]
+    queue = deque([(root_subroutine_name, root_node)])
     visited = set()
 
     while queue:
-        current_sub, current_node = queue.pop(0)
+        current_sub, current_node = queue.popleft()
         # Avoid cycles:
-        if current_sub.subroutine_name in visited:
+        if current_sub in visited:
             continue
-        visited.add(current_sub.subroutine_name)
-        children = calltree_map.get(current_sub.subroutine_name, [])
-        for child in children:
-            child_node = Node(child.subroutine_name)
+        visited.add(current_sub)
+        for child in cache.children.get(current_sub, []):
+            child_node = Node(child)
             current_node.children.append(child_node)
             queue.append((child, child_node))
 
@@ -212,26 +362,17 @@ def subroutine_calltree_helper():
     return subroutines, sub_to_id
 
 
-def get_subroutine_calltree(instance, member):
+def get_subroutine_calltree(instance, member, commit_id: int):
     tree = []
 
-    active_vars_query = get_subroutine_details(instance, member, mode="")
-    parent_subs = get_subroutine_details(instance, member, mode="head")
+    active_vars_query = get_subroutine_details(instance, member, "", commit_id)
+    parent_subs = get_subroutine_details(instance, member, "head", commit_id)
 
-    parent_sub_names = []
-    [
-        parent_sub_names.append(row["sub"])
-        for row in parent_subs
-        if row["sub"] not in parent_sub_names
-    ]
+    parent_sub_names = list(dict.fromkeys(row["sub"] for row in parent_subs))
 
-    active_subs = []
+    active_subs = set()
     if active_vars_query:
-        [
-            active_subs.append(s["sub"])
-            for s in active_vars_query
-            if s["sub"] not in active_subs
-        ]
+        active_subs = {s["sub"] for s in active_vars_query}
 
     active_vars_table = []
     for item in active_vars_query:
@@ -242,8 +383,9 @@ def get_subroutine_calltree(instance, member):
         ]
         active_vars_table.append(row)
 
+    cache = get_calltree_cache(commit_id)
     for sub_name in parent_sub_names:
-        root = build_calltree(sub_name, active_subs)
+        root = build_calltree(sub_name, commit_id, active_subs, cache=cache)
         tree.append(root)
 
     return tree, active_vars_table
@@ -0,0 +1,628 @@
+"""
+Helpers for the update_* commands to load CSV files in bulk.
+
+Foreign keys are resolved from one name -> id map per table instead of a
+query per row, and rows are written with bulk_create in batched transactions.
+
+Rows are loaded into one commit (ExportedCommits). The update_* commands
+use DEFAULT_COMMIT unless --commit is given.
+"""
+
+import abc
+import csv
+import os
+import sys
+from typing import Callable, NamedTuple, Optional
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+
+BATCH_SIZE = 5000
+
+# Commit of the rows loaded from CSV files without --commit
+DEFAULT_COMMIT = "csv"
+
+
+def read_csv(csv_file: str) -> list[dict[str, str]]:
+    """
+    Returns the rows of csv_file with white space stripped from every value
+    """
+    with open(csv_file, newline="") as f:
+        reader = csv.DictReader(f)
+        return [
+            {key: (val or "").strip() for key, val in row.items()} for row in reader
+        ]
+
+
+def id_map(model, *fields: str, **filters) -> dict:
+    """
+    Returns {fields: pk} for every row of model (matching filters).
+    Single fields are not wrapped in a tuple.
+    """
+    rows = model.objects.filter(**filters).values_list(*fields, "pk")
+    if len(fields) == 1:
+        return {key: pk for key, pk in rows}
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def bulk_upsert(
+    model,
+    objs: list,
+    unique_fields: list[str],
+    update_fields: list[str] | None = None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """
+    Insert objs, updating update_fields of rows that conflict on unique_fields.
+    If there aren't any update_fields, conflicting rows are left as is.
+    Duplicates within objs are dropped (the last one is kept).
+    Returns the number of objects written.
+    """
+    attnames = [model._meta.get_field(f).attname for f in unique_fields]
+    unique_objs = {tuple(getattr(obj, a) for a in attnames): obj for obj in objs}
+    objs = list(unique_objs.values())
+
+    kwargs = {}
+    if update_fields:
+        kwargs["update_conflicts"] = True
+        kwargs["update_fields"] = update_fields
+        # MySQL's ON DUPLICATE KEY UPDATE can't name the conflict target
+        if connection.features.supports_update_conflicts_with_target:
+            kwargs["unique_fields"] = unique_fields
+    else:
+        kwargs["ignore_conflicts"] = True
+
+    for start in range(0, len(objs), batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(objs[start : start + batch_size], **kwargs)
+    return len(objs)
+
+
+def get_commit_id(commit: str) -> int:
+    """
+    Returns the id of commit in ExportedCommits, adding it if needed
+    """
+    from app.models import ExportedCommits
+
+    exported, _ = ExportedCommits.objects.get_or_create(commit=commit)
+    return exported.pk
+
+
+def bump_version(commit_id: int) -> None:
+    """
+    Mark the rows of commit_id as changed so the in-memory caches of the
+    views (search_index, calltree) reload them. Called after each load.
+    """
+    from app.models import ExportedCommits
+
+    ExportedCommits.objects.filter(pk=commit_id).update(version=F("version") + 1)
+
+
+def add_to_commit(field: str, commit_id: int, ids) -> None:
+    """
+    Add the shared rows ids (modules or subroutines) to the contents of commit_id
+    """
+    from app.models import ExportedCommits
+
+    m2m = ExportedCommits._meta.get_field(field)
+    through = m2m.remote_field.through
+    source = f"{m2m.m2m_field_name()}_id"
+    target = f"{m2m.m2m_reverse_field_name()}_id"
+    links = [through(**{source: commit_id, target: pk}) for pk in set(ids)]
+    for start in range(0, len(links), BATCH_SIZE):
+        through.objects.bulk_create(links[start : start + BATCH_SIZE], ignore_conflicts=True)
+
+
+def remove_from_commit(field: str, commit_id: int, ids) -> None:
+    """
+    Remove the shared rows ids (modules or subroutines) from the contents of commit_id
+    """
+    from app.models import ExportedCommits
+
+    m2m = ExportedCommits._meta.get_field(field)
+    through = m2m.remote_field.through
+    source = f"{m2m.m2m_field_name()}_id"
+    target = f"{m2m.m2m_reverse_field_name()}_id"
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        through.objects.filter(
+            **{source: commit_id, f"{target}__in": ids[start : start + BATCH_SIZE]}
+        ).delete()
+
+
+def ensure_modules(module_names, commit_id: int) -> dict[str, int]:
+    """
+    Create any missing Modules, add module_names to commit_id and return the
+    module_name -> module_id map
+    """
+    from app.models import Modules
+
+    module_names = set(module_names)
+    mod_ids = id_map(Modules, "module_name")
+    new_mods = sorted(module_names - set(mod_ids))
+    if new_mods:
+        bulk_upsert(
+            Modules, [Modules(module_name=m) for m in new_mods], ["module_name"]
+        )
+        mod_ids = id_map(Modules, "module_name")
+    add_to_commit("modules", commit_id, [mod_ids[m] for m in module_names])
+    return mod_ids
+
+
+class LoadError(Exception):
+    """
+    Rows can't be loaded, e.g., they reference a missing module.
+    Nothing has been written.
+    """
+
+    def __init__(self, errors: list[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+# Loaders for the rows of each table. Row keys are the columns of the CSV
+# files written by scripts/export_objects.py. Rows are written to commit_id.
+# Each returns the number of rows written and the errors for rows that were skipped.
+
+
+def load_module_deps(rows, commit_id: int) -> tuple[int, list[str]]:
+    from app.models import ModuleDependency
+
+    mod_ids = ensure_modules(
+        [row["module_name"] for row in rows] + [row["dep_module_name"] for row in rows],
+        commit_id,
+    )
+    deps = [
+        ModuleDependency(
+            commit_id=commit_id,
+            module_id=mod_ids[row["module_name"]],
+            dep_module_id=mod_ids[row["dep_module_name"]],
+            object_used=row["object_used"],
+        )
+        for row in rows
+    ]
+    num = bulk_upsert(
+        ModuleDependency, deps, ["commit", "module", "dep_module", "object_used"]
+    )
+    return num, []
+
+
+def load_typedefs(rows, commit_id: int) -> tuple[int, list[str]]:
+    from app.models import Modules, TypeDefinitions, UserTypes
+
+    mod_ids = id_map(Modules, "module_name")
+    missing = {row["module"] for row in rows} - set(mod_ids)
+    if missing:
+        raise LoadError([f"Module {name} not found." for name in sorted(missing)])
+
+    user_types = [
+        UserTypes(module_id=mod_ids[row["module"]], user_type_name=row["user_type_name"])
+        for row in rows
+    ]
+    bulk_upsert(UserTypes, user_types, ["module", "user_type_name"])
+    type_ids = id_map(UserTypes, "module__module_name", "user_type_name")
+
+    type_defs = [
+        TypeDefinitions(
+            commit_id=commit_id,
+            type_module_id=mod_ids[row["module"]],
+            user_type_id=type_ids[(row["module"], row["user_type_name"])],
+            member_type=row["member_type"],
+            member_name=row["member_name"],
+            dim=int(row["dim"]),
+            bounds=row["bounds"],
+        )
+        for row in rows
+    ]
+    num = bulk_upsert(
+        TypeDefinitions,
+        type_defs,
+        ["commit", "user_type", "member_type", "member_name", "type_module"],
+        update_fields=["dim", "bounds"],
+    )
+    return num, []
+
+
+def load_type_insts(rows, commit_id: int) -> tuple[int, list[str]]:
+    from app.models import Modules, UserTypeInstances, UserTypes
+
+    mod_ids = id_map(Modules, "module_name")
+    missing = {row["module"] for row in rows} - set(mod_ids)
+    if missing:
+        raise LoadError([f"Module {name} not found." for name in sorted(missing)])
+
+    type_ids = id_map(UserTypes, "module__module_name", "user_type_name")
+    insts, errors = [], []
+    for row in rows:
+        key = (row["module"], row["user_type_name"])
+        if key not in type_ids:
+            errors.append(f"Type {row['user_type_name']} not found.")
+            continue
+        insts.append(
+            UserTypeInstances(
+                commit_id=commit_id,
+                inst_module_id=mod_ids[row["module"]],
+                instance_type_id=type_ids[key],
+                instance_name=row["instance_name"],
+            )
+        )
+    num = bulk_upsert(
+        UserTypeInstances,
+        insts,
+        ["commit", "inst_module", "instance_type", "instance_name"],
+    )
+    return num, errors
+
+
+def load_subroutines(rows, commit_id: int) -> tuple[int, list[str]]:
+    from app.models import Modules, Subroutines
+
+    mod_ids = id_map(Modules, "module_name")
+    subs, errors = [], []
+    for row in rows:
+        module = row["module"]
+        if module not in mod_ids:
+            errors.append(f"Module {module} not found.")
+            continue
+        subs.append(
+            Subroutines(module_id=mod_ids[module], subroutine_name=row["subroutine"])
+        )
+    num = bulk_upsert(Subroutines, subs, ["subroutine_name", "module"])
+    sub_ids = id_map(Subroutines, "module_id", "subroutine_name")
+    add_to_commit(
+        "subroutines", commit_id, [sub_ids[(sub.module_id, sub.subroutine_name)] for sub in subs]
+    )
+    return num, errors
+
+
+def load_calltree(rows, commit_id: int) -> tuple[int, list[str]]:
+    from app.models import SubroutineCalltree, Subroutines
+
+    sub_ids = id_map(Subroutines, "module__module_name", "subroutine_name")
+    calls, errors = [], []
+    for row in rows:
+        parent = (row["mod_parent"], row["parent_subroutine"])
+        child = (row["mod_child"], row["child_subroutine"])
+        missing = [key for key in (parent, child) if key not in sub_ids]
+        if missing:
+            errors.extend(f"Subroutine {mod}::{sub} not found." for mod, sub in missing)
+            continue
+        calls.append(
+            SubroutineCalltree(
+                commit_id=commit_id,
+                parent_subroutine_id=sub_ids[parent],
+                child_subroutine_id=sub_ids[child],
+            )
+        )
+    num = bulk_upsert(
+        SubroutineCalltree, calls, ["commit", "parent_subroutine", "child_subroutine"]
+    )
+    return num, errors
+
+
+def load_active_globals(rows, commit_id: int) -> tuple[int, list[str]]:
+    from app.models import (
+        SubroutineActiveGlobalVars,
+        Subroutines,
+        TypeDefinitions,
+        UserTypeInstances,
+    )
+
+    sub_ids = id_map(Subroutines, "module__module_name", "subroutine_name")
+    # Instances are declared in the same module as their type.
+    inst_ids = id_map(
+        UserTypeInstances,
+        "inst_module__module_name",
+        "instance_type__user_type_name",
+        "instance_name",
+        commit_id=commit_id,
+    )
+    member_ids = id_map(
+        TypeDefinitions,
+        "type_module__module_name",
+        "user_type__user_type_name",
+        "member_type",
+        "member_name",
+        commit_id=commit_id,
+    )
+
+    active_vars, errors = [], []
+    for row in rows:
+        sub_key = (row["sub_module"], row["subroutine"])
+        inst_key = (row["type_module"], row["inst_type"], row["inst_name"])
+        member_key = (
+            row["type_module"],
+            row["inst_type"],
+            row["member_type"],
+            row["member_name"],
+        )
+        if sub_key not in sub_ids:
+            errors.append(f"Subroutine {row['subroutine']} not found.")
+        elif inst_key not in inst_ids:
+            errors.append(f"Instance {row['inst_name']} not found.")
+        elif member_key not in member_ids:
+            errors.append(
+                f"TypeDefinition not found for module {row['type_module']}, user_type {row['inst_type']}, "
+                f"member_type {row['member_type']}, member_name {row['member_name']}."
+            )
+        else:
+            active_vars.append(
+                SubroutineActiveGlobalVars(
+                    commit_id=commit_id,
+                    subroutine_id=sub_ids[sub_key],
+                    instance_id=inst_ids[inst_key],
+                    member_id=member_ids[member_key],
+                    status=row["status"],
+                )
+            )
+    if errors:
+        raise LoadError(errors)
+
+    num = bulk_upsert(
+        SubroutineActiveGlobalVars,
+        active_vars,
+        ["commit", "subroutine", "instance", "member"],
+        update_fields=["status"],
+    )
+    return num, []
+
+
+def load_subroutine_args(rows, commit_id: int) -> tuple[int, list[str]]:
+    from app.models import SubroutineArgs, Subroutines
+
+    sub_ids = id_map(Subroutines, "module__module_name", "subroutine_name")
+    args, errors = [], []
+    for row in rows:
+        key = (row["module"], row["subroutine"])
+        if key not in sub_ids:
+            errors.append(f"Subroutine {row['subroutine']} not found.")
+            continue
+        args.append(
+            SubroutineArgs(
+                commit_id=commit_id,
+                subroutine_id=sub_ids[key],
+                arg_type=row["arg_type"],
+                arg_name=row["arg_name"],
+                dim=int(row["dim"]),
+            )
+        )
+    num = bulk_upsert(
+        SubroutineArgs, args, ["commit", "subroutine", "arg_type", "arg_name", "dim"]
+    )
+    return num, errors
+
+
+class TableSpec(NamedTuple):
+    """
+    A table loaded from rows:
+        model: name of the model
+        loader: load_* function of the table
+        owner: the module a row belongs to as (row column, lookup)
+        key: natural key of a row as (lookup, row column) pairs
+        values: the other columns of a row as (lookup, row column) pairs
+        commit_lookup: lookup of the commit(s) a row belongs to
+    """
+
+    model: str
+    loader: Callable
+    owner: tuple[str, str]
+    key: list[tuple[str, str]]
+    values: list[tuple[str, str]] = []
+    commit_lookup: str = "commit"
+
+
+TABLES = {
+    "module_deps": TableSpec(
+        "ModuleDependency",
+        load_module_deps,
+        ("module_name", "module__module_name"),
+        [
+            ("module__module_name", "module_name"),
+            ("dep_module__module_name", "dep_module_name"),
+            ("object_used", "object_used"),
+        ],
+    ),
+    "type_defs": TableSpec(
+        "TypeDefinitions",
+        load_typedefs,
+        ("module", "type_module__module_name"),
+        [
+            ("type_module__module_name", "module"),
+            ("user_type__user_type_name", "user_type_name"),
+            ("member_type", "member_type"),
+            ("member_name", "member_name"),
+        ],
+        values=[("dim", "dim"), ("bounds", "bounds")],
+    ),
+    "user_type_instances": TableSpec(
+        "UserTypeInstances",
+        load_type_insts,
+        ("module", "inst_module__module_name"),
+        [
+            ("inst_module__module_name", "module"),
+            ("instance_type__user_type_name", "user_type_name"),
+            ("instance_name", "instance_name"),
+        ],
+    ),
+    "subroutines": TableSpec(
+        "Subroutines",
+        load_subroutines,
+        ("module", "module__module_name"),
+        [("module__module_name", "module"), ("subroutine_name", "subroutine")],
+        commit_lookup="commits",
+    ),
+    "subroutine_calltree": TableSpec(
+        "SubroutineCalltree",
+        load_calltree,
+        ("mod_parent", "parent_subroutine__module__module_name"),
+        [
+            ("parent_subroutine__module__module_name", "mod_parent"),
+            ("parent_subroutine__subroutine_name", "parent_subroutine"),
+            ("child_subroutine__module__module_name", "mod_child"),
+            ("child_subroutine__subroutine_name", "child_subroutine"),
+        ],
+    ),
+    "active_dtype_vars": TableSpec(
+        "SubroutineActiveGlobalVars",
+        load_active_globals,
+        ("sub_module", "subroutine__module__module_name"),
+        [
+            ("subroutine__module__module_name", "sub_module"),
+            ("subroutine__subroutine_name", "subroutine"),
+            ("instance__inst_module__module_name", "type_module"),
+            ("instance__instance_type__user_type_name", "inst_type"),
+            ("instance__instance_name", "inst_name"),
+            ("member__member_type", "member_type"),
+            ("member__member_name", "member_name"),
+        ],
+        values=[("status", "status")],
+    ),
+    "subroutine_args": TableSpec(
+        "SubroutineArgs",
+        load_subroutine_args,
+        ("module", "subroutine__module__module_name"),
+        [
+            ("subroutine__module__module_name", "module"),
+            ("subroutine__subroutine_name", "subroutine"),
+            ("arg_type", "arg_type"),
+            ("arg_name", "arg_name"),
+            ("dim", "dim"),
+        ],
+    ),
+}
+
+
+def commit_rows(name: str, commit_id: int, exclude_modules: set[str]) -> list[dict]:
+    """
+    Rows of table `name` in commit_id, with the columns of the CSV files,
+    except the rows of exclude_modules
+    """
+    from django.apps import apps
+
+    spec = TABLES[name]
+    model = apps.get_model("app", spec.model)
+    pairs = spec.key + spec.values
+    queryset = model.objects.filter(**{spec.commit_lookup: commit_id}).exclude(
+        **{f"{spec.owner[1]}__in": exclude_modules}
+    )
+    columns = [col for _, col in pairs]
+    return [
+        dict(zip(columns, vals))
+        for vals in queryset.values_list(*(lookup for lookup, _ in pairs))
+    ]
+
+
+def sync_table(
+    name: str,
+    rows,
+    commit_id: int,
+    modules: Optional[set[str]] = None,
+    since_id: Optional[int] = None,
+) -> tuple[dict[str, int], list[str]]:
+    """
+    Make the rows of table `name` in commit_id match rows.
+    If modules is set, only the rows of those modules are taken from rows
+    and the rows of every other module are copied from commit since_id.
+    Returns the number of rows inserted, kept (and updated) and deleted,
+    and the errors of the loader. Shared rows (subroutines) are removed
+    from the commit instead of being deleted, see prune_shared.
+    """
+    from django.apps import apps
+
+    spec = TABLES[name]
+    model = apps.get_model("app", spec.model)
+    lookups = [lookup for lookup, _ in spec.key]
+    columns = [col for _, col in spec.key]
+
+    if modules is not None:
+        rows = [row for row in rows if row[spec.owner[0]] in modules]
+        if since_id is not None:
+            rows = rows + commit_rows(name, since_id, exclude_modules=modules)
+    new_keys = {tuple(str(row[col]) for col in columns) for row in rows}
+    existing = {
+        tuple(str(val) for val in vals[:-1]): vals[-1]
+        for vals in model.objects.filter(**{spec.commit_lookup: commit_id}).values_list(
+            *lookups, "pk"
+        )
+    }
+
+    _, errors = spec.loader(rows, commit_id)
+    stale = [pk for vals, pk in existing.items() if vals not in new_keys]
+    if spec.commit_lookup == "commit":
+        for start in range(0, len(stale), BATCH_SIZE):
+            model.objects.filter(pk__in=stale[start : start + BATCH_SIZE]).delete()
+    else:
+        field = model._meta.get_field(spec.commit_lookup).field.name
+        remove_from_commit(field, commit_id, stale)
+
+    counts = {
+        "inserted": len(new_keys - existing.keys()),
+        "kept": len(new_keys & existing.keys()),
+        "deleted": len(stale),
+    }
+    return counts, errors
+
+
+def prune_shared() -> dict[str, int]:
+    """
+    Delete the shared rows (subroutines, user types, modules) that no commit
+    contains and no other row references any more.
+    Returns the number of rows deleted per model.
+    """
+    from app.models import Modules, Subroutines, UserTypes
+
+    deleted = {}
+    for model in (Subroutines, UserTypes, Modules):
+        unused = model.objects.all()
+        for rel in model._meta.related_objects:
+            unused = unused.filter(**{f"{rel.name}__isnull": True})
+        pks = list(unused.values_list("pk", flat=True))
+        for start in range(0, len(pks), BATCH_SIZE):
+            model.objects.filter(pk__in=pks[start : start + BATCH_SIZE]).delete()
+        deleted[model.__name__] = len(pks)
+    return deleted
+
+
+class CsvLoadCommand(BaseCommand, metaclass=abc.ABCMeta):
+    """
+    update_* command that loads one CSV file with loader
+    """
+
+    label = "rows"
+
+    @staticmethod
+    @abc.abstractmethod
+    def loader(rows, commit_id: int) -> tuple[int, list[str]]:
+        """Writes rows, returns the number written and the errors of skipped rows"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "csv_file", type=str, help="The path to the CSV file containing new data."
+        )
+        parser.add_argument(
+            "--commit",
+            type=str,
+            default=DEFAULT_COMMIT,
+            help=f"Commit the rows belong to (default: {DEFAULT_COMMIT}).",
+        )
+
+    def handle(self, *args, **options):
+        csv_file = options["csv_file"]
+        if not os.path.exists(csv_file):
+            self.stdout.write(self.style.ERROR(f"CSV file not found: {csv_file}"))
+            return
+
+        commit_id = get_commit_id(options["commit"])
+        try:
+            num, errors = self.loader(read_csv(csv_file), commit_id)
+        except LoadError as e:
+            for msg in e.errors:
+                self.stdout.write(self.style.ERROR(msg))
+            sys.exit(1)
+        finally:
+            bump_version(commit_id)
+
+        for msg in errors:
+            self.stdout.write(self.style.ERROR(msg))
+        self.stdout.write(self.style.SUCCESS(f"Data update complete: {num} {self.label}."))
@@ -5,6 +5,8 @@ import os
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
+from app.management.bulk_load import DEFAULT_COMMIT
+
 
 class Command(BaseCommand):
     help = "Update Modules, ModuleDependency, and SubroutineActiveGlobalVars from CSV files."
@@ -56,7 +58,13 @@ class Command(BaseCommand):
             "--all",
             action="store_true",
             required=False,
-            help="If set, automatically search the default CSV directory for all CSV files.",
+            help="If set, load every CSV file found in the default CSV directory without prompting.",
+        )
+        parser.add_argument(
+            "--commit",
+            type=str,
+            default=DEFAULT_COMMIT,
+            help=f"Commit the rows belong to (default: {DEFAULT_COMMIT}).",
         )
 
     def handle(self, *args, **options):
@@ -95,7 +103,7 @@ class Command(BaseCommand):
                 if options[key]:
                     options[key] = csv_files[key]
                     print("csv:", csv_files[key])
-        input("Continue?")
+            input("Continue?")
 
         modules_csv = options.get("modules_csv")
         subroutines_csv = options.get("subroutines_csv")
@@ -104,28 +112,26 @@ class Command(BaseCommand):
         active_globals_csv = options.get("active_globals_csv", None)
         sub_args_csv = options.get("sub_args_csv", None)
         sub_calltree = options.get("calltree_csv", None)
-
-        print("sub_call_tree:", sub_calltree)
+        commit = options["commit"]
 
         if modules_csv:
             self.stdout.write("Updating Modules and ModuleDependency...")
-            call_command("update_modules_deps", modules_csv)
+            call_command("update_modules_deps", modules_csv, commit=commit)
         if typedef_csv:
             self.stdout.write("Updating TypeDefinitions...")
-            call_command("update_typedefs", typedef_csv)
+            call_command("update_typedefs", typedef_csv, commit=commit)
         if instances_csv:
             self.stdout.write("Updating UserTypeInstances...")
-            call_command("update_type_insts", instances_csv)
+            call_command("update_type_insts", instances_csv, commit=commit)
         if subroutines_csv:
             self.stdout.write("Updating Subroutines...")
-            call_command("update_subroutines", subroutines_csv)
+            call_command("update_subroutines", subroutines_csv, commit=commit)
         if sub_calltree:
             self.stdout.write("Updating SubroutineCalltree...")
-            print(sub_calltree)
-            call_command("update_subroutine_calltree", sub_calltree)
+            call_command("update_subroutine_calltree", sub_calltree, commit=commit)
         if active_globals_csv:
             self.stdout.write("Updating SubroutineActiveGlobalVars...")
-            call_command("update_subroutine_dtype_vars", active_globals_csv)
+            call_command("update_subroutine_dtype_vars", active_globals_csv, commit=commit)
         if sub_args_csv:
             self.stdout.write("Updating SubroutineArgs...")
-            call_command("update_subroutine_args", sub_args_csv)
+            call_command("update_subroutine_args", sub_args_csv, commit=commit)
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0004_remove_usertypeinstances_unique_instances_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportedCommits",
+            fields=[
+                ("commit_id", models.AutoField(primary_key=True, serialize=False)),
+                ("commit", models.CharField(max_length=40, unique=True)),
+                ("exported_at", models.DateTimeField(auto_now=True)),
+                ("modules", models.ManyToManyField(db_table="commit_modules", related_name="commits", to="app.modules")),
+                ("subroutines", models.ManyToManyField(db_table="commit_subroutines", related_name="commits", to="app.subroutines")),
+            ],
+            options={
+                "db_table": "exported_commits",
+            },
+        ),
+    ]
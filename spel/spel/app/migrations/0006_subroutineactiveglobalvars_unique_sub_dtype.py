@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+def drop_duplicate_status(apps, schema_editor):
+    """
+    Keep the newest row of each (subroutine, instance, member): older rows
+    only differ by a status that has since been replaced.
+    """
+    model = apps.get_model("app", "SubroutineActiveGlobalVars")
+    newest = {}
+    stale = []
+    rows = model.objects.order_by("variable_id").values_list(
+        "variable_id", "subroutine_id", "instance_id", "member_id"
+    )
+    for pk, *key in rows:
+        key = tuple(key)
+        if key in newest:
+            stale.append(newest[key])
+        newest[key] = pk
+    for start in range(0, len(stale), 5000):
+        model.objects.filter(variable_id__in=stale[start : start + 5000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_exportedcommits"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="subroutineactiveglobalvars",
+            name="unique_sub_dtype",
+        ),
+        migrations.RunPython(drop_duplicate_status, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="subroutineactiveglobalvars",
+            constraint=models.UniqueConstraint(
+                fields=("subroutine", "instance", "member"), name="unique_sub_dtype"
+            ),
+        ),
+    ]
@@ -0,0 +1,159 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Default commit of the rows loaded by the update_* commands (bulk_load.DEFAULT_COMMIT)
+DEFAULT_COMMIT = "csv"
+
+
+def assign_rows_to_commit(apps, schema_editor):
+    """
+    The tables only held one set of rows so far: they belong to the last
+    exported commit, or to the default commit of CSV loads if none was.
+    Modules and subroutines are added to that commit as well.
+    """
+    ExportedCommits = apps.get_model("app", "ExportedCommits")
+    tables = [
+        apps.get_model("app", name)
+        for name in (
+            "ModuleDependency",
+            "TypeDefinitions",
+            "UserTypeInstances",
+            "SubroutineArgs",
+            "SubroutineCalltree",
+            "SubroutineActiveGlobalVars",
+        )
+    ]
+    if not any(model.objects.exists() for model in tables):
+        return
+    commit = ExportedCommits.objects.order_by("-exported_at").first()
+    if commit is None:
+        commit = ExportedCommits.objects.create(commit=DEFAULT_COMMIT)
+    for model in tables:
+        model.objects.filter(commit__isnull=True).update(commit=commit)
+
+    Modules = apps.get_model("app", "Modules")
+    Subroutines = apps.get_model("app", "Subroutines")
+    commit.modules.add(*Modules.objects.filter(commits__isnull=True))
+    commit.subroutines.add(*Subroutines.objects.filter(commits__isnull=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0006_subroutineactiveglobalvars_unique_sub_dtype"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="moduledependency",
+            name="unique_mod_dep",
+        ),
+        migrations.RemoveConstraint(
+            model_name="subroutineactiveglobalvars",
+            name="unique_sub_dtype",
+        ),
+        migrations.RemoveConstraint(
+            model_name="subroutineargs",
+            name="unique_sub_args",
+        ),
+        migrations.RemoveConstraint(
+            model_name="subroutinecalltree",
+            name="unique_calltree",
+        ),
+        migrations.RemoveConstraint(
+            model_name="usertypeinstances",
+            name="unique_instances",
+        ),
+        migrations.AlterUniqueTogether(
+            name="typedefinitions",
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name="moduledependency",
+            name="commit",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="module_deps", to="app.exportedcommits"),
+        ),
+        migrations.AddField(
+            model_name="subroutineactiveglobalvars",
+            name="commit",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="active_globals", to="app.exportedcommits"),
+        ),
+        migrations.AddField(
+            model_name="subroutineargs",
+            name="commit",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="subroutine_args", to="app.exportedcommits"),
+        ),
+        migrations.AddField(
+            model_name="subroutinecalltree",
+            name="commit",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="calltree", to="app.exportedcommits"),
+        ),
+        migrations.AddField(
+            model_name="typedefinitions",
+            name="commit",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="type_defs", to="app.exportedcommits"),
+        ),
+        migrations.AddField(
+            model_name="usertypeinstances",
+            name="commit",
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name="type_instances", to="app.exportedcommits"),
+        ),
+        migrations.RunPython(assign_rows_to_commit, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="moduledependency",
+            name="commit",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="module_deps", to="app.exportedcommits"),
+        ),
+        migrations.AlterField(
+            model_name="subroutineactiveglobalvars",
+            name="commit",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="active_globals", to="app.exportedcommits"),
+        ),
+        migrations.AlterField(
+            model_name="subroutineargs",
+            name="commit",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="subroutine_args", to="app.exportedcommits"),
+        ),
+        migrations.AlterField(
+            model_name="subroutinecalltree",
+            name="commit",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="calltree", to="app.exportedcommits"),
+        ),
+        migrations.AlterField(
+            model_name="typedefinitions",
+            name="commit",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="type_defs", to="app.exportedcommits"),
+        ),
+        migrations.AlterField(
+            model_name="usertypeinstances",
+            name="commit",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="type_instances", to="app.exportedcommits"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="typedefinitions",
+            unique_together={("commit", "user_type", "member_type", "member_name", "type_module")},
+        ),
+        migrations.AddConstraint(
+            model_name="moduledependency",
+            constraint=models.UniqueConstraint(fields=("commit", "module", "dep_module", "object_used"), name="unique_mod_dep"),
+        ),
+        migrations.AddConstraint(
+            model_name="subroutineactiveglobalvars",
+            constraint=models.UniqueConstraint(fields=("commit", "subroutine", "instance", "member"), name="unique_sub_dtype"),
+        ),
+        migrations.AddConstraint(
+            model_name="subroutineargs",
+            constraint=models.UniqueConstraint(fields=("commit", "subroutine", "arg_type", "arg_name", "dim"), name="unique_sub_args"),
+        ),
+        migrations.AddConstraint(
+            model_name="subroutinecalltree",
+            constraint=models.UniqueConstraint(fields=("commit", "parent_subroutine", "child_subroutine"), name="unique_calltree"),
+        ),
+        migrations.AddConstraint(
+            model_name="usertypeinstances",
+            constraint=models.UniqueConstraint(fields=("commit", "inst_module", "instance_type", "instance_name"), name="unique_instances"),
+        ),
+    ]
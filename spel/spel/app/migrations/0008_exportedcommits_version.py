@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_commit_scoped_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportedcommits',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
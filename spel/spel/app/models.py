@@ -21,12 +21,18 @@ class ModuleDependency(models.Model):
         related_name="moduledependency_dep_module_set",
     )
     object_used = models.CharField(max_length=100)
+    commit = models.ForeignKey(
+        "ExportedCommits",
+        on_delete=models.CASCADE,
+        related_name="module_deps",
+    )
 
     class Meta:
         db_table = "module_dependency"
         constraints = [
             UniqueConstraint(
-                fields=("module", "dep_module", "object_used"), name="unique_mod_dep"
+                fields=("commit", "module", "dep_module", "object_used"),
+                name="unique_mod_dep",
             ),
         ]
 
@@ -65,10 +71,17 @@ class TypeDefinitions(models.Model):
     member_name = models.CharField(max_length=100)
     dim = models.IntegerField()
     bounds = models.CharField(max_length=100)
+    commit = models.ForeignKey(
+        "ExportedCommits",
+        on_delete=models.CASCADE,
+        related_name="type_defs",
+    )
 
     class Meta:
         db_table = "type_definitions"
-        unique_together = (("user_type", "member_type", "member_name", "type_module"),)
+        unique_together = (
+            ("commit", "user_type", "member_type", "member_name", "type_module"),
+        )
 
 
 class UserTypeInstances(models.Model):
@@ -85,12 +98,17 @@ class UserTypeInstances(models.Model):
         related_name="instance_type",
     )
     instance_name = models.CharField(max_length=100)
+    commit = models.ForeignKey(
+        "ExportedCommits",
+        on_delete=models.CASCADE,
+        related_name="type_instances",
+    )
 
     class Meta:
         db_table = "user_type_instances"
         constraints = [
             UniqueConstraint(
-                fields=("inst_module", "instance_type", "instance_name"),
+                fields=("commit", "inst_module", "instance_type", "instance_name"),
                 name="unique_instances",
             )
         ]
@@ -127,12 +145,17 @@ class SubroutineArgs(models.Model):
     arg_type = models.CharField(max_length=100)
     arg_name = models.CharField(max_length=100)
     dim = models.IntegerField()
+    commit = models.ForeignKey(
+        "ExportedCommits",
+        on_delete=models.CASCADE,
+        related_name="subroutine_args",
+    )
 
     class Meta:
         db_table = "subroutine_args"
         constraints = [
             UniqueConstraint(
-                fields=("subroutine", "arg_type", "arg_name", "dim"),
+                fields=("commit", "subroutine", "arg_type", "arg_name", "dim"),
                 name="unique_sub_args",
             ),
         ]
@@ -151,12 +174,18 @@ class SubroutineCalltree(models.Model):
         on_delete=models.CASCADE,
         related_name="child_subroutine",
     )
+    commit = models.ForeignKey(
+        "ExportedCommits",
+        on_delete=models.CASCADE,
+        related_name="calltree",
+    )
 
     class Meta:
         db_table = "subroutine_calltree"
         constraints = [
             UniqueConstraint(
-                fields=("parent_subroutine", "child_subroutine"), name="unique_calltree"
+                fields=("commit", "parent_subroutine", "child_subroutine"),
+                name="unique_calltree",
             ),
         ]
 
@@ -200,12 +229,58 @@ class SubroutineActiveGlobalVars(models.Model):
         related_name="active_member",
     )
     status = models.CharField(max_length=2)
+    commit = models.ForeignKey(
+        "ExportedCommits",
+        on_delete=models.CASCADE,
+        related_name="active_globals",
+    )
 
     class Meta:
         db_table = "subroutine_active_global_vars"
         constraints = [
             UniqueConstraint(
-                fields=("subroutine", "instance", "member", "status"),
+                fields=("commit", "subroutine", "instance", "member"),
                 name="unique_sub_dtype",
             )
         ]
+
+
+class ExportedCommits(models.Model):
+    """
+    E3SM commits exported with `spel export --db` (or loaded from CSV files).
+    Module dependencies, type definitions and instances, subroutine
+    arguments, call tree and active variables belong to one commit.
+    Modules, subroutines and user types are shared; each commit lists the
+    modules and subroutines it contains.
+    """
+
+    objects = models.Manager()
+    commit_id = models.AutoField(primary_key=True)
+    commit = models.CharField(unique=True, max_length=40)
+    exported_at = models.DateTimeField(auto_now=True)
+    # Incremented by every load into the commit, see bulk_load.bump_version
+    version = models.PositiveIntegerField(default=0)
+    modules = models.ManyToManyField(
+        "Modules", related_name="commits", db_table="commit_modules"
+    )
+    subroutines = models.ManyToManyField(
+        "Subroutines", related_name="commits", db_table="commit_subroutines"
+    )
+
+    class Meta:
+        db_table = "exported_commits"
+
+    def __str__(self):
+        return f"{self.commit}"
+
+    @staticmethod
+    def get_version(commit_id: int):
+        """
+        Version of commit_id's rows, part of the keys of the in-memory
+        caches since re-loaded rows can change without changing their ids.
+        """
+        return (
+            ExportedCommits.objects.filter(pk=commit_id)
+            .values_list("version", flat=True)
+            .first()
+        )
@@ -0,0 +1,143 @@
+"""
+In-memory search index over SubroutineActiveGlobalVars.
+
+Every row is loaded once (instance, member, subroutine, status) and indexed
+by instance and by "instance%member" so that lookups and autocomplete don't
+run LIKE '%x%' scans over a join of three tables for each request.
+Names are matched case-insensitively, as the database collation did.
+"""
+
+from bisect import bisect_left
+
+AUTOCOMPLETE_LIMIT = 20
+
+
+class VariableIndex:
+    """
+    Index of the rows of one commit. Reloaded when the commit is loaded
+    again, or the row count or max id of the commit's
+    subroutine_active_global_vars or subroutine_calltree changes.
+    """
+
+    def __init__(self, commit_id: int):
+        self.commit_id = commit_id
+        self.key = None
+        # (subroutine_id, subroutine, instance, member, status) in pk order
+        self.rows: list[tuple[int, str, str, str, str]] = []
+        # instance -> member -> row indices (lowercase names)
+        self.by_inst: dict[str, dict[str, list[int]]] = {}
+        # sorted lowercase "instance%member" names for autocomplete and
+        # the name as stored for each
+        self.var_keys: list[str] = []
+        self.var_names: list[str] = []
+        # subroutines called by another subroutine
+        self.child_ids: set[int] = set()
+
+    @staticmethod
+    def fingerprint(commit_id: int):
+        from django.db.models import Count, Max
+
+        from app.models import (ExportedCommits, SubroutineActiveGlobalVars,
+                                SubroutineCalltree)
+
+        gvars = SubroutineActiveGlobalVars.objects.filter(commit=commit_id).aggregate(
+            n=Count("pk"), last=Max("pk")
+        )
+        edges = SubroutineCalltree.objects.filter(commit=commit_id).aggregate(
+            n=Count("pk"), last=Max("pk")
+        )
+        return (
+            ExportedCommits.get_version(commit_id),
+            gvars["n"],
+            gvars["last"],
+            edges["n"],
+            edges["last"],
+        )
+
+    def load(self, key):
+        from app.models import SubroutineActiveGlobalVars, SubroutineCalltree
+
+        self.key = key
+        self.rows = list(
+            SubroutineActiveGlobalVars.objects.filter(commit=self.commit_id)
+            .order_by("pk")
+            .values_list(
+                "subroutine_id",
+                "subroutine__subroutine_name",
+                "instance__instance_name",
+                "member__member_name",
+                "status",
+            )
+        )
+        self.by_inst = {}
+        names = {}
+        for i, (_, _, inst, member, _) in enumerate(self.rows):
+            self.by_inst.setdefault(inst.lower(), {}).setdefault(member.lower(), []).append(i)
+            name = f"{inst}%{member}"
+            names.setdefault(name.lower(), name)
+        self.var_keys = sorted(names)
+        self.var_names = [names[key] for key in self.var_keys]
+        self.child_ids = set(
+            SubroutineCalltree.objects.filter(commit=self.commit_id).values_list(
+                "child_subroutine_id", flat=True
+            )
+        )
+
+    def find(self, instance: str, member: str = "") -> list[int]:
+        """
+        Rows of the instance whose member name contains member. If member
+        is empty, rows of every instance whose name contains instance.
+        Names are compared ignoring case.
+        """
+        instance, member = instance.lower(), member.lower()
+        matches = []
+        if member:
+            insts = [instance] if instance else list(self.by_inst)
+            for inst in insts:
+                for name, idx in self.by_inst.get(inst, {}).items():
+                    if member in name:
+                        matches.extend(idx)
+        else:
+            for inst, members in self.by_inst.items():
+                if instance in inst:
+                    for idx in members.values():
+                        matches.extend(idx)
+        matches.sort()
+        return matches
+
+    def lookup(self, instance: str, member: str) -> list[tuple[str, str]]:
+        """
+        Returns (subroutine, status) for every subroutine accessing instance%member
+        """
+        idx = self.by_inst.get(instance.lower(), {}).get(member.lower(), [])
+        return [(self.rows[i][1], self.rows[i][4]) for i in idx]
+
+    def complete(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> list[str]:
+        """
+        Variable names starting with prefix, followed by names that only contain it.
+        """
+        prefix = prefix.lower()
+        names = []
+        start = bisect_left(self.var_keys, prefix)
+        for key, name in zip(self.var_keys[start : start + limit], self.var_names[start:]):
+            if not key.startswith(prefix):
+                break
+            names.append(name)
+        if len(names) < limit:
+            for key, name in zip(self.var_keys, self.var_names):
+                if prefix in key and not key.startswith(prefix):
+                    names.append(name)
+                    if len(names) == limit:
+                        break
+        return names
+
+
+variable_indexes: dict[int, VariableIndex] = {}
+
+
+def get_variable_index(commit_id: int) -> VariableIndex:
+    index = variable_indexes.setdefault(commit_id, VariableIndex(commit_id))
+    key = VariableIndex.fingerprint(commit_id)
+    if key != index.key:
+        index.load(key)
+    return index
@@ -1,6 +1,8 @@
+import os
+
 from django.test import TestCase
 
-from .models import SubroutineActiveGlobalVars
+from .models import SubroutineActiveGlobalVars, Subroutines
 
 
 class YourModelTests(TestCase):
@@ -12,3 +14,149 @@ class YourModelTests(TestCase):
         # Fetch the object you created in setUp
         obj = SubroutineActiveGlobalVars.objects.get(field1="value1")
         self.assertEqual(obj.field2, "value2")
+
+
+ACTIVE_ROW = {
+    "sub_module": "SoilHydrologyMod",
+    "subroutine": "SoilWater",
+    "type_module": "ColumnType",
+    "inst_type": "column_physical_properties",
+    "inst_name": "col_pp",
+    "member_type": "integer",
+    "member_name": "snl",
+}
+
+
+def load_test_tables(status: str, commit: str = "csv") -> int:
+    """
+    Load one subroutine using col_pp%snl with the given status into commit.
+    Returns the commit id.
+    """
+    from app.management import bulk_load
+
+    commit_id = bulk_load.get_commit_id(commit)
+    bulk_load.ensure_modules(["ColumnType", "SoilHydrologyMod"], commit_id)
+    bulk_load.load_typedefs(
+        [
+            {
+                "module": "ColumnType",
+                "user_type_name": "column_physical_properties",
+                "member_type": "integer",
+                "member_name": "snl",
+                "dim": "1",
+                "bounds": "(begc:endc)",
+            }
+        ],
+        commit_id,
+    )
+    bulk_load.load_type_insts(
+        [
+            {
+                "module": "ColumnType",
+                "user_type_name": "column_physical_properties",
+                "instance_name": "col_pp",
+            }
+        ],
+        commit_id,
+    )
+    bulk_load.load_subroutines(
+        [{"module": "SoilHydrologyMod", "subroutine": "SoilWater"}], commit_id
+    )
+    bulk_load.load_active_globals([{**ACTIVE_ROW, "status": status}], commit_id)
+    return commit_id
+
+
+class BulkLoadTests(TestCase):
+    def test_reload_updates_status(self):
+        load_test_tables("r")
+        load_test_tables("rw")
+        statuses = list(SubroutineActiveGlobalVars.objects.values_list("status", flat=True))
+        self.assertEqual(statuses, ["rw"])
+
+    def test_commits_are_separate(self):
+        from app.management import bulk_load
+
+        first = load_test_tables("r", commit="first")
+        second = load_test_tables("rw", commit="second")
+        statuses = dict(
+            SubroutineActiveGlobalVars.objects.values_list("commit__commit", "status")
+        )
+        self.assertEqual(statuses, {"first": "r", "second": "rw"})
+
+        # Syncing a commit only deletes its own rows
+        counts, _ = bulk_load.sync_table("active_dtype_vars", [], first)
+        self.assertEqual(counts["deleted"], 1)
+        self.assertFalse(SubroutineActiveGlobalVars.objects.filter(commit=first).exists())
+        self.assertTrue(SubroutineActiveGlobalVars.objects.filter(commit=second).exists())
+        # Shared subroutines are only removed from the commit
+        counts, _ = bulk_load.sync_table("subroutines", [], first)
+        self.assertEqual(counts["deleted"], 1)
+        self.assertEqual(
+            list(Subroutines.objects.values_list("subroutine_name", "commits__commit")),
+            [("SoilWater", "second")],
+        )
+
+    def test_prune_shared(self):
+        from app.management import bulk_load
+
+        commit = load_test_tables("r")
+        bulk_load.sync_table("subroutines", [], commit)
+        # Still used by the active variables of the commit
+        self.assertEqual(bulk_load.prune_shared()["Subroutines"], 0)
+        bulk_load.sync_table("active_dtype_vars", [], commit)
+        self.assertEqual(
+            bulk_load.prune_shared(), {"Subroutines": 1, "UserTypes": 0, "Modules": 0}
+        )
+        self.assertFalse(Subroutines.objects.exists())
+
+    def test_sync_copies_unaffected_modules(self):
+        from app.management import bulk_load
+
+        since = load_test_tables("r", commit="since")
+        commit = load_test_tables("w", commit="commit")
+        # Only ColumnType is affected: the active variables of
+        # SoilHydrologyMod are the ones of since
+        counts, errors = bulk_load.sync_table(
+            "active_dtype_vars",
+            [{**ACTIVE_ROW, "status": "w"}],
+            commit,
+            modules={"ColumnType"},
+            since_id=since,
+        )
+        self.assertEqual((counts["kept"], counts["deleted"], errors), (1, 0, []))
+        statuses = SubroutineActiveGlobalVars.objects.filter(commit=commit)
+        self.assertEqual(list(statuses.values_list("status", flat=True)), ["r"])
+
+
+class VariableIndexTests(TestCase):
+    def test_variable_index_ignores_case(self):
+        from app.search_index import VariableIndex
+
+        commit_id = load_test_tables("r")
+        index = VariableIndex(commit_id)
+        index.load(key=None)
+        self.assertEqual(len(index.find("COL_PP", "Sn")), 1)
+        self.assertEqual(index.lookup("col_PP", "SNL"), [("SoilWater", "r")])
+        self.assertEqual(index.complete("Col_pp%S"), ["col_pp%snl"])
+        self.assertEqual(index.complete("PP%"), ["col_pp%snl"])
+
+    def test_variable_index_reloads_changed_status(self):
+        import csv
+        import tempfile
+
+        from app.search_index import get_variable_index
+        from django.core.management import call_command
+
+        commit_id = load_test_tables("r")
+        index = get_variable_index(commit_id)
+        self.assertEqual(index.lookup("col_pp", "snl"), [("SoilWater", "r")])
+
+        # Same row, new status: ids and row count don't change
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[*ACTIVE_ROW, "status"])
+            writer.writeheader()
+            writer.writerow({**ACTIVE_ROW, "status": "rw"})
+            f.flush()
+            call_command("update_subroutine_dtype_vars", f.name, stdout=open(os.devnull, "w"))
+        index = get_variable_index(commit_id)
+        self.assertEqual(index.lookup("col_pp", "snl"), [("SoilWater", "rw")])
@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path("", views.home, name="home"),
     path("autocomplete/", views.autocomplete, name="autocomplete"),
+    path("variable_search/", views.variable_search, name="variable_search"),
     path("modules_calltree", views.modules_calltree, name="modules_calltree"),
     path("subroutine_calltree", views.view_table, name="subroutine_calltree"),
     path("subcall/", views.subcall, name="subcall"),
@@ -1,13 +1,20 @@
+import json
+from urllib.parse import urlencode
+
 from django import template
-from django.db import connection, models
+from django.db import connection
+from django.db.models import Q
 from django.db.models.query import Prefetch
+from django.http import Http404, JsonResponse
 from django.shortcuts import HttpResponse, render
 from django.views.decorators.http import require_http_methods
 
 from .calltree import Node, get_module_calltree, get_subroutine_calltree
-from .models import (ModuleDependency, Modules, SubroutineActiveGlobalVars,
-                     SubroutineArgs, SubroutineCalltree, Subroutines,
-                     TypeDefinitions, UserTypeInstances)
+from .models import (ExportedCommits, ModuleDependency, Modules,
+                     SubroutineActiveGlobalVars, SubroutineArgs,
+                     SubroutineCalltree, Subroutines, TypeDefinitions,
+                     UserTypeInstances)
+from .search_index import get_variable_index
 
 register = template.Library()
 # import module_calltree
@@ -51,9 +58,11 @@ TABLE_NAME_LOOKUP = {
     "variables": VARS_DEFAULT_DICT,
 }
 
+# "commit" is the lookup of the commit(s) the rows of a table belong to
 VIEWS_TABLE_DICT = {
     "subroutines": {
         "name": Subroutines,
+        "commit": "commits",
         "html": "subroutines.html",
         "fields": {
             "Id": "subroutine_id",
@@ -64,6 +73,7 @@ VIEWS_TABLE_DICT = {
     },
     "modules": {
         "name": Modules,
+        "commit": "commits",
         "html": "modules.html",
         "fields": {
             "Id": "module_id",
@@ -73,6 +83,7 @@ VIEWS_TABLE_DICT = {
     },
     "subroutine_calltree": {
         "name": SubroutineCalltree,
+        "commit": "commit",
         "html": "subroutine_calltree.html",
         "fields": {
             "Id": "parent_id",
@@ -83,6 +94,7 @@ VIEWS_TABLE_DICT = {
     },
     "types": {
         "name": TypeDefinitions,
+        "commit": "commit",
         "html": "types.html",
         "fields": {
             "Id": "define_id",
@@ -97,6 +109,7 @@ VIEWS_TABLE_DICT = {
     },
     "dependency": {
         "name": ModuleDependency,
+        "commit": "commit",
         "html": "dep.html",
         "fields": {
             "Id": "dependency_id",
@@ -108,6 +121,7 @@ VIEWS_TABLE_DICT = {
     },
     "instances": {
         "name": UserTypeInstances,
+        "commit": "commit",
         "html": "instances.html",
         "fields": {
             "Id": "instance_id",
@@ -119,6 +133,7 @@ VIEWS_TABLE_DICT = {
     },
     "subroutineargs": {
         "name": SubroutineArgs,
+        "commit": "commit",
         "html": "subroutineargs.html",
         "fields": {
             "Id": "arg_id",
@@ -131,6 +146,7 @@ VIEWS_TABLE_DICT = {
     },
     "activeglobalvars": {
         "name": SubroutineActiveGlobalVars,
+        "commit": "commit",
         "html": "active_global_vars.html",
         "fields": {
             "Id": "variable_id",
@@ -168,10 +184,23 @@ def execute(statement):
         cur.execute(statement)
 
 
+def selected_commit(request) -> ExportedCommits:
+    """
+    Commit chosen with the commit parameter, by default the last exported one
+    """
+    params = request.POST if request.method == "POST" else request.GET
+    commits = ExportedCommits.objects.order_by("-exported_at", "-pk")
+    name = params.get("commit")
+    commit = commits.filter(commit=name).first() if name else commits.first()
+    if commit is None:
+        raise Http404(f"Commit {name} not found" if name else "No commit loaded")
+    return commit
+
+
 def modules_calltree(request):
     if request.method == "POST":
         data = request.POST.get("mod")
-        tree = get_module_calltree(data)
+        tree = get_module_calltree(data, selected_commit(request).pk)
     else:
         return render(request, "modules_calltree.html", {})
 
@@ -190,9 +219,10 @@ def subcall(request):
     else:
         instance = "bounds"
         member = "begc"
-    tree_list, all = get_subroutine_calltree(instance, member)
+    commit = selected_commit(request)
+    tree_list, all = get_subroutine_calltree(instance, member, commit.pk)
 
-    html_tree = build_tree_html(tree_list)
+    html_tree = build_tree_html(tree_list, commit.commit)
     context = {
         "tree": html_tree,
         "all": all,
@@ -202,16 +232,16 @@ def subcall(request):
     return render(request, "partials/subcall_partial.html", context)
 
 
-def build_tree_html(tree: list[Node]):
+def build_tree_html(tree: list[Node], commit: str):
     """Recursive function to build HTML for a tree."""
     html = '<ul id="SubTree">'
     for node in tree:
-        html += process_node(node)
+        html += process_node(node, commit)
     html += "</ul>"
     return html
 
 
-def process_node(node: Node):
+def process_node(node: Node, commit: str):
     """
     Function to tranlate Node("name":name,"children":[])
     to html
@@ -220,79 +250,151 @@ def process_node(node: Node):
 
     if node.children:
         html += f'<li><span class="box">{node.name}</span>'
-        html += add_details_btn(node.name)
+        html += add_details_btn(node.name, commit)
         html += '<ul class="child">'
         for child in node.children:
-            html += process_node(child)
+            html += process_node(child, commit)
         html += "</ul>"
         html += "</li>"
     else:
         html += f'<li><span class="parent">{node.name}</span>'
-        html += add_details_btn(node.name)
+        html += add_details_btn(node.name, commit)
         html += "</li>"
 
     return html
 
 
-def add_details_btn(name: str) -> str:
+def add_details_btn(name: str, commit: str) -> str:
     """
     Adds html for button that sends requests via htmx
     """
-    html = f'<button class="details-btn" aria-label="View Details" hx-get="/subroutine-details/{name}/" '
+    query = urlencode({"commit": commit})
+    html = f'<button class="details-btn" aria-label="View Details" hx-get="/subroutine-details/{name}/?{query}" '
     html += 'hx-target="#modalContent" hx-trigger="click" hx-swap="innerHTML">'
     html += "</button>"
     return html
 
 
+TABLE_PAGE_SIZE = 100
+
+
+def table_params(request, display_fields):
+    """
+    Sort column, direction, column filters and keyset cursor of a table request
+    """
+    params = request.POST if request.method == "POST" else request.GET
+    sort_by = params.get("sort_by")
+    if sort_by not in display_fields:
+        sort_by = None
+    descending = params.get("dir") == "desc"
+    filters = {
+        label: params.get(f"f{i}", "").strip()
+        for i, label in enumerate(display_fields)
+    }
+    after = params.get("after")
+    return sort_by, descending, filters, after
+
+
+def table_page(model, display_fields, sort_by, descending, filters, after, commit_filter):
+    """
+    Returns one page of rows (only the displayed columns) and the cursor
+    of the next page, or None if it's the last one.
+    commit_filter selects the rows of the commit.
+
+    Pages are selected by the (sort column, pk) of the last row, so deep
+    pages cost the same as the first one.
+    """
+    columns = [path.replace(".", "__") for path in display_fields.values()]
+    pk = model._meta.pk.name
+    sort_field = columns[list(display_fields).index(sort_by)] if sort_by else pk
+
+    queryset = model.objects.filter(**commit_filter)
+    for column, value in zip(columns, filters.values()):
+        if value:
+            queryset = queryset.filter(**{f"{column}__icontains": value})
+
+    op = "lt" if descending else "gt"
+    if after:
+        last_val, last_pk = json.loads(after)
+        if sort_field == pk:
+            queryset = queryset.filter(**{f"{pk}__{op}": last_pk})
+        else:
+            queryset = queryset.filter(
+                Q(**{f"{sort_field}__{op}": last_val})
+                | Q(**{sort_field: last_val, f"{pk}__{op}": last_pk})
+            )
+    order = [sort_field] if sort_field == pk else [sort_field, pk]
+    if descending:
+        order = [f"-{field}" for field in order]
+
+    fields = columns + [f for f in (sort_field, pk) if f not in columns]
+    sort_idx, pk_idx = fields.index(sort_field), fields.index(pk)
+    rows = list(
+        queryset.order_by(*order).values_list(*fields)[: TABLE_PAGE_SIZE + 1]
+    )
+
+    next_cursor = None
+    if len(rows) > TABLE_PAGE_SIZE:
+        rows = rows[:TABLE_PAGE_SIZE]
+        next_cursor = json.dumps([rows[-1][sort_idx], rows[-1][pk_idx]])
+    return [row[: len(columns)] for row in rows], next_cursor
+
+
 @require_http_methods(["GET", "POST"])
 def view_table(request, table_name):
     """
     Generic Function for printing an SQL table, substituting
-    the foreign keys with as specifcied in the table definiton
+    the foreign keys with as specifcied in the table definiton.
+    Filtering, sorting and pagination are done by the database.
     """
 
-    table = VIEWS_TABLE_DICT[table_name]
+    table = VIEWS_TABLE_DICT.get(table_name)
     if not table:
         return HttpResponse(b"Table not found", status=404)
 
     model = table["name"]
     display_fields = table["fields"]
-    title = table["title"]
-    if request.method == "POST":
-        sort_by = request.POST.get("sort_by", None)
-    else:
-        sort_by = None
-
-    foreign_keys = [
-        field.name
-        for field in model._meta.get_fields()
-        if isinstance(field, models.ForeignKey)
-    ]
-    all_objects = model.objects.select_related(*foreign_keys).all()
-
-    if sort_by:
-        sort_field = display_fields[sort_by]
-        all_objects = all_objects.order_by(sort_field.replace(".", "__"))
-
-    rows = []
-    for obj in all_objects:
-        row = []
-        for field_name in display_fields.values():
-            parts = field_name.split(".")
-            value = getattr(obj, parts[0], None)
-            if len(parts) > 1:
-                for attr in parts[1:]:
-                    value = getattr(value, attr, None)
+    commit = selected_commit(request)
+    sort_by, descending, filters, after = table_params(request, display_fields)
+    rows, next_cursor = table_page(
+        model,
+        display_fields,
+        sort_by,
+        descending,
+        filters,
+        after,
+        {table["commit"]: commit.pk},
+    )
 
-            row.append(value)
-        rows.append(row)
+    next_query = ""
+    if next_cursor:
+        query = {"commit": commit.commit}
+        query.update(
+            {f"f{i}": value for i, value in enumerate(filters.values()) if value}
+        )
+        if sort_by:
+            query.update({"sort_by": sort_by, "dir": "desc" if descending else "asc"})
+        query.update({"after": next_cursor, "rows": 1})
+        next_query = urlencode(query)
 
     context = {
         "all_objects": rows,
         "field_names": display_fields,
+        "filters": filters,
+        "sort_by": sort_by,
+        "descending": descending,
+        "next_query": next_query,
         "table_name": table_name,
         "title": table["title"],
+        "commit": commit.commit,
+        "commits": ExportedCommits.objects.order_by("-exported_at", "-pk").values_list(
+            "commit", flat=True
+        ),
     }
+    params = request.POST if request.method == "POST" else request.GET
+    # Next page or filtered rows only
+    if params.get("rows"):
+        return render(request, "partials/table_rows.html", context)
     # Check if the request is coming from HTMX (for partial table response)
     if request.headers.get("HX-Request"):
         return render(request, "partials/dynamic_table.html", context)
@@ -313,16 +415,25 @@ def type_details(request, type_name):
 
 def subroutine_details(request, subroutine_name):
 
+    commit = selected_commit(request)
     subroutine = (
-        Subroutines.objects.filter(subroutine_name=subroutine_name)
+        Subroutines.objects.filter(subroutine_name=subroutine_name, commits=commit)
         .select_related("module")
         .prefetch_related(
             Prefetch(
                 "parent_subroutine",
                 queryset=SubroutineCalltree.objects.filter(
-                    parent_subroutine__subroutine_name=subroutine_name
+                    parent_subroutine__subroutine_name=subroutine_name, commit=commit
                 ),
-            )
+            ),
+            Prefetch(
+                "subroutine_args",
+                queryset=SubroutineArgs.objects.filter(commit=commit),
+            ),
+            Prefetch(
+                "subroutine_dtype_vars",
+                queryset=SubroutineActiveGlobalVars.objects.filter(commit=commit),
+            ),
         )
         .first()
     )
@@ -378,6 +489,27 @@ def fake(request, table):
 
 
 def autocomplete(request):
-    query = request.GET.get("q", "")
+    query = request.GET.get("q", request.GET.get("Variable", "")).strip()
+    results = []
+    if query:
+        index = get_variable_index(selected_commit(request).pk)
+        results = [{"name": name} for name in index.complete(query)]
+    context = {"results": results}
 
     return render(request, "partials/autocomplete_results.html", context)
+
+
+def variable_search(request):
+    """
+    Returns the subroutines (and read/write status) accessing ?q=inst%member
+    """
+    variable = request.GET.get("q", "").strip()
+    if "%" not in variable:
+        return JsonResponse({"error": "expected inst%member"}, status=400)
+    instance, member = variable.split("%", 1)
+    index = get_variable_index(selected_commit(request).pk)
+    subroutines = [
+        {"subroutine": sub, "status": status}
+        for sub, status in index.lookup(instance, member)
+    ]
+    return JsonResponse({"variable": variable, "subroutines": subroutines})